@@ -280,13 +280,13 @@ ddd-stop:
 
 ddd-logs:
 	@if [ -f .ddd/daemon.log ]; then \
-		tail -f .ddd/daemon.log; \
+		tail -F .ddd/daemon.log; \
 	else \
 		echo "No daemon logs found"; \
 	fi
 
 ddd-clean:
-	rm -rf .ddd/run/*
+	rm -rf .ddd/run/* .ddd/cache
 	@echo "DDD artifacts cleaned"
 EOF
 log_success ".ddd/Makefile created"
@@ -345,7 +345,10 @@ cat > "$TARGET_DIR/.ddd/.gitignore" <<'EOF'
 
 # System files (never commit)
 run/
-daemon.log
+cache/
+history/
+state/
+daemon.log*
 daemon.pid
 bin/
 ddd/
@@ -363,7 +366,10 @@ if [ "${DDD_UPDATE_GITIGNORE:-yes}" = "yes" ]; then
     GITIGNORE_ENTRIES=(
         "# DDD - System files (do not commit)"
         ".ddd/run/"
-        ".ddd/daemon.log"
+        ".ddd/cache/"
+        ".ddd/history/"
+        ".ddd/state/"
+        ".ddd/daemon.log*"
         ".ddd/daemon.pid"
         ".ddd/bin/"
         ".ddd/ddd/"
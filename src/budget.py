@@ -0,0 +1,257 @@
+"""
+Token budget for build.log (target `max_tokens`).
+
+When the filtered log would cost more tokens than the budget, the stage
+output sections are cut down to the highest-ranked diagnostics:
+fatal/crash > error > warning > note > other lines, earlier before later.
+Each shortened section ends with a summary of what was left out, with byte
+offsets into last_build.raw.log so the agent can read exactly that part.
+Kept diagnostics are written back in the section's own format (indented
+JSON, compact JSON or NDJSON).
+"""
+import json
+import re
+
+# Same estimate as the build.log footer
+BYTES_PER_TOKEN = 4
+# Omitted entries located in the raw log, per section
+MAX_POINTERS = 10
+# Bytes held back per section for its omission summary
+SUMMARY_RESERVE = 200 + MAX_POINTERS * 60
+
+RANKS = {"fatal": 0, "error": 1, "warning": 2, "note": 3}
+OTHER_RANK = 4
+
+SECTION_RE = re.compile(r"^--- (.+?) ---$", re.MULTILINE)
+CRASH_RE = re.compile(r"Segmentation fault|core dumped|Aborted|Bus error|Assertion .* failed", re.IGNORECASE)
+SEVERITY_RE = re.compile(r"\b(fatal error|error|warning|note)\b", re.IGNORECASE)
+LOCATION_RE = re.compile(r"^([^:\s]+):(\d+):")
+
+
+def _compact(data):
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _ndjson_records(body):
+    """The records of an NDJSON section: (leading diff summary line or None, dicts), or None."""
+    header, records = None, []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        if not records and header is None and set(data) == {"diff"}:
+            header = line + "\n"
+        else:
+            records.append(data)
+    return (header, records) if records else None
+
+
+def estimate_tokens(byte_count):
+    return int(byte_count / BYTES_PER_TOKEN)
+
+
+def _line_rank(line):
+    if CRASH_RE.search(line):
+        return RANKS["fatal"]
+    match = SEVERITY_RE.search(line)
+    if not match:
+        return OTHER_RANK
+    word = match.group(1).lower()
+    return RANKS["fatal"] if word == "fatal error" else RANKS[word]
+
+
+class _Section:
+    """One `--- NAME OUTPUT ---` block, split into rankable items."""
+
+    def __init__(self, title, body):
+        self.title = title
+        self.stage = title[:-len(" OUTPUT")]
+        self.kind = "text"
+        self.doc = None
+        # JSON documents: "json" (indented) or "compact", whose records are
+        # separated by `separator` (one line, or one record per line)
+        self.format = "json"
+        self.separator = ","
+        if body.startswith("\n"):
+            body = body[1:]
+        stripped = body.strip()
+        data = None
+        if stripped[:1] in ("[", "{"):
+            try:
+                data = json.loads(stripped)
+            except ValueError:
+                pass
+            if not stripped.startswith(("[\n", "{\n")):
+                self.format = "compact"
+                self.separator = ",\n" if "\n" in stripped else ","
+        ndjson = _ndjson_records(body) if data is None and stripped[:1] == "{" else None
+        if isinstance(data, list) and all(isinstance(d, dict) for d in data):
+            self.kind, self.items = "json", data
+        elif isinstance(data, dict) and isinstance(data.get("new"), list):
+            self.kind, self.doc, self.items = "diff", data, data["new"]
+        elif ndjson:
+            self.kind = "ndjson"
+            self.doc, self.items = ndjson
+        else:
+            self.items = body.splitlines(keepends=True)
+
+    def rank(self, item):
+        if self.kind == "text":
+            return _line_rank(item)
+        return RANKS.get(item.get("type"), RANKS["warning"])
+
+    def cost(self, item):
+        if self.kind == "text":
+            return len(item.encode())
+        if self.kind == "ndjson":
+            return len(_compact(item)) + 1
+        if self.format == "compact":
+            return len(_compact(item)) + len(self.separator)
+        # As rendered inside the list: one level deeper, plus ",\n"
+        return len(json.dumps([item], indent=2).encode()) - 2
+
+    def label(self, item):
+        """Severity name and the `file:line:` prefix to look for in the raw log."""
+        if self.kind == "text":
+            rank = _line_rank(item)
+            match = LOCATION_RE.match(item)
+            needle = match.group(0) if match else item.strip()[:80]
+        else:
+            rank = self.rank(item)
+            needle = f"{item.get('file')}:{item.get('line')}:"
+        name = next((k for k, v in RANKS.items() if v == rank), "other")
+        return name, needle
+
+    def render(self, kept):
+        if self.kind == "text":
+            return "".join(kept)
+        if self.kind == "ndjson":
+            return (self.doc or "") + "".join(_compact(item) + "\n" for item in kept)
+        data = dict(self.doc, new=kept) if self.kind == "diff" else kept
+        if self.format == "json":
+            return json.dumps(data, indent=2) + "\n"
+        if self.kind == "diff" or self.separator == ",":
+            return _compact(data) + "\n"
+        # Streamed compact list: one record per line
+        return "[" + self.separator.join(_compact(item) for item in kept) + "]\n"
+
+
+def _locate(raw_path, needles, start, end):
+    """Byte offset of the first raw log line containing each needle, in [start, end)."""
+    found = {}
+    wanted = {n: n.encode() for n in needles if n}
+    if not wanted:
+        return found
+    try:
+        with open(raw_path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if end is not None and offset >= end:
+                    break
+                for needle, raw in list(wanted.items()):
+                    if raw in line:
+                        found[needle] = offset
+                        del wanted[needle]
+                if not wanted:
+                    break
+                offset += len(line)
+    except OSError:
+        pass
+    return found
+
+
+def shape_log(log_path, raw_path, max_tokens, raw_ranges=None):
+    """
+    Rewrites log_path to fit max_tokens. Returns budget metrics for job_result.json.
+    raw_ranges maps stage name -> (start, end) byte range in raw_path.
+    """
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    before = estimate_tokens(len(text.encode()))
+    metrics = {"max_tokens": max_tokens, "tokens_before": before, "tokens": before, "shaped": False}
+    if before <= max_tokens:
+        return metrics
+
+    # Alternate fixed text (header, markers, stats) and stage output sections.
+    parts, sections = [], []
+    pos = 0
+    headers = list(SECTION_RE.finditer(text))
+    for i, match in enumerate(headers):
+        body_end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        parts.append(text[pos:match.end()])
+        body = text[match.end():body_end]
+        if match.group(1).endswith(" OUTPUT"):
+            section = _Section(match.group(1), body)
+            sections.append(section)
+            parts.append(section)
+        else:
+            parts.append(body)
+        pos = body_end
+    parts.append(text[pos:])
+
+    # Room left after fixed text and one summary per section.
+    fixed = sum(len(p.encode()) for p in parts if isinstance(p, str))
+    budget = max_tokens * BYTES_PER_TOKEN - fixed - SUMMARY_RESERVE * len(sections)
+
+    candidates = []
+    for s_index, section in enumerate(sections):
+        for i_index, item in enumerate(section.items):
+            candidates.append((section.rank(item), s_index, i_index))
+    candidates.sort()
+
+    keep = set()
+    for rank, s_index, i_index in candidates:
+        cost = sections[s_index].cost(sections[s_index].items[i_index])
+        if cost <= budget:
+            keep.add((s_index, i_index))
+            budget -= cost
+
+    omitted_total = {}
+    out = []
+    for part in parts:
+        if isinstance(part, str):
+            out.append(part)
+            continue
+        s_index = sections.index(part)
+        kept = [item for i, item in enumerate(part.items) if (s_index, i) in keep]
+        omitted = [item for i, item in enumerate(part.items) if (s_index, i) not in keep]
+        out.append("\n" + part.render(kept))
+        if omitted:
+            out.append(_summary(part, omitted, raw_path, (raw_ranges or {}).get(part.stage), max_tokens, omitted_total))
+
+    shaped = "".join(out)
+    with open(log_path, "w", encoding="utf-8") as f:
+        f.write(shaped)
+    metrics.update(tokens=estimate_tokens(len(shaped.encode())), shaped=True, omitted=omitted_total)
+    return metrics
+
+
+def _summary(section, omitted, raw_path, raw_range, max_tokens, omitted_total):
+    counts = {}
+    for item in omitted:
+        name = section.label(item)[0]
+        counts[name] = counts.get(name, 0) + 1
+        omitted_total[name] = omitted_total.get(name, 0) + 1
+    start, end = raw_range or (0, None)
+
+    # Point at the most severe omissions first (stable: earlier before later).
+    ranked = [item for item in omitted if section.rank(item) < OTHER_RANK]
+    pointers = [section.label(item) for item in sorted(ranked, key=section.rank)[:MAX_POINTERS]]
+    offsets = _locate(raw_path, [needle for _, needle in pointers], start, end)
+    refs = [f"{name} {needle.rstrip(':')} @{offsets[needle]}" for name, needle in pointers if needle in offsets]
+
+    by_type = ", ".join(f"{k}: {v}" for k, v in sorted(counts.items(), key=lambda kv: RANKS.get(kv[0], OTHER_RANK)))
+    span = f"bytes {start}-{end}" if end is not None else f"from byte {start}"
+    lines = [
+        f"\n--- ✂️  {section.stage}: {len(omitted)} of {len(section.items)} entries omitted for max_tokens={max_tokens} ({by_type}) ---\n",
+        f"Raw output: {raw_path} {span}\n",
+    ]
+    if refs:
+        lines.append("Omitted at: " + "; ".join(refs) + "\n")
+    return "".join(lines)
@@ -0,0 +1,195 @@
+"""
+Content-addressed cache of build results.
+
+A build is keyed on the content of its input files (target `cache.inputs`
+globs) plus the target config, which includes commands and filter chains,
+and the filter code: the loaded .ddd/filters/ plugins and the DDD version.
+When nothing changed since a previous build, the daemon replays that build's
+artifacts instead of running it again.
+
+File digests are kept in a stat cache (mtime, size, inode), so a key over an
+unchanged tree costs one stat per file and no reads.
+
+Targets with a `"diff": true` stage are not cached: their output depends on
+the saved diagnostics baseline (.ddd/state/), which changes every build.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .filters import plugin_digests
+
+CACHE_DIR = os.path.join(".ddd", "cache")
+STAT_CACHE_FILE = "stat_cache.json"
+# Files replayed on a hit, relative to the run directory
+ARTIFACTS = ("build.log", "last_build.raw.log", "build.exit", "job_result.json")
+DEFAULT_MAX_ENTRIES = 32
+HASH_CHUNK = 1024 * 1024
+# Pipeline stages whose config can carry filter options
+STAGES = ("build", "verify")
+
+
+def _tool_version():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "VERSION")
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return "unknown"
+
+
+# Built-in filters change with the DDD version
+TOOL_VERSION = _tool_version()
+
+
+class InputHasher:
+    """Hashes a set of files, re-reading only those whose stat changed."""
+
+    def __init__(self, stat_path=None):
+        self.stat_path = stat_path
+        self._stats = {}
+        self._dirty = False
+        self.hashed = 0
+        if stat_path and os.path.exists(stat_path):
+            try:
+                with open(stat_path) as f:
+                    self._stats = {k: tuple(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError):
+                self._stats = {}
+
+    def expand(self, patterns):
+        """Resolves glob patterns (`**` allowed) to a sorted list of files."""
+        files = set()
+        for pattern in patterns:
+            for path in glob.iglob(pattern, recursive=True):
+                if os.path.isfile(path):
+                    files.add(os.path.normpath(path))
+        return sorted(files)
+
+    def file_digest(self, path):
+        st = os.stat(path)
+        sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+        cached = self._stats.get(path)
+        if cached and tuple(cached[:3]) == sig:
+            return cached[3]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._stats[path] = sig + (digest,)
+        self._dirty = True
+        self.hashed += 1
+        return digest
+
+    def digest(self, patterns, extra=""):
+        """Returns (key, number of files) for the files matched by patterns."""
+        self.hashed = 0
+        h = hashlib.sha256(extra.encode())
+        files = self.expand(patterns)
+        for path in files:
+            try:
+                h.update(f"{path}\0{self.file_digest(path)}\n".encode())
+            except OSError:
+                h.update(f"{path}\0missing\n".encode())
+        # Forget files that no longer match, so the stat cache tracks the tree
+        live = set(files)
+        for path in [p for p in self._stats if p not in live]:
+            del self._stats[path]
+            self._dirty = True
+        return h.hexdigest(), len(files)
+
+    def save(self):
+        if not (self.stat_path and self._dirty):
+            return
+        tmp = self.stat_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._stats, f)
+        os.replace(tmp, self.stat_path)
+        self._dirty = False
+
+
+class BuildCache:
+    """
+    Stores and replays build artifacts under `.ddd/cache/<key>/`.
+
+    Configured per target:
+        "cache": {"inputs": ["src/**/*.c", "Makefile"], "max_entries": 32}
+    """
+
+    def __init__(self, cache_config, cache_dir=CACHE_DIR):
+        self.inputs = list(cache_config.get("inputs", []))
+        self.max_entries = int(cache_config.get("max_entries", DEFAULT_MAX_ENTRIES))
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.hasher = InputHasher(os.path.join(cache_dir, STAT_CACHE_FILE))
+
+    @classmethod
+    def from_target(cls, target, current=None):
+        """Returns a BuildCache for the target, reusing `current` if compatible."""
+        cache_config = target.get("cache")
+        if not cache_config or not cache_config.get("inputs"):
+            return None
+        if any(target.get(stage, {}).get("diff") for stage in STAGES):
+            return None
+        if current is not None and current.inputs == list(cache_config["inputs"]):
+            current.max_entries = int(cache_config.get("max_entries", DEFAULT_MAX_ENTRIES))
+            return current
+        return cls(cache_config)
+
+    def compute_key(self, target):
+        """Returns metrics for the current inputs: key, files, hashed, hash_ms."""
+        start = time.perf_counter()
+        extra = json.dumps({
+            "target": target,
+            "plugins": plugin_digests(),
+            "version": TOOL_VERSION
+        }, sort_keys=True)
+        key, files = self.hasher.digest(self.inputs, extra)
+        self.hasher.save()
+        return {
+            "key": key,
+            "files": files,
+            "hashed": self.hasher.hashed,
+            "hash_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def lookup(self, key):
+        entry = self._entry(key)
+        if all(os.path.exists(os.path.join(entry, name)) for name in ARTIFACTS):
+            return entry
+        return None
+
+    def replay(self, entry, run_dir):
+        """Copies a cached entry's artifacts into run_dir. Returns its job_result."""
+        for name in ARTIFACTS:
+            shutil.copyfile(os.path.join(entry, name), os.path.join(run_dir, name))
+        os.utime(entry)  # Keeps recently replayed entries ahead of pruning
+        with open(os.path.join(run_dir, "job_result.json")) as f:
+            return json.load(f)
+
+    def store(self, key, run_dir):
+        entry = self._entry(key)
+        tmp = entry + f".tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in ARTIFACTS:
+            shutil.copyfile(os.path.join(run_dir, name), os.path.join(tmp, name))
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.prune()
+
+    def prune(self):
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                entries.extend(e for e in os.scandir(shard.path) if e.is_dir())
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+        for stale in entries[self.max_entries:]:
+            shutil.rmtree(stale.path, ignore_errors=True)
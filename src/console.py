@@ -0,0 +1,154 @@
+"""
+Daemon console output: build echo modes and daemon.log rotation.
+
+Stage output used to be printed line by line, which under --daemon means
+one write to daemon.log per build line. The echo mode (stage `echo`,
+default from `--echo`) decides how much of it reaches the console:
+
+    full         every line, written as it arrives
+    batched      every line, coalesced into a few large writes
+    errors-only  only lines that look like errors or crashes
+    off          nothing
+"""
+import os
+import sys
+import time
+
+ECHO_MODES = ("full", "batched", "errors-only", "off")
+# Batched mode writes once this much is pending, or after ECHO_INTERVAL seconds
+ECHO_BATCH_BYTES = 64 * 1024
+ECHO_INTERVAL = 0.5
+
+# Lines echoed in errors-only mode
+ERROR_HINTS = ("error", "fatal", "failed", "segmentation fault", "core dumped", "aborted", "bus error")
+
+# daemon.log rotation defaults (--log-max-mb, --log-backups)
+LOG_MAX_MB = 10
+LOG_BACKUPS = 3
+# Seconds between daemon.log size checks
+LOG_CHECK_INTERVAL = 5.0
+
+
+def _is_error(line):
+    lowered = line.lower()
+    for hint in ERROR_HINTS:
+        if hint in lowered:
+            return True
+    return False
+
+
+class ConsoleEcho:
+    """Echoes one stage's output to the console according to an echo mode."""
+
+    def __init__(self, mode="full", stream=None, loop=None):
+        if mode not in ECHO_MODES:
+            print(f"[!] Unknown echo mode '{mode}', using full.")
+            mode = "full"
+        self.mode = mode
+        self.stream = stream if stream is not None else sys.stdout
+        # Batched mode: flushes held-back output after ECHO_INTERVAL on this
+        # loop, so a stage that goes quiet still shows its last lines.
+        self.loop = loop
+        self.lines = 0
+        self._pending = []
+        self._size = 0
+        self._last = time.monotonic()
+        self._timer = None
+        self._tail = ""
+
+    def write(self, text):
+        """Echoes any amount of output (whole lines or a raw chunk)."""
+        if self.mode == "off" or not text:
+            return
+        if self.mode == "full":
+            self.stream.write(text)
+        elif self.mode == "batched":
+            if not self._pending and self.loop is not None:
+                self._timer = self.loop.call_later(ECHO_INTERVAL, self.flush)
+            self._pending.append(text)
+            self._size += len(text)
+            if self._size >= ECHO_BATCH_BYTES or time.monotonic() - self._last >= ECHO_INTERVAL:
+                self.flush()
+        else:
+            self._write_errors(text)
+
+    def _write_errors(self, text):
+        text = self._tail + text if self._tail else text
+        cut = text.rfind("\n") + 1
+        self._tail = text[cut:]
+        if cut and _is_error(text[:cut]):
+            picked = [line for line in text[:cut].splitlines(keepends=True) if _is_error(line)]
+            self.lines += len(picked)
+            self.stream.write("".join(picked))
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self.stream.write("".join(self._pending))
+            self._pending = []
+            self._size = 0
+        self._last = time.monotonic()
+        self.stream.flush()
+
+    def close(self):
+        """Writes whatever is still held back (batch, partial error line)."""
+        if self._tail:
+            tail, self._tail = self._tail, ""
+            if _is_error(tail):
+                self.lines += 1
+                self.stream.write(tail + "\n")
+        self.flush()
+
+
+class LogRotator:
+    """
+    Size-based rotation of the file the daemon's stdout/stderr point at
+    (daemon.log under --daemon): daemon.log -> daemon.log.1 -> ... up to
+    `backups` files, then a fresh daemon.log is put in place of fds 1 and 2.
+    """
+
+    def __init__(self, path, max_bytes=LOG_MAX_MB * 1024 * 1024, backups=LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.rotations = 0
+
+    def needs_rotation(self):
+        try:
+            return self.max_bytes > 0 and os.fstat(sys.stdout.fileno()).st_size >= self.max_bytes
+        except (OSError, ValueError):
+            return False
+
+    def maybe_rotate(self):
+        if not self.needs_rotation():
+            return False
+        sys.stdout.flush()
+        sys.stderr.flush()
+        try:
+            if self.backups > 0:
+                for i in range(self.backups - 1, 0, -1):
+                    older = f"{self.path}.{i}"
+                    if os.path.exists(older):
+                        os.replace(older, f"{self.path}.{i + 1}")
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        except OSError as e:
+            print(f"[!] Could not rotate {self.path}: {e}")
+            return False
+        os.dup2(fd, sys.stdout.fileno())
+        os.dup2(fd, sys.stderr.fileno())
+        os.close(fd)
+        self.rotations += 1
+        print(f"[i] Rotated {self.path} (rotation #{self.rotations}).")
+        return True
+
+    def watch(self, loop, interval=LOG_CHECK_INTERVAL):
+        """Checks the size every `interval` seconds on the event loop."""
+        def tick():
+            self.maybe_rotate()
+            loop.call_later(interval, tick)
+        loop.call_later(interval, tick)
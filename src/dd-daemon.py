@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
+import asyncio
+import codecs
+import io
 import json
 import os
-import subprocess
 import time
 import sys
 import stat
 import shutil
 import shlex  # <--- NEW: Added for safe quoting
+import resource
+import signal
+import traceback
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
@@ -21,7 +26,16 @@ TOOL_ROOT = os.path.dirname(CURRENT_DIR)
 if TOOL_ROOT not in sys.path:
     sys.path.insert(0, TOOL_ROOT)
 
-from src.filters import load_plugins, REGISTRY
+from src.filters import load_plugins, FilterChain
+from src.ipc import start_ipc_server
+from src.build_cache import BuildCache
+from src.budget import shape_log, estimate_tokens
+from src.history import HistoryStore, HISTORY_DIR
+from src.resources import StageUsage
+from src.profiler import PipelineProfiler
+from src.trace import PipelineTrace, FILTERS_TID
+from src.exporter import DaemonMetrics, write_textfile, start_http_exporter
+from src.console import ConsoleEcho, LogRotator, ECHO_MODES, LOG_MAX_MB, LOG_BACKUPS
 
 # --- Constants ---
 DDD_DIR = ".ddd"
@@ -31,16 +45,198 @@ TRIGGER_FILE = os.path.join(RUN_DIR, "build.request")
 LOG_FILE = os.path.join(RUN_DIR, "build.log")
 RAW_LOG_FILE = os.path.join(RUN_DIR, "last_build.raw.log")
 LOCK_FILE = os.path.join(RUN_DIR, "ipc.lock")
+STATS_HEADER = "\n--- 📊 Build Stats ---\n"
+
+# Bytes requested per read from a stage's stdout pipe
+READ_CHUNK = 64 * 1024
+# Reusable read buffer of a binary capture stage (stage `"capture": "binary"`)
+BINARY_CHUNK = 256 * 1024
+
+# Seconds a cancelled stage gets between SIGTERM and SIGKILL (stage `kill_grace`)
+KILL_GRACE = 2.0
+# build.exit / exit_code of a cancelled pipeline (as for SIGINT in a shell)
+CANCELLED_EXIT = 130
+# build.exit / exit_code of a stage that hit its `timeout` (as coreutils timeout)
+TIMEOUT_EXIT = 124
 
 # Client Injection
 INJECTED_CLIENT = os.path.join(DDD_DIR, "wait")
 MASTER_CLIENT_PATH = os.path.abspath(os.path.join(TOOL_ROOT, "bin", "ddd-wait"))
 
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def _stats_text(duration, raw_bytes, clean_bytes):
+    """build.log's stats footer."""
+    tokens = int(clean_bytes / 4)
+    reduction = (1 - (clean_bytes / raw_bytes)) * 100 if raw_bytes > 0 else 0.0
+    return (
+        f"{STATS_HEADER}"
+        f"⏱  Duration: {duration:.2f}s\n"
+        f"📉 Noise Reduction: {reduction:.1f}% ({raw_bytes} raw → {clean_bytes} clean bytes)\n"
+        f"🪙  Est. Tokens: {tokens}\n"
+    )
+
+
+def _stage_seconds(name, stage_config, key, default=None):
+    """A stage's `key` as a positive number of seconds; `default` (with a warning) if invalid."""
+    value = stage_config.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+        print(f"[!] {name}: ignoring invalid {key} {value!r} (expected a positive number of seconds).")
+        return default
+    return value
+
+async def read_lines(stream, chunk_size=READ_CHUNK, read=None):
+    """
+    Yields decoded lines from an asyncio stream as they arrive.
+    Newlines are translated like text-mode pipes (\r\n and \r become \n);
+    invalid UTF-8 is replaced instead of raising. If given, `read` is a
+    one-item list that counts the bytes read so far.
+    """
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True
+    )
+    pending = ""
+    while True:
+        chunk = await stream.read(chunk_size)
+        if read is not None:
+            read[0] += len(chunk)
+        *lines, pending = (pending + decoder.decode(chunk, final=not chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+async def terminate_process_group(process, grace=KILL_GRACE):
+    """
+    Stops a stage started in its own session: SIGTERM to the whole process
+    group, then SIGKILL to whatever is left after `grace` seconds. This reaches
+    the real build (make, compilers) behind the sh/stdbuf wrappers.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        await asyncio.wait_for(process.wait(), grace)
+    except asyncio.TimeoutError:
+        pass
+    try:
+        # Even if the leader exited, children may still hold the pipe open.
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+class RequestQueue:
+    """
+    Holds build requests until the pipeline is free.
+
+    Every trigger that arrives before the next build starts is folded into
+    that one pending build, so a burst during a running build yields exactly
+    one follow-up and no request is ever dropped. Lives on the event loop.
+    """
+    # One touch can emit several events (created + modified). Events seen
+    # within this window with an identical trigger file state are duplicates.
+    DUPLICATE_WINDOW = 0.2
+
+    def __init__(self):
+        self._wakeup = asyncio.Event()
+        self._pending = None
+        self._last_signature = None
+        self._last_seen = 0.0
+        self._next_build = 1
+        self.total_requests = 0
+        self.total_coalesced = 0
+        self.total_dropped = 0
+
+    def submit(self, signature=None, profile=False):
+        """
+        Queues a request. Returns the id of the build that will serve it,
+        or None if it duplicates the previous event. `profile` marks the
+        pending build for profiling.
+        """
+        now = time.monotonic()
+        if (signature is not None and signature == self._last_signature
+                and now - self._last_seen < self.DUPLICATE_WINDOW):
+            self.total_dropped += 1
+            return None
+        self._last_signature = signature
+        self._last_seen = now
+        self.total_requests += 1
+        if self._pending is None:
+            self._pending = {"build": self._next_build, "queued_at": now, "requests": 1, "profile": profile}
+            self._next_build += 1
+        else:
+            self._pending["requests"] += 1
+            self._pending["profile"] = self._pending["profile"] or profile
+            self.total_coalesced += 1
+        self._wakeup.set()
+        return self._pending["build"]
+
+    async def take(self):
+        """Waits until a request is pending and returns it."""
+        while self._pending is None:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        request, self._pending = self._pending, None
+        return request
+
+    def depth(self):
+        """Number of triggers waiting for the next build."""
+        return self._pending["requests"] if self._pending else 0
+
 class RequestHandler(FileSystemEventHandler):
+    """
+    Owns the build pipeline. Everything runs on one asyncio event loop:
+    watchdog's observer thread only forwards events onto it.
+    """
     def __init__(self):
-        self.last_run = 0
-        self.cooldown = 1.0
+        self.loop = None
+        self.queue = RequestQueue()
+        self.queue_metrics = {}
+        self.last_result = None
+        self.progress = {"state": "idle"}
+        # Supersede mode (target "supersede": true): new requests cancel the running build
+        self.supersede_enabled = False
+        self.cancel_info = None
+        self.timeout_info = None
+        self.current_process = None
+        self.current_grace = KILL_GRACE
+        # Default console echo of stage output (stage `echo` overrides; --echo)
+        self.echo_mode = "full"
+        # daemon.log rotation, set up under --daemon
+        self.log_rotator = None
+        # Build history (.ddd/history), opened on the first recorded build
+        self.history = None
+        # Lifetime counters for --metrics-textfile / --metrics-port
+        self.metrics = DaemonMetrics(os.getcwd())
+        self.metrics_textfile = None
+        # Pipeline step timings of the current build (job_result "timings")
+        self.timings = {}
+        self._cpu_start = 0.0
+        # Duration shown in build.log's stats footer (kept when shaping rewrites it)
+        self._stats_duration = 0.0
+        # Whether this build has started writing build.log
+        self._log_opened = False
+        # Chrome trace of the current build (.ddd/run/trace.json); --trace or target "trace"
+        self.trace = PipelineTrace()
+        self.trace_all = False
+        # Pipelines still to run under the profiler (--profile N)
+        self.profile_builds = 0
+        # Summaries of recent builds for socket clients, keyed by build id
+        self._completed = {}
+        self._waiters = {}
         self.stdbuf_available = bool(shutil.which("stdbuf"))
+        self.stage_metrics = {}
+        # Input-hash result cache (target "cache": {"inputs": [...]})
+        self.build_cache = None
+        self.cache_metrics = None
+        self._target = None
         self.inject_client()
 
     def inject_client(self):
@@ -66,24 +262,275 @@ class RequestHandler(FileSystemEventHandler):
             print(f"[!] Error reading config: {e}")
             return None
 
-    def run_pipeline(self):
-        if time.time() - self.last_run < self.cooldown:
+    async def serve_forever(self):
+        """Runs one pipeline per (coalesced) request, forever."""
+        while True:
+            request = await self.queue.take()
+            # One bad build (config, plugin, disk) must not take the daemon down.
+            try:
+                await self.run_pipeline(request)
+                if self.last_result:
+                    self.metrics.observe_build(self.last_result)
+                self.export_metrics()
+                await self._record_history(request)
+                if self.log_rotator:
+                    self.log_rotator.maybe_rotate()
+            except Exception:
+                print(f"[!] Error after build #{request['build']}:")
+                traceback.print_exc()
+
+    def submit_request(self, signature=None, supersede=False, profile=False):
+        """
+        Queues a build request. Returns the id of the build that will serve it.
+        In supersede mode the running build is cancelled in favour of it.
+        """
+        ticket = self.queue.submit(signature, profile)
+        if ticket is not None and (supersede or self.supersede_enabled):
+            self.cancel_build(f"superseded by build #{ticket}", superseded_by=ticket)
+        return ticket
+
+    def cancel_build(self, reason, superseded_by=None):
+        """Cancels the running build, killing its process group. False if idle."""
+        if self.progress.get("state") != "building":
+            return False
+        if self.cancel_info is None:
+            print(f"[!] Cancelling build: {reason}")
+            self.cancel_info = {"reason": reason, "superseded_by": superseded_by}
+            if self.current_process is not None:
+                asyncio.ensure_future(terminate_process_group(self.current_process, self.current_grace))
+        return True
+
+    def _stage_timed_out(self, name, timeout, grace):
+        print(f"[!] {name} exceeded its {timeout}s timeout; killing process group.")
+        self.timeout_info = {"stage": name, "timeout": timeout, "kill_grace": grace}
+        if self.current_process is not None:
+            asyncio.ensure_future(terminate_process_group(self.current_process, grace))
+
+    async def wait_for_build(self, build_id, timeout=None):
+        """
+        Waits until build `build_id` has finished and returns its summary.
+        If it was superseded, waits for the build that replaced it instead.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while True:
+            summary = self._completed.get(build_id)
+            if summary is None:
+                future = self._waiters.get(build_id)
+                if future is None:
+                    future = self._waiters[build_id] = loop.create_future()
+                remaining = None if deadline is None else max(0, deadline - loop.time())
+                try:
+                    summary = await asyncio.wait_for(asyncio.shield(future), remaining)
+                except asyncio.TimeoutError:
+                    return None
+            successor = (summary.get("cancelled") or {}).get("superseded_by")
+            if not successor:
+                return summary
+            build_id = successor
+
+    def status(self):
+        """Snapshot of what the daemon is doing, for socket clients."""
+        status = dict(self.progress, queue_depth=self.queue.depth())
+        if "started" in status:
+            status["elapsed"] = time.monotonic() - status.pop("started")
+        return status
+
+    def render_metrics(self):
+        return self.metrics.render(self.queue, self.progress)
+
+    def export_metrics(self):
+        """Rewrites the node-exporter textfile, if one is configured."""
+        if not self.metrics_textfile:
+            return
+        try:
+            write_textfile(self.metrics_textfile, self.render_metrics())
+        except OSError as e:
+            print(f"[!] Could not write metrics to {self.metrics_textfile}: {e}")
+
+    async def _record_history(self, request):
+        """
+        Adds the finished build to .ddd/history. Runs after clients have been
+        notified and before the next build can overwrite the run directory.
+        """
+        if not self.last_result or self._target is None:
+            return
+        self.history = HistoryStore.from_target(self._target, self.history)
+        if not self.history:
+            return
+        result = self.last_result
+        summary = {
+            "build": request["build"],
+            "timestamp": result.get("timestamp"),
+            "success": result.get("success"),
+            "exit_code": result.get("exit_code"),
+            "duration": result.get("duration"),
+            "cached": bool((result.get("cache") or {}).get("hit"))
+        }
+        loop = asyncio.get_running_loop()
+        try:
+            entry = await loop.run_in_executor(None, self.history.record, RUN_DIR, summary)
+        except OSError as e:
+            print(f"[!] Could not record build history: {e}")
             return
-        self.last_run = time.time()
+        print(f"[i] Recorded history #{entry['id']} in {entry['record_ms']} ms.")
+
+    async def history_lookup(self, n=None, restore=False):
+        """
+        Socket `history` command: all recorded builds (newest first), or the
+        Nth previous one, optionally restored to .ddd/history/restored/<id>/.
+        """
+        store = self.history
+        if store is None and os.path.isdir(HISTORY_DIR):
+            store = self.history = HistoryStore()
+        if store is None:
+            return {"builds": []}
+        if n is None:
+            return {"builds": [store.get(i) for i in range(len(store.builds))]}
+        entry = store.get(int(n))
+        if entry is None:
+            return {"build": None}
+        reply = {"build": entry}
+        if restore:
+            dest = os.path.join(store.history_dir, "restored", str(entry["id"]))
+            loop = asyncio.get_running_loop()
+            reply["restored"] = await loop.run_in_executor(None, store.restore, entry, dest)
+        return reply
+
+    def _notify_completed(self, build_id):
+        result = self.last_result or {"success": False, "exit_code": 1,
+                                      "error": "Pipeline did not run (check .ddd/config.json)."}
+        summary = dict(result, event="done", build=build_id,
+                       log=os.path.abspath(LOG_FILE),
+                       raw_log=os.path.abspath(RAW_LOG_FILE),
+                       result=os.path.abspath(os.path.join(RUN_DIR, "job_result.json")))
+        self._completed[build_id] = summary
+        # Clients wait for recent builds only; keep the map small.
+        for old in [b for b in self._completed if b <= build_id - 16]:
+            del self._completed[old]
+        future = self._waiters.pop(build_id, None)
+        if future and not future.done():
+            future.set_result(summary)
+
+    async def run_pipeline(self, request=None):
+        request = request or {"build": None, "queued_at": time.monotonic(), "requests": 1}
+        self.last_result = None
+        self.cancel_info = None
+        self.timeout_info = None
+        self.cache_metrics = None
+        self.timings = {}
+        self._log_opened = False
+        self.trace = PipelineTrace(request["queued_at"], enabled=self.trace_all)
         print(f"\n[>>>] Signal received: {TRIGGER_FILE}")
-        
+        if request["requests"] > 1:
+            print(f"[i] Coalesced {request['requests']} requests into one build.")
+
+        self.queue_metrics = {
+            "requests": request["requests"],
+            "coalesced": request["requests"] - 1,
+            "wait": time.monotonic() - request["queued_at"],
+            "total_requests": self.queue.total_requests,
+            "total_coalesced": self.queue.total_coalesced
+        }
+        self.progress = {"state": "building", "build": request["build"], "started": time.monotonic()}
+
         with open(LOCK_FILE, 'w') as f:
             f.write(str(time.time()))
+        # From the (oldest coalesced) trigger to holding the lock
+        self.timings["trigger_to_lock_ms"] = _ms(time.monotonic() - request["queued_at"])
+        self.trace.complete("request", self.trace.origin, time.perf_counter(), args={
+            "build": request["build"], "requests": request["requests"]
+        })
 
+        profiler = self._start_profiler(request)
+        start_time = time.time()
         try:
-            self._execute_logic()
+            try:
+                await self._execute_logic()
+                self._apply_budget()
+            finally:
+                if profiler:
+                    self._stop_profiler(profiler)
+            self._finalize_result()
+            await self._store_in_cache()
+        except Exception as e:
+            self._pipeline_failed(e, start_time)
         finally:
-            if os.path.exists(LOCK_FILE):
+            self.progress = {"state": "idle", "last_build": request["build"]}
+            # Keep the lock while a follow-up build is queued, so clients
+            # that triggered it wait for its output rather than this one's.
+            if not self.queue.depth() and os.path.exists(LOCK_FILE):
                 os.remove(LOCK_FILE)
+            if request["build"] is not None:
+                self._notify_completed(request["build"])
+            self._write_trace(request)
+
+    def _pipeline_failed(self, error, start_time):
+        """
+        Records a pipeline that raised as a failed build, so clients get a
+        build.exit and job_result.json instead of a stale log.
+        """
+        message = f"{type(error).__name__}: {error}"
+        print(f"[!] Pipeline error: {message}")
+        traceback.print_exc()
+        if self.current_process is not None:
+            asyncio.ensure_future(terminate_process_group(self.current_process, self.current_grace))
+            self.current_process = None
+        try:
+            # Append to this build's log; replace a previous build's.
+            with open(LOG_FILE, "a" if self._log_opened else "w") as f:
+                f.write(f"\n--- PIPELINE ERROR: {message} (see the daemon log) ---\n")
+            self._write_artifacts(False, time.time() - start_time, 0, 0, error=message)
+        except OSError as e:
+            print(f"[!] Could not write failure artifacts: {e}")
+
+    def _start_profiler(self, request):
+        """A running profiler if this build is to be profiled, else None."""
+        if not request.get("profile"):
+            if self.profile_builds <= 0:
+                return None
+            self.profile_builds -= 1
+        profiler = PipelineProfiler([
+            (os.path.join(DDD_DIR, "filters"), os.path.join(DDD_DIR, "filters")),
+            (os.path.join(CURRENT_DIR, "filters"), "ddd/filters")
+        ])
+        profiler.start()
+        print("[i] Profiling this build.")
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        try:
+            profile = profiler.stop(RUN_DIR)
+        except OSError as e:
+            print(f"[!] Could not write profile: {e}")
+            return
+        if self.last_result is not None:
+            self.last_result["profile"] = profile
+        hottest = next(iter(profile["filters"].items()), None)
+        if hottest:
+            print(f"[i] Profile: {hottest[0]} spent {hottest[1]} ms; see {profile['pstats']}")
+        else:
+            print(f"[i] Profile written to {profile['pstats']}")
 
-    def _write_artifacts(self, success, duration, raw_bytes, clean_bytes):
+    def _write_trace(self, request):
+        if not self.trace.enabled:
+            return
+        try:
+            path = self.trace.write(RUN_DIR, build=request["build"], project=os.getcwd(),
+                                    success=(self.last_result or {}).get("success"))
+        except OSError as e:
+            print(f"[!] Could not write trace: {e}")
+            return
+        print(f"[i] Trace written to {path}")
+
+    def _write_artifacts(self, success, duration, raw_bytes, clean_bytes, error=None):
         """Writes build.exit and job_result.json for external observability."""
+        step = time.perf_counter()
         exit_code = 0 if success else 1
+        if self.cancel_info:
+            exit_code = CANCELLED_EXIT
+        elif self.timeout_info:
+            exit_code = TIMEOUT_EXIT
         
         # 1. Atomic Exit Code
         exit_file = os.path.join(RUN_DIR, "build.exit")
@@ -97,21 +544,44 @@ class RequestHandler(FileSystemEventHandler):
             "duration": duration,
             "metrics": {
                 "raw_bytes": raw_bytes,
-                "clean_bytes": clean_bytes
+                "clean_bytes": clean_bytes,
+                "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "stages": self.stage_metrics
             },
+            "queue": dict(self.queue_metrics, depth=self.queue.depth()),
+            "cancelled": self.cancel_info,
+            "timed_out": self.timeout_info,
+            "cache": self.cache_metrics,
+            "timings": self.timings,
             "timestamp": time.time(),
             "pid": os.getpid()
         }
+        if error:
+            result["error"] = error
+        # Daemon-side CPU (filters, decoding, IO) for the whole pipeline
+        self.timings["cpu_ms"] = _ms(time.process_time() - self._cpu_start)
         
         result_file = os.path.join(RUN_DIR, "job_result.json")
         with open(result_file, "w") as f:
             json.dump(result, f, indent=2)
+        self.last_result = result
+        done = time.perf_counter()
+        self.timings["artifacts_ms"] = _ms(done - step)
+        self.trace.complete("write artifacts", step, done, "artifacts")
 
-    def _execute_logic(self):
+    async def _execute_logic(self):
         start_time = time.time()
+        step = time.perf_counter()
         load_plugins(project_root=os.getcwd())
+        done = time.perf_counter()
+        self.timings["load_plugins_ms"] = _ms(done - step)
+        self.trace.complete("load_plugins", step, done)
         
+        step = time.perf_counter()
         config = self.load_config()
+        done = time.perf_counter()
+        self.timings["config_ms"] = _ms(done - step)
+        self.trace.complete("load config", step, done)
         if not config: return
 
         target_name = "dev"
@@ -123,6 +593,24 @@ class RequestHandler(FileSystemEventHandler):
         total_raw_bytes = 0
         total_clean_bytes = 0
         success = True
+        self.stage_metrics = {}
+        self._cpu_start = time.process_time()
+        self.supersede_enabled = bool(target.get("supersede", False))
+        self.trace.enabled = self.trace_all or bool(target.get("trace", False))
+
+        # --- Result cache: replay instead of rebuilding unchanged inputs ---
+        self.build_cache = BuildCache.from_target(target, self.build_cache)
+        self._target = target
+        if self.build_cache:
+            loop = asyncio.get_running_loop()
+            with self.trace.span("cache lookup", "cache"):
+                self.cache_metrics = await loop.run_in_executor(None, self.build_cache.compute_key, target)
+                self.cache_metrics["hit"] = False
+                entry = self.build_cache.lookup(self.cache_metrics["key"])
+            if entry:
+                with self.trace.span("cache replay", "cache"):
+                    self._replay_cached(entry, start_time)
+                return
 
         # --- TASK 2: Sentinel Logic (Setup) ---
         sentinel_file = target.get("sentinel_file")
@@ -133,22 +621,36 @@ class RequestHandler(FileSystemEventHandler):
                 pass
 
         with open(LOG_FILE, "w") as f_clean, open(RAW_LOG_FILE, "w") as f_raw:
+            self._log_opened = True
             header = f"=== Pipeline: {target_name} ({time.ctime()}) ===\n"
             f_clean.write(header)
             f_raw.write(header)
             
             # STAGE 1: BUILD
             build_cfg = target.get("build", {})
-            build_success, raw_len, clean_len = self._run_stage("BUILD", build_cfg, f_clean, f_raw)
+            build_success, raw_len, clean_len = await self._run_stage("BUILD", build_cfg, f_clean, f_raw)
             total_raw_bytes += raw_len
             total_clean_bytes += clean_len
             
             if not build_success:
                 success = False
+
+            # Cancelled (or superseded) while building: nothing else runs.
+            if self.cancel_info:
+                f_clean.write(f"\n--- PIPELINE CANCELLED: {self.cancel_info['reason']} ---\n")
+                self._write_stats(f_clean, start_time, total_raw_bytes, total_clean_bytes)
+                self._write_artifacts(False, time.time() - start_time, total_raw_bytes, total_clean_bytes)
+                return
             
             # --- TASK 2: Sentinel Check ---
             sentinel_success = False
-            if sentinel_file and os.path.exists(sentinel_file):
+            step = time.perf_counter()
+            sentinel_found = bool(sentinel_file) and os.path.exists(sentinel_file)
+            if sentinel_file:
+                self.trace.complete("sentinel check", step, time.perf_counter(),
+                                    args={"file": sentinel_file, "found": sentinel_found})
+            # A killed build never counts as a background success.
+            if sentinel_found and not self.timeout_info:
                 print(f"[+] Sentinel found: {sentinel_file}")
                 sentinel_success = True
                 success = True # Override build failure if sentinel appears (e.g. background success)
@@ -161,33 +663,112 @@ class RequestHandler(FileSystemEventHandler):
             # STAGE 2: VERIFY
             verify_cfg = target.get("verify", {})
             if "cmd" in verify_cfg:
-                v_success, raw_len, clean_len = self._run_stage("VERIFY", verify_cfg, f_clean, f_raw)
+                v_success, raw_len, clean_len = await self._run_stage("VERIFY", verify_cfg, f_clean, f_raw)
                 total_raw_bytes += raw_len
                 total_clean_bytes += clean_len
                 if not v_success:
                     success = False
+                if self.cancel_info:
+                    f_clean.write(f"\n--- PIPELINE CANCELLED: {self.cancel_info['reason']} ---\n")
+                    success = False
 
             self._write_stats(f_clean, start_time, total_raw_bytes, total_clean_bytes)
             self._write_artifacts(success, time.time() - start_time, total_raw_bytes, total_clean_bytes)
 
         print(f"[*] Pipeline Complete.")
 
+    def _replay_cached(self, entry, start_time):
+        """Restores a cached build's artifacts in place of running it."""
+        result = self.build_cache.replay(entry, RUN_DIR)
+        built_at = result.get("timestamp")
+        print(f"[i] Inputs unchanged; replaying cached result ({self.cache_metrics['key'][:12]}).")
+        with open(LOG_FILE, "a") as f:
+            f.write(f"\n--- ♻️  Replayed from cache: inputs unchanged since {time.ctime(built_at)} ---\n")
+
+        self.cache_metrics["hit"] = True
+        # The cached build's profile files are not replayed
+        result.pop("profile", None)
+        result.update({
+            "duration": time.time() - start_time,
+            "queue": dict(self.queue_metrics, depth=self.queue.depth()),
+            "cache": dict(self.cache_metrics, built_at=built_at, built_duration=result.get("duration")),
+            "timestamp": time.time(),
+            "pid": os.getpid()
+        })
+        with open(os.path.join(RUN_DIR, "job_result.json"), "w") as f:
+            json.dump(result, f, indent=2)
+        self.last_result = result
+
+    def _apply_budget(self):
+        """Cuts build.log down to the target's `max_tokens`, if one is set."""
+        max_tokens = (self._target or {}).get("max_tokens")
+        if not max_tokens or not self.last_result or (self.cache_metrics or {}).get("hit"):
+            return
+        step = time.perf_counter()
+        ranges = {name: m["raw_offsets"] for name, m in self.stage_metrics.items() if "raw_offsets" in m}
+        size = os.path.getsize(LOG_FILE)
+        with self.trace.span("token budget", "artifacts", max_tokens=max_tokens):
+            budget = shape_log(LOG_FILE, RAW_LOG_FILE, int(max_tokens), ranges)
+        if budget["shaped"]:
+            # The footer and metrics describe the log the agent will read.
+            metrics = self.last_result["metrics"]
+            clean_bytes = metrics["clean_bytes"] + os.path.getsize(LOG_FILE) - size
+            self._rewrite_stats(metrics["raw_bytes"], clean_bytes)
+            budget["clean_bytes_before"] = metrics["clean_bytes"]
+            metrics["clean_bytes"] = clean_bytes
+            budget["tokens"] = estimate_tokens(os.path.getsize(LOG_FILE))
+            print(f"[i] build.log shaped to ~{budget['tokens']} tokens (max_tokens={max_tokens}, was ~{budget['tokens_before']}).")
+        self.last_result["budget"] = budget
+        self.timings["budget_ms"] = _ms(time.perf_counter() - step)
+
+    def _finalize_result(self):
+        """Rewrites job_result.json with the steps that ran after it was first written."""
+        if not self.last_result:
+            return
+        self.last_result["timings"] = self.timings
+        with self.trace.span("finalize job_result", "artifacts"):
+            with open(os.path.join(RUN_DIR, "job_result.json"), "w") as f:
+                json.dump(self.last_result, f, indent=2)
+
+    async def _store_in_cache(self):
+        """Caches a finished build, unless it was cut short or inputs moved mid-build."""
+        metrics = self.cache_metrics
+        if not (self.build_cache and metrics and self.last_result) or metrics["hit"]:
+            return
+        if self.cancel_info or self.timeout_info:
+            return
+        loop = asyncio.get_running_loop()
+        after = await loop.run_in_executor(None, self.build_cache.compute_key, self._target)
+        if after["key"] != metrics["key"]:
+            print("[i] Inputs changed during the build; result not cached.")
+            return
+        try:
+            with self.trace.span("cache store", "cache"):
+                await loop.run_in_executor(None, self.build_cache.store, metrics["key"], RUN_DIR)
+        except OSError as e:
+            print(f"[!] Could not cache build result: {e}")
+
     def _write_stats(self, f_handle, start_time, raw_bytes, clean_bytes):
-        duration = time.time() - start_time
-        tokens = int(clean_bytes / 4)
-        reduction = (1 - (clean_bytes / raw_bytes)) * 100 if raw_bytes > 0 else 0.0
-
-        stats = (
-            f"\n--- 📊 Build Stats ---\n"
-            f"⏱  Duration: {duration:.2f}s\n"
-            f"📉 Noise Reduction: {reduction:.1f}% ({raw_bytes} raw → {clean_bytes} clean bytes)\n"
-            f"🪙  Est. Tokens: {tokens}\n"
-        )
-        f_handle.write(stats)
+        self._stats_duration = time.time() - start_time
+        f_handle.write(_stats_text(self._stats_duration, raw_bytes, clean_bytes))
+
+    def _rewrite_stats(self, raw_bytes, clean_bytes):
+        """Replaces build.log's stats footer, e.g. after shaping changed its size."""
+        with open(LOG_FILE, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        footer = text.rfind(STATS_HEADER)
+        if footer < 0:
+            return
+        with open(LOG_FILE, "w", encoding="utf-8") as f:
+            f.write(text[:footer] + _stats_text(self._stats_duration, raw_bytes, clean_bytes))
 
-    def _run_stage(self, name, stage_config, f_clean, f_raw):
+    async def _run_stage(self, name, stage_config, f_clean, f_raw):
         cmd = stage_config.get("cmd")
         if not cmd: return (True, 0, 0)
+        # Cancelled (or superseded) before the stage started: don't start it.
+        if self.cancel_info:
+            print(f"[i] {name} skipped: build cancelled.")
+            return (False, 0, 0)
 
         # --- FIX: Safe Buffering Injection ---
         # We must wrap the command in 'sh -c' so stdbuf has a valid binary (sh) to execute,
@@ -199,6 +780,7 @@ class RequestHandler(FileSystemEventHandler):
 
         print(f"[+] Running {name}: {cmd}")
         f_raw.write(f"\n--- {name} RAW OUTPUT ---\n")
+        raw_start = f_raw.tell()
         
         filter_entry = stage_config.get("filter", "raw")
         if isinstance(filter_entry, str):
@@ -206,38 +788,118 @@ class RequestHandler(FileSystemEventHandler):
         else:
             filter_names = filter_entry
 
-        process = subprocess.Popen(
-            cmd, 
-            shell=True, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1
+        timeout = _stage_seconds(name, stage_config, "timeout")
+        grace = float(_stage_seconds(name, stage_config, "kill_grace", KILL_GRACE))
+
+        stage_start = time.perf_counter()
+        stage_cpu = time.process_time()
+        # What the stage's process tree uses (rusage, cgroup v2, PSI)
+        usage = StageUsage(use_cgroup=stage_config.get("cgroup", True))
+        usage.start(name)
+        binary = stage_config.get("capture") == "binary"
+        if binary:
+            # Our own pipe: read straight into one buffer, bypassing StreamReader.
+            read_fd, write_fd = os.pipe()
+        process = await asyncio.create_subprocess_shell(
+            usage.wrap(cmd),
+            stdout=write_fd if binary else asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            # Own session/process group, so cancellation reaches the whole tree
+            start_new_session=True
         )
+        if binary:
+            os.close(write_fd)
+        spawned = time.perf_counter()
+        self.current_process = process
+        self.current_grace = grace
+        # A cancel that arrived while the process was being spawned found no
+        # process to kill.
+        if self.cancel_info:
+            asyncio.ensure_future(terminate_process_group(process, self.current_grace))
+        timer = None
+        if timeout:
+            timer = asyncio.get_running_loop().call_later(
+                timeout, self._stage_timed_out, name, timeout, self.current_grace
+            )
         
-        raw_output_buffer = []
+        # Filters run line by line while the build is still producing output.
+        # Filters see the stage name as config["stage"] (e.g. per-stage state files)
+        chain = FilterChain(filter_names, dict(stage_config, stage=name))
+        echo = ConsoleEcho(stage_config.get("echo", self.echo_mode), loop=asyncio.get_running_loop())
         raw_bytes = 0
-        
-        for line in process.stdout:
-            print(line, end='')
-            f_raw.write(line)
-            raw_output_buffer.append(line)
-            raw_bytes += len(line)
-        
-        process.wait()
-
-        current_text = "".join(raw_output_buffer)
-        for fname in filter_names:
-            FilterClass = REGISTRY.get(fname)
-            if not FilterClass:
-                print(f"[!] Warning: Filter '{fname}' not found. Skipping.")
-                continue
-            processor = FilterClass(stage_config)
-            current_text = processor.process(current_text)
-
-        clean_bytes = len(current_text)
+        clean_bytes = 0
+        first_output = None
         f_clean.write(f"\n--- {name} OUTPUT ---\n")
-        f_clean.write(current_text)
+        self.progress.update(stage=name, raw_bytes=0, lines=0)
+        stop_counters = None
+        if self.trace.enabled:
+            stop_counters = self.trace.sample_stage(asyncio.get_running_loop(), self.progress, chain)
+        
+        try:
+            if binary:
+                raw_bytes, clean_bytes, first_output = await self._capture_binary(read_fd, chain, echo, f_clean, f_raw)
+            else:
+                # Bytes as read from the pipe, like binary mode (not decoded characters)
+                read = [0]
+                async for line in read_lines(process.stdout, read=read):
+                    if first_output is None:
+                        first_output = time.perf_counter()
+                    echo.write(line)
+                    f_raw.write(line)
+                    raw_bytes = read[0]
+                    clean = chain.feed(line)
+                    if clean:
+                        f_clean.write(clean)
+                        clean_bytes += len(clean.encode())
+                    self.progress["raw_bytes"] = raw_bytes
+                    self.progress["lines"] += 1
+
+            output_end = time.perf_counter()
+            await process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self.current_process = None
+            if process.returncode is None:
+                # Left early (a filter raised): don't leave the stage running.
+                asyncio.ensure_future(terminate_process_group(process, self.current_grace))
+            echo.close()
+            resources = usage.stop()
+            if stop_counters:
+                stop_counters()
+        exited = time.perf_counter()
+
+        for clean in chain.drain():
+            if clean:
+                f_clean.write(clean)
+                clean_bytes += len(clean.encode())
+        done = time.perf_counter()
+
+        capture = chain.capture_stats()
+        if capture["spill_events"]:
+            print(f"[i] {name} output exceeded the capture limit; spilled {capture['spilled_bytes']} bytes to disk.")
+        self.stage_metrics[name] = {
+            "capture": capture,
+            "raw_offsets": [raw_start, f_raw.tell()],
+            "timing": {
+                "wall_ms": _ms(done - stage_start),
+                # Daemon CPU (reading, echo, filters), not the build's own
+                "cpu_ms": _ms(time.process_time() - stage_cpu),
+                "spawn_ms": _ms(spawned - stage_start),
+                "first_output_ms": _ms(first_output - spawned) if first_output else None,
+                "output_ms": _ms(output_end - spawned),
+                "wait_ms": _ms(exited - output_end),
+                "filter_finish_ms": _ms(done - exited)
+            },
+            "filters": chain.timing_stats(),
+            "resources": resources
+        }
+        if self.trace.enabled:
+            self._trace_stage(name, chain, stage_start, spawned, first_output, output_end, exited, done, raw_bytes)
+
+        if self.timeout_info and self.timeout_info["stage"] == name:
+            f_clean.write(f"\n--- {name} TIMED OUT after {timeout}s (process group killed) ---\n")
+            return (False, raw_bytes, clean_bytes)
 
         if process.returncode != 0:
             print(f"[-] {name} Failed (Exit: {process.returncode}).")
@@ -245,13 +907,116 @@ class RequestHandler(FileSystemEventHandler):
             
         return (True, raw_bytes, clean_bytes)
 
+    def _trace_stage(self, name, chain, start, spawned, first_output, output_end, exited, done, raw_bytes):
+        trace = self.trace
+        trace.complete(name, start, done, "stage", args={"raw_bytes": raw_bytes})
+        trace.complete("spawn", start, spawned, "stage")
+        if first_output:
+            trace.complete("await first output", spawned, first_output, "stage")
+        trace.complete("output", first_output or spawned, output_end, "stage")
+        trace.complete("wait for exit", output_end, exited, "stage")
+        trace.complete("filter finish", exited, done, "stage")
+        # finish_ms excludes the time drain() spent suspended in our writes
+        for (filter_name, started, ended), stats in zip(chain.finish_spans, chain.timing_stats()):
+            trace.complete(f"{filter_name}.finish", started, ended, "filter",
+                           {"stage": name, "finish_ms": stats["finish_ms"], "feed_ms": stats["feed_ms"]},
+                           tid=FILTERS_TID)
+
+    async def _capture_binary(self, fd, chain, echo, f_clean, f_raw):
+        """
+        Pumps a stage's output pipe in binary capture mode. Each read lands in
+        one reusable buffer; the bytes go to the raw log (and, with echo
+        `full`, the console) as they are, and only the filter chain gets
+        decoded text, a whole chunk at a time (invalid UTF-8 replaced).
+        Returns (raw_bytes, clean_bytes, time of the first output or None).
+        """
+        loop = asyncio.get_running_loop()
+        buf = bytearray(BINARY_CHUNK)
+        view = memoryview(buf)
+        decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True
+        )
+        # Text written so far must land before the bytes written below.
+        f_raw.flush()
+        raw_out = f_raw.buffer
+        sys.stdout.flush()
+        raw_echo = getattr(sys.stdout, "buffer", None) if echo.mode == "full" else None
+        totals = [0, 0]
+        first_output = []
+        done = loop.create_future()
+
+        def pump():
+            try:
+                n = os.readv(fd, [buf])
+            except BlockingIOError:
+                return
+            except OSError:
+                n = 0
+            if not n:
+                loop.remove_reader(fd)
+                if not done.done():
+                    done.set_result(None)
+                return
+            if not first_output:
+                first_output.append(time.perf_counter())
+            chunk = view[:n]
+            raw_out.write(chunk)
+            if raw_echo is not None:
+                raw_echo.write(chunk)
+            text = decoder.decode(chunk)
+            totals[0] += n
+            if text:
+                if raw_echo is None:
+                    echo.write(text)
+                clean = chain.feed_chunk(text)
+                if clean:
+                    f_clean.write(clean)
+                    totals[1] += len(clean.encode())
+                self.progress["lines"] += text.count("\n")
+            self.progress["raw_bytes"] = totals[0]
+
+        os.set_blocking(fd, False)
+        loop.add_reader(fd, pump)
+        try:
+            await done
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+            if raw_echo is not None:
+                raw_echo.flush()
+
+        text = decoder.decode(b"", final=True)
+        if text:
+            if raw_echo is None:
+                echo.write(text)
+            clean = chain.feed_chunk(text)
+            if clean:
+                f_clean.write(clean)
+                totals[1] += len(clean.encode())
+        return totals[0], totals[1], first_output[0] if first_output else None
+
+    def _trigger_signature(self):
+        try:
+            st = os.stat(TRIGGER_FILE)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_ctime_ns)
+
+    def _forward_trigger(self):
+        # Called on watchdog's observer thread: hand the request to the loop.
+        signature = self._trigger_signature()
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.submit_request, signature)
+        else:
+            self.submit_request(signature)
+
     def on_modified(self, event):
         if os.path.basename(event.src_path) == "build.request":
-            self.run_pipeline()
+            self._forward_trigger()
             
     def on_created(self, event):
         if os.path.basename(event.src_path) == "build.request":
-            self.run_pipeline()
+            self._forward_trigger()
 
 def daemonize():
     """Double-fork daemonization routine."""
@@ -315,10 +1080,50 @@ def daemonize():
         os.dup2(f.fileno(), sys.stdout.fileno())
         os.dup2(f.fileno(), sys.stderr.fileno())
 
+async def serve(handler, metrics_port=None):
+    """Daemon main loop: file events, socket clients and builds share one event loop."""
+    handler.loop = asyncio.get_running_loop()
+
+    observer = Observer()
+    observer.schedule(handler, path=RUN_DIR, recursive=False)
+    observer.start()
+
+    # Socket clients get a push notification instead of polling ipc.lock.
+    server = await start_ipc_server(RUN_DIR, handler)
+    if handler.log_rotator:
+        handler.log_rotator.watch(handler.loop)
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = await start_http_exporter(metrics_port, handler.render_metrics)
+    handler.export_metrics()
+    try:
+        await handler.serve_forever()
+    finally:
+        observer.stop()
+        observer.join()
+        if server:
+            server.close()
+        if metrics_server:
+            metrics_server.close()
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--daemon", action="store_true", help="Run as a background daemon")
+    parser.add_argument("--echo", choices=ECHO_MODES,
+                        help="Console echo of build output (default: full, batched with --daemon)")
+    parser.add_argument("--log-max-mb", type=float, default=LOG_MAX_MB,
+                        help="Rotate .ddd/daemon.log at this size under --daemon (0 disables)")
+    parser.add_argument("--log-backups", type=int, default=LOG_BACKUPS,
+                        help="Rotated daemon.log files to keep")
+    parser.add_argument("--metrics-textfile", metavar="PATH",
+                        help="Write Prometheus metrics to this node-exporter textfile after each build")
+    parser.add_argument("--trace", action="store_true",
+                        help="Write .ddd/run/trace.json (Chrome trace format) for every build")
+    parser.add_argument("--profile", type=int, nargs="?", const=1, default=0, metavar="N",
+                        help="Profile the next N builds (default 1); writes profile.pstats/.collapsed to .ddd/run")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
     args = parser.parse_args()
 
     if not os.path.exists(DDD_DIR):
@@ -342,12 +1147,16 @@ if __name__ == "__main__":
     print(f"[*] Watching: {os.path.abspath(RUN_DIR)}/build.request")
     
     event_handler = RequestHandler()
-    observer = Observer()
-    observer.schedule(event_handler, path=RUN_DIR, recursive=False)
-    observer.start()
-
+    event_handler.echo_mode = args.echo or ("batched" if args.daemon else "full")
+    event_handler.trace_all = args.trace
+    event_handler.profile_builds = args.profile
+    if args.metrics_textfile:
+        event_handler.metrics_textfile = os.path.abspath(args.metrics_textfile)
+    if args.daemon:
+        event_handler.log_rotator = LogRotator(
+            os.path.join(DDD_DIR, "daemon.log"), int(args.log_max_mb * 1024 * 1024), args.log_backups
+        )
     try:
-        while True: time.sleep(1)
+        asyncio.run(serve(event_handler, args.metrics_port))
     except KeyboardInterrupt:
-        observer.stop()
-    observer.join()
+        pass
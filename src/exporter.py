@@ -0,0 +1,211 @@
+"""
+Prometheus metrics for the daemon.
+
+Counters and histograms accumulate over the daemon's lifetime and are
+exposed in the Prometheus text format, either as a node-exporter textfile
+(--metrics-textfile) or on a localhost HTTP endpoint (--metrics-port):
+
+    ddd_builds_total{project="/src/app",result="failure"} 3
+    ddd_build_duration_seconds_bucket{project="/src/app",le="30"} 41
+
+Every series carries a `project` label (the project root), so the files of
+several daemons on one host can share a textfile directory.
+"""
+import asyncio
+import bisect
+import os
+import resource
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 15, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects it."""
+
+    def __init__(self, buckets):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * len(self.bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        running = 0
+        for bound, count in zip(self.bounds, self.counts):
+            running += count
+            yield f"{name}_bucket{_labels(dict(labels, le=_number(float(bound))))} {running}"
+        yield f"{name}_bucket{_labels(dict(labels, le='+Inf'))} {self.count}"
+        yield f"{name}_sum{_labels(labels)} {_number(round(self.sum, 6))}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+def _rss_bytes():
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class DaemonMetrics:
+    """Lifetime build metrics of one daemon."""
+
+    def __init__(self, project):
+        self.project = project
+        self.builds = {}            # result -> count
+        self.cache_hits = 0
+        self.raw_bytes = 0
+        self.clean_bytes = 0
+        self.build_duration = Histogram(DURATION_BUCKETS)
+        self.queue_wait = Histogram(WAIT_BUCKETS)
+        self.stage_duration = {}    # stage -> Histogram
+        self.filter_seconds = {}    # filter -> seconds
+        self.last_build = None
+
+    def observe_build(self, result):
+        """Folds one job_result into the totals."""
+        if result.get("cancelled"):
+            outcome = "cancelled"
+        elif result.get("timed_out"):
+            outcome = "timeout"
+        else:
+            outcome = "success" if result.get("success") else "failure"
+        self.builds[outcome] = self.builds.get(outcome, 0) + 1
+        if (result.get("cache") or {}).get("hit"):
+            self.cache_hits += 1
+        self.build_duration.observe(result.get("duration") or 0.0)
+        self.queue_wait.observe((result.get("queue") or {}).get("wait") or 0.0)
+        self.last_build = result.get("timestamp")
+
+        metrics = result.get("metrics") or {}
+        self.raw_bytes += metrics.get("raw_bytes", 0)
+        self.clean_bytes += metrics.get("clean_bytes", 0)
+        for stage, data in (metrics.get("stages") or {}).items():
+            wall_ms = (data.get("timing") or {}).get("wall_ms")
+            if wall_ms is not None:
+                self.stage_duration.setdefault(stage, Histogram(DURATION_BUCKETS)).observe(wall_ms / 1000)
+            for f in data.get("filters") or []:
+                ms = f.get("feed_ms", 0) + f.get("finish_ms", 0)
+                self.filter_seconds[f["name"]] = self.filter_seconds.get(f["name"], 0.0) + ms / 1000
+
+    def render(self, queue=None, progress=None):
+        """The metrics in Prometheus text format. queue/progress add live gauges."""
+        base = {"project": self.project}
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        def sample(name, value, **labels):
+            return f"{name}{_labels(dict(base, **labels))} {_number(value)}"
+
+        family("ddd_builds_total", "counter", "Finished builds by result.",
+               [sample("ddd_builds_total", n, result=r) for r, n in sorted(self.builds.items())]
+               or [sample("ddd_builds_total", 0, result="success")])
+        family("ddd_build_failures_total", "counter", "Builds that did not succeed (failed, cancelled or timed out).",
+               [sample("ddd_build_failures_total", sum(n for r, n in self.builds.items() if r != "success"))])
+        family("ddd_cache_hits_total", "counter", "Builds replayed from the result cache.",
+               [sample("ddd_cache_hits_total", self.cache_hits)])
+        family("ddd_build_duration_seconds", "histogram", "Pipeline duration.",
+               list(self.build_duration.samples("ddd_build_duration_seconds", base)))
+        family("ddd_queue_wait_seconds", "histogram", "Time from the first trigger to the build starting.",
+               list(self.queue_wait.samples("ddd_queue_wait_seconds", base)))
+        family("ddd_stage_duration_seconds", "histogram", "Stage wall time.",
+               [s for stage, h in sorted(self.stage_duration.items())
+                for s in h.samples("ddd_stage_duration_seconds", dict(base, stage=stage))])
+        family("ddd_filter_seconds_total", "counter", "Time spent in each filter (feed and finish).",
+               [sample("ddd_filter_seconds_total", round(v, 6), filter=name)
+                for name, v in sorted(self.filter_seconds.items())])
+        family("ddd_raw_bytes_total", "counter", "Build output read.",
+               [sample("ddd_raw_bytes_total", self.raw_bytes)])
+        family("ddd_clean_bytes_total", "counter", "Filtered output written to build.log.",
+               [sample("ddd_clean_bytes_total", self.clean_bytes)])
+        if queue is not None:
+            family("ddd_requests_total", "counter", "Build requests received.",
+                   [sample("ddd_requests_total", queue.total_requests)])
+            family("ddd_requests_coalesced_total", "counter", "Requests folded into an already pending build.",
+                   [sample("ddd_requests_coalesced_total", queue.total_coalesced)])
+            family("ddd_requests_dropped_total", "counter", "Duplicate trigger events ignored.",
+                   [sample("ddd_requests_dropped_total", queue.total_dropped)])
+            family("ddd_queue_depth", "gauge", "Requests waiting for the next build.",
+                   [sample("ddd_queue_depth", queue.depth())])
+        if progress is not None:
+            family("ddd_building", "gauge", "1 while a build is running.",
+                   [sample("ddd_building", 1 if progress.get("state") == "building" else 0)])
+        if self.last_build is not None:
+            family("ddd_last_build_timestamp_seconds", "gauge", "When the last build finished.",
+                   [sample("ddd_last_build_timestamp_seconds", round(self.last_build, 3))])
+        family("ddd_daemon_rss_bytes", "gauge", "Resident memory of the daemon.",
+               [sample("ddd_daemon_rss_bytes", _rss_bytes())])
+        return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, text):
+    """Atomically replaces a node-exporter textfile (never read half-written)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+async def start_http_exporter(port, render, host="127.0.0.1"):
+    """
+    Serves GET /metrics on host:port. `render` returns the current text.
+    Returns the server, or None if the port is unavailable.
+    """
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), 5)
+            while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+                status, body, ctype = "200 OK", render().encode(), CONTENT_TYPE
+            else:
+                status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    try:
+        server = await asyncio.start_server(handle, host, port)
+    except OSError as e:
+        print(f"[!] Metrics endpoint unavailable on {host}:{port} ({e}).")
+        return None
+    bound = server.sockets[0].getsockname()[1] if server.sockets else port
+    print(f"[*] Metrics: http://{host}:{bound}/metrics")
+    return server
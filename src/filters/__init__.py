@@ -1,46 +1,104 @@
 import pkgutil
 import importlib
 import importlib.util
+import hashlib
 import os
 import sys
 from pathlib import Path
 
+from .chain import FilterChain
+
 REGISTRY = {}
 
+# Built-in filters as registered at first load (restored when an override goes away).
+_BUILTINS = {}
+
+# Project plugins already executed, keyed by absolute file path:
+#   path -> (mtime_ns, size, sha256, names the module registered)
+_PLUGIN_CACHE = {}
+
 def register_filter(name):
     def decorator(cls):
         REGISTRY[name] = cls
         return cls
     return decorator
 
-def _load_from_directory(directory):
-    path = Path(directory)
-    if not path.exists(): return
-    sys.path.insert(0, str(path))
+def _unregister(names):
+    for name in names:
+        if name in _BUILTINS:
+            REGISTRY[name] = _BUILTINS[name]
+        else:
+            REGISTRY.pop(name, None)
+
+def _exec_plugin(directory, file_path):
+    """Executes one plugin file. Returns the filter names it registered."""
+    before = dict(REGISTRY)
+    sys.path.insert(0, str(directory))
     try:
-        for file_path in path.glob("*.py"):
-            if file_path.name.startswith("_"): continue
-            module_name = file_path.stem
-            try:
-                spec = importlib.util.spec_from_file_location(module_name, file_path)
-                if spec and spec.loader:
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-            except Exception as e:
-                print(f"[!] Failed to load plugin {file_path}: {e}")
+        spec = importlib.util.spec_from_file_location(file_path.stem, file_path)
+        if spec and spec.loader:
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+    except Exception as e:
+        print(f"[!] Failed to load plugin {file_path}: {e}")
     finally:
-        if str(path) in sys.path:
-            sys.path.remove(str(path))
+        if str(directory) in sys.path:
+            sys.path.remove(str(directory))
+    return [name for name, cls in REGISTRY.items() if before.get(name) is not cls]
 
-def load_plugins(project_root=None):
-    # 1. Built-in (Package Mode)
-    package_dir = os.path.dirname(__file__)
-    for _, name, _ in pkgutil.iter_modules([package_dir]):
-        if name.startswith("_"): continue
+def _load_from_directory(directory):
+    """
+    Loads plugins from a directory, re-executing only files that changed.
+    A file counts as changed when its content hash differs; the hash is only
+    computed when mtime or size moved, so unchanged trees cost one stat per file.
+    """
+    path = Path(directory).resolve()
+    files = sorted(path.glob("*.py")) if path.exists() else []
+    seen = set()
+
+    for file_path in files:
+        if file_path.name.startswith("_"): continue
+        key = str(file_path)
+        seen.add(key)
         try:
-            importlib.import_module(f".{name}", package=__name__)
-        except Exception as e:
-            print(f"[!] Failed to load built-in {name}: {e}")
+            st = file_path.stat()
+        except OSError:
+            continue
+
+        cached = _PLUGIN_CACHE.get(key)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            continue
+
+        digest = hashlib.sha256(file_path.read_bytes()).hexdigest()
+        if cached and cached[2] == digest:
+            _PLUGIN_CACHE[key] = (st.st_mtime_ns, st.st_size, digest, cached[3])
+            continue
+
+        if cached:
+            print(f"[i] Reloading plugin {file_path}")
+            _unregister(cached[3])
+        names = _exec_plugin(path, file_path)
+        _PLUGIN_CACHE[key] = (st.st_mtime_ns, st.st_size, digest, names)
+
+    # Plugins deleted since the last load
+    for key in [k for k in _PLUGIN_CACHE if Path(k).parent == path and k not in seen]:
+        _unregister(_PLUGIN_CACHE.pop(key)[3])
+
+def plugin_digests():
+    """SHA-256 of each loaded project plugin file, keyed by path."""
+    return {path: entry[2] for path, entry in sorted(_PLUGIN_CACHE.items())}
+
+def load_plugins(project_root=None):
+    # 1. Built-in (Package Mode) - imported once per process
+    if not _BUILTINS:
+        package_dir = os.path.dirname(__file__)
+        for _, name, _ in pkgutil.iter_modules([package_dir]):
+            if name.startswith("_"): continue
+            try:
+                importlib.import_module(f".{name}", package=__name__)
+            except Exception as e:
+                print(f"[!] Failed to load built-in {name}: {e}")
+        _BUILTINS.update(REGISTRY)
 
     # 2. Project Local (File Mode)
     if project_root:
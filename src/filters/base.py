@@ -1,5 +1,98 @@
+from .capture import CaptureBuffer
+from .records import DiagnosticBatch, render
+
+
 class BaseFilter:
+    """
+    Base class for all filters.
+
+    Filters can implement one of two APIs:
+      - process(text): receives the whole stage output at once (legacy).
+      - feed(line) / finish(): receives output line by line while the build
+        is still running. Set `streaming = True` when implementing these.
+
+    finish() may return DiagnosticBatch objects instead of JSON text. A filter
+    with `accepts_records = True` gets such batches from the previous filter
+    through feed_records() instead of their JSON serialization.
+    """
+    streaming = False
+    accepts_records = False
+
+    # Patterns this filter wants spotted on the build's raw output lines,
+    # {name: compiled regex}. A FilterChain folds the signals of all its
+    # filters into one regex, searches each line once, calls signal() on a
+    # match and sets `fused` so the filter can skip its own scan.
+    signals = {}
+    # Lowercase substrings, one of which every signal match contains. When all
+    # filters give hints, lines without any hint skip the regex altogether.
+    signal_hints = ()
+
     def __init__(self, config=None):
         self.config = config or {}
+        self.captures = []
+        self.fused = False
+
     def process(self, text: str) -> str:
-        return text
+        if not self.streaming:
+            return text
+        # Streaming filters get process() for free by replaying the text.
+        chunks = [self.feed(line) for line in text.splitlines(keepends=True)]
+        remaining = self.finish()
+        chunks.extend([remaining] if isinstance(remaining, (str, DiagnosticBatch)) else remaining)
+        return "".join(render(chunk) for chunk in chunks)
+
+    def feed(self, line: str) -> str:
+        """Consumes one line (with its newline). Returns output ready so far."""
+        return line
+
+    def feed_records(self, batch):
+        """Consumes a DiagnosticBatch (only called if `accepts_records`)."""
+        return batch
+
+    def finish(self):
+        """
+        Called once the stage output ends. Returns the remaining output,
+        either as a string or as an iterable of string chunks.
+        """
+        return ""
+
+    def signal(self, name, text):
+        """Called by a FilterChain when signal `name` matched `text` on a raw line."""
+
+    def new_capture(self):
+        """Returns a CaptureBuffer bounded by the stage's `capture_limit_mb`."""
+        buf = CaptureBuffer.from_config(self.config)
+        self.captures.append(buf)
+        return buf
+
+
+class ProcessAdapter:
+    """
+    Wraps a process()-only filter so it can sit in a streaming chain.
+
+    Input is collected in a CaptureBuffer; the legacy filter still needs the
+    whole text as one string when the stage ends.
+    """
+    streaming = True
+    accepts_records = False
+
+    def __init__(self, inner, config=None):
+        self.inner = inner
+        self.config = config or {}
+        self.captures = []
+        self._buffer = None
+
+    def feed(self, line):
+        if self._buffer is None:
+            self._buffer = CaptureBuffer.from_config(self.config)
+            self.captures.append(self._buffer)
+        self._buffer.write(line)
+        return ""
+
+    def finish(self):
+        text = ""
+        if self._buffer is not None:
+            text = self._buffer.getvalue()
+            self._buffer.close()
+            self._buffer = None
+        return self.inner.process(text)
@@ -0,0 +1,105 @@
+import tempfile
+
+DEFAULT_LIMIT_MB = 64
+CHUNK_SIZE = 64 * 1024
+
+
+class CaptureBuffer:
+    """
+    Holds stage output that a filter must keep until finish().
+
+    Text stays in memory up to `limit` characters. Beyond that everything is
+    moved to an anonymous temp file and read back in chunks, so a runaway
+    build cannot grow the daemon without bound.
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT_MB * 1024 * 1024, spill_dir=None):
+        self.limit = limit
+        self.spill_dir = spill_dir
+        self.size = 0
+        self.peak = 0
+        self.spill_events = 0
+        self._chunks = []
+        self._mem = 0
+        self._file = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a buffer from stage config (`capture_limit_mb`, `spill_dir`)."""
+        limit_mb = config.get("capture_limit_mb", DEFAULT_LIMIT_MB)
+        return cls(int(limit_mb * 1024 * 1024), config.get("spill_dir"))
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def write(self, text):
+        self.size += len(text)
+        if self._file is not None:
+            self._file.write(text)
+            return
+        self._chunks.append(text)
+        self._mem += len(text)
+        if self._mem > self.peak:
+            self.peak = self._mem
+        if self._mem > self.limit:
+            self._spill()
+
+    def _spill(self):
+        self._file = tempfile.TemporaryFile(
+            "w+", encoding="utf-8", errors="surrogateescape", newline="", dir=self.spill_dir
+        )
+        self._file.writelines(self._chunks)
+        self._chunks = []
+        self._mem = 0
+        self.spill_events += 1
+
+    def first_char(self):
+        """Returns the first non-whitespace character ("" if there is none)."""
+        for chunk in self.chunks():
+            stripped = chunk.lstrip()
+            if stripped:
+                return stripped[0]
+        return ""
+
+    def chunks(self, size=CHUNK_SIZE):
+        """Yields the captured text in order, in blocks of about `size` characters."""
+        if self._file is None:
+            # Writes are usually one line each: join them into blocks
+            block, length = [], 0
+            for chunk in self._chunks:
+                block.append(chunk)
+                length += len(chunk)
+                if length >= size:
+                    yield "".join(block)
+                    block, length = [], 0
+            if block:
+                yield "".join(block)
+            return
+        self._file.flush()
+        self._file.seek(0)
+        try:
+            while True:
+                data = self._file.read(size)
+                if not data:
+                    break
+                yield data
+        finally:
+            self._file.seek(0, 2)
+
+    def getvalue(self):
+        return "".join(self.chunks())
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "peak_memory": self.peak,
+            "spill_events": self.spill_events,
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._chunks = []
+        self._mem = 0
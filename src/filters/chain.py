@@ -0,0 +1,288 @@
+import re
+import time
+
+from .base import ProcessAdapter
+from .records import DiagnosticBatch
+
+# One chain feed in SAMPLE_EVERY is timed (a power of two); see FilterTiming.
+SAMPLE_EVERY = 64
+_SAMPLE_MASK = SAMPLE_EVERY - 1
+_END = object()
+
+
+def _process_only(cls):
+    """
+    True for filters to run through a ProcessAdapter: legacy filters, and
+    subclasses of streaming filters that override only process() (the
+    inherited feed()/finish() would bypass the override).
+    """
+    if not getattr(cls, "streaming", False):
+        return True
+    for klass in cls.__mro__:
+        defined = vars(klass)
+        if "feed" in defined:
+            return False
+        if "process" in defined:
+            return True
+    return False
+
+
+class FilterTiming:
+    """
+    Wall and CPU time one filter spends in a chain.
+
+    Timing every feed() would cost more than many filters' feed() itself
+    (thread CPU time is a syscall), so only every SAMPLE_EVERY-th input to
+    the chain is timed on its way through the filters, and feed() totals
+    are scaled up from that sample. finish() (including iterating what it
+    returns) and feed_records() run once or a few times per stage and are
+    timed exactly, as `finish_ms`.
+    """
+    __slots__ = ("name", "sampled", "wall_ns", "cpu_ns", "finish_wall_ns", "finish_cpu_ns")
+
+    def __init__(self, name):
+        self.name = name
+        self.sampled = 0
+        self.wall_ns = 0
+        self.cpu_ns = 0
+        self.finish_wall_ns = 0
+        self.finish_cpu_ns = 0
+
+    def timed(self, fn):
+        """fn, with each call added to the feed() sample."""
+        def sample(arg):
+            wall, cpu = time.perf_counter_ns(), time.thread_time_ns()
+            result = fn(arg)
+            self.wall_ns += time.perf_counter_ns() - wall
+            self.cpu_ns += time.thread_time_ns() - cpu
+            self.sampled += 1
+            return result
+        return sample
+
+    def exact(self, fn, *args):
+        wall, cpu = time.perf_counter_ns(), time.thread_time_ns()
+        result = fn(*args)
+        self.finish_wall_ns += time.perf_counter_ns() - wall
+        self.finish_cpu_ns += time.thread_time_ns() - cpu
+        return result
+
+    def to_dict(self, scale):
+        return {
+            "name": self.name,
+            "sampled_calls": self.sampled,
+            "feed_ms": round(self.wall_ns * scale / 1e6, 3),
+            "feed_cpu_ms": round(self.cpu_ns * scale / 1e6, 3),
+            "finish_ms": round(self.finish_wall_ns / 1e6, 3),
+            "finish_cpu_ms": round(self.finish_cpu_ns / 1e6, 3),
+        }
+
+
+class FilterChain:
+    """
+    Runs a list of filters incrementally.
+
+    Each line fed into the chain flows through every filter as soon as it
+    arrives. Output produced by one filter is re-split into lines before it
+    reaches the next one; partial lines are held back until they complete
+    or the chain is finished.
+
+    DiagnosticBatch output stays an object while the next filter accepts
+    records, and is serialized to JSON only where text is needed: before a
+    text filter, or at the end of the chain.
+
+    Filter `signals` are fused: every raw line is searched once with a single
+    combined regex, whatever the number of filters watching for something.
+    Only lines it matches are searched with each signal's own pattern, so
+    every filter whose signal is on the line is notified.
+    """
+
+    def __init__(self, names, config=None, registry=None):
+        if registry is None:
+            from . import REGISTRY as registry
+        self.filters = []
+        self.timings = []
+        for name in names:
+            FilterClass = registry.get(name)
+            if not FilterClass:
+                print(f"[!] Warning: Filter '{name}' not found. Skipping.")
+                continue
+            processor = FilterClass(config or {})
+            if _process_only(type(processor)):
+                processor = ProcessAdapter(processor, config)
+            self.filters.append(processor)
+            self.timings.append(FilterTiming(name))
+        self._tails = [""] * len(self.filters)
+        # Chain inputs so far, and those timed (see FilterTiming)
+        self._fed = 0
+        self._fed_sampled = 0
+        self._sampling = False
+        # (filter, start, end) of each filter's share of drain(), perf_counter()
+        self.finish_spans = []
+        # Incomplete last line of the previous feed_chunk(), not yet scanned
+        self._unscanned = ""
+        regex, self._listeners = self._fuse_signals()
+        self._scan = regex.search if regex else None
+        self._scan_all = regex.finditer if regex else None
+        self._hints = self._fuse_hints()
+
+    def _fuse_signals(self):
+        """Compiles all filters' signals into one alternation (the gate)."""
+        branches, listeners = [], []
+        for processor in self.filters:
+            for name, pattern in getattr(processor, "signals", {}).items():
+                inner = pattern.pattern
+                if pattern.flags & re.IGNORECASE:
+                    inner = f"(?i:{inner})"
+                branches.append(f"(?:{inner})")
+                listeners.append((processor, name, pattern.search))
+                processor.fused = True
+        if not branches:
+            return None, listeners
+        return re.compile("|".join(branches)), listeners
+
+    def _fuse_hints(self):
+        hints = []
+        for processor in self.filters:
+            if getattr(processor, "signals", None):
+                if not processor.signal_hints:
+                    return None
+                hints.extend(processor.signal_hints)
+        return tuple(hints) or None
+
+    def _hinted(self, line):
+        lowered = line.lower()
+        for hint in self._hints:
+            if hint in lowered:
+                return True
+        return False
+
+    def feed(self, line):
+        """Pushes one line of raw output. Returns final-stage output, if any."""
+        if self._scan is not None and (self._hints is None or self._hinted(line)):
+            if self._scan(line):
+                self._notify(line)
+        # Inputs 0, 64, 128, ...: a short stage still gets one sample.
+        self._fed += 1
+        if (self._fed - 1) & _SAMPLE_MASK:
+            return self._send(0, line)
+        return self._sampled_send(line)
+
+    def _sampled_send(self, text):
+        self._fed_sampled += 1
+        self._sampling = True
+        try:
+            return self._send(0, text)
+        finally:
+            self._sampling = False
+
+    def feed_chunk(self, text):
+        """
+        Pushes any amount of raw output, e.g. one pipe read (binary capture).
+        Lines are split out as filters need them; signals are searched over
+        complete lines only, so a match is never cut between two chunks.
+        """
+        if self._scan is not None:
+            cut = text.rfind("\n") + 1
+            if cut:
+                self._signal_all(self._unscanned + text[:cut])
+                self._unscanned = text[cut:]
+            else:
+                self._unscanned += text
+        self._fed += 1
+        if (self._fed - 1) & _SAMPLE_MASK:
+            return self._send(0, text)
+        return self._sampled_send(text)
+
+    def _signal_all(self, text):
+        if self._hints is not None and not self._hinted(text):
+            return
+        line_end = -1
+        for match in self._scan_all(text):
+            if match.start() < line_end:
+                continue  # Line already handled
+            start = text.rfind("\n", 0, match.start()) + 1
+            line_end = text.find("\n", match.start())
+            if line_end < 0:
+                line_end = len(text)
+            self._notify(text[start:line_end])
+
+    def _notify(self, line):
+        """Signals every filter whose own pattern matches the (gated) line."""
+        for processor, name, search in self._listeners:
+            match = search(line)
+            if match:
+                processor.signal(name, match.group(0))
+
+    def finish(self):
+        """Flushes every filter in order. Returns the remaining output."""
+        return "".join(self.drain())
+
+    def drain(self):
+        """Like finish(), but yields the remaining output in chunks."""
+        if self._unscanned:
+            self._signal_all(self._unscanned)
+            self._unscanned = ""
+        for i, processor in enumerate(self.filters):
+            timing = self.timings[i]
+            started = time.perf_counter()
+            tail, self._tails[i] = self._tails[i], ""
+            if tail:
+                produced = timing.exact(processor.feed, tail)
+                if produced:
+                    yield self._send(i + 1, produced)
+            remaining = timing.exact(processor.finish)
+            if isinstance(remaining, (str, DiagnosticBatch)):
+                remaining = [remaining]
+            # Generators do their work as they are iterated: time each step.
+            chunks = iter(remaining)
+            while True:
+                produced = timing.exact(next, chunks, _END)
+                if produced is _END:
+                    break
+                if produced:
+                    yield self._send(i + 1, produced)
+            self.finish_spans.append((timing.name, started, time.perf_counter()))
+
+    def timing_stats(self):
+        """Per-filter timings, in chain order."""
+        scale = self._fed / self._fed_sampled if self._fed_sampled else 0
+        return [timing.to_dict(scale) for timing in self.timings]
+
+    def capture_stats(self):
+        """Aggregates CaptureBuffer usage across the chain."""
+        stats = [buf.stats() for f in self.filters for buf in getattr(f, "captures", ())]
+        return {
+            "peak_memory": sum(s["peak_memory"] for s in stats),
+            "spilled_bytes": sum(s["size"] for s in stats if s["spill_events"]),
+            "spill_events": sum(s["spill_events"] for s in stats),
+        }
+
+    def _send(self, index, text):
+        if isinstance(text, DiagnosticBatch):
+            if index < len(self.filters) and getattr(self.filters[index], "accepts_records", False):
+                produced = self.timings[index].exact(self.filters[index].feed_records, text)
+                return self._send(index + 1, produced) if produced else ""
+            text = text.to_text()
+
+        if index == len(self.filters):
+            return text
+
+        buf = self._tails[index] + text if self._tails[index] else text
+        if buf.endswith("\n") and buf.find("\n") == len(buf) - 1:
+            # Fast path: exactly one complete line (the common case).
+            lines = [buf]
+            self._tails[index] = ""
+        else:
+            parts = buf.split("\n")
+            self._tails[index] = parts.pop()
+            lines = [part + "\n" for part in parts]
+
+        feed = self.filters[index].feed
+        if self._sampling:
+            feed = self.timings[index].timed(feed)
+        out = []
+        for line in lines:
+            produced = feed(line)
+            if produced:
+                out.append(self._send(index + 1, produced))
+        return "".join(out)
@@ -2,38 +2,90 @@ import re
 import json
 from . import register_filter
 from .base import BaseFilter
+from .records import Diagnostic, encode_line
+
+# Common crash signatures in C/C++ output
+# Case insensitive match for safety
+CRASH_PATTERNS = [
+    r"Segmentation fault",
+    r"core dumped",
+    r"Aborted \(core dumped\)",
+    r"Bus error",
+    r"Assertion .* failed"
+]
+CRASH_RE = re.compile("|".join(CRASH_PATTERNS), re.IGNORECASE)
 
 @register_filter("crash_detector")
 class CrashDetectorFilter(BaseFilter):
-    def process(self, text):
-        """
-        Scans for high-priority crash signatures (Segfault, Core Dump, Aborted).
-        Returns a JSON error object immediately if found.
-        """
-        # Common crash signatures in C/C++ output
-        # Case insensitive match for safety
-        crash_patterns = [
-            r"Segmentation fault",
-            r"core dumped",
-            r"Aborted \(core dumped\)",
-            r"Bus error",
-            r"Assertion .* failed"
-        ]
-        
-        combined_regex = "|".join(crash_patterns)
-        match = re.search(combined_regex, text, re.IGNORECASE | re.MULTILINE)
-        
-        if match:
-            # We found a crash!
-            crash_entry = {
-                "file": "CRITICAL_RUNTIME_FAILURE",
-                "line": 0,
-                "type": "fatal",
-                "message": f"Process Crashed: '{match.group(0)}'. Output may be truncated."
-            }
-            
+    """
+    Scans for high-priority crash signatures (Segfault, Core Dump, Aborted).
+    Returns a JSON error object if found, otherwise the input unchanged.
+    """
+    streaming = True
+    accepts_records = True
+    signals = {"crash": CRASH_RE}
+    signal_hints = ("segmentation fault", "core dumped", "aborted", "bus error", "assertion")
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._buffer = self.new_capture()
+        self._crash = None
+        self._batch = None
+
+    def feed_records(self, batch):
+        # Diagnostics from gcc_json arrive as objects: no JSON to parse.
+        self._batch = batch
+        return ""
+
+    def signal(self, name, text):
+        if self._crash is None:
+            self._crash = text
+
+    def feed(self, line):
+        if self._crash is None and not self.fused:
+            match = CRASH_RE.search(line)
+            if match:
+                self._crash = match.group(0)
+        # A crash later in the stream replaces everything, so hold output back.
+        self._buffer.write(line)
+        return ""
+
+    def finish(self):
+        buffer, crash, batch = self._buffer, self._crash, self._batch
+        self._buffer = self.new_capture()
+        self._crash = None
+        self._batch = None
+
+        if crash is None:
+            # No crash: hand the held output back in chunks.
+            return self._replay(buffer, batch)
+
+        # We found a crash!
+        crash_entry = {
+            "file": "CRITICAL_RUNTIME_FAILURE",
+            "line": 0,
+            "type": "fatal",
+            "message": f"Process Crashed: '{crash}'. Output may be truncated."
+        }
+
+        if batch is not None:
+            buffer.close()
+            batch.records.insert(0, Diagnostic.from_dict(crash_entry))  # Top priority
+            if batch.summary is not None:
+                batch.summary["new"] += 1
+                batch.summary["total"] += 1
+            return batch
+
+        first = buffer.first_char()
+        if first == "{" and self.config.get("format") == "ndjson":
+            # NDJSON from gcc_json: lead with the crash, stream the rest back.
+            return self._replay(buffer, prefix=encode_line(crash_entry))
+
+        # Only JSON (a list, or a gcc_json diff document) is worth loading into memory.
+        data = None
+        if first in ("[", "{"):
+            text = buffer.getvalue().strip()
             # ATTEMPT 1: Parse as pure JSON
-            data = None
             try:
                 data = json.loads(text)
             except json.JSONDecodeError:
@@ -42,13 +94,36 @@ class CrashDetectorFilter(BaseFilter):
                     data, _ = json.JSONDecoder().raw_decode(text)
                 except json.JSONDecodeError:
                     pass
+        buffer.close()
+
+        # If we successfully salvaged a list, prepend our crash error
+        if isinstance(data, list):
+            data.insert(0, crash_entry) # Top priority
+            return self._dump(data)
+        if isinstance(data, dict) and isinstance(data.get("new"), list):
+            data["new"].insert(0, crash_entry)
+            if isinstance(data.get("diff"), dict):
+                data["diff"]["new"] = data["diff"].get("new", 0) + 1
+                data["diff"]["total"] = data["diff"].get("total", 0) + 1
+            return self._dump(data)
+
+        # Fallback: Return just this error
+        if self.config.get("format") == "ndjson":
+            return encode_line(crash_entry)
+        return self._dump([crash_entry])
 
-            # If we successfully salvaged a list, prepend our crash error
-            if isinstance(data, list):
-                data.insert(0, crash_entry) # Top priority
-                return json.dumps(data, indent=2)
-                
-            # Fallback: Return just this error
-            return json.dumps([crash_entry], indent=2)
+    def _dump(self, data):
+        if self.config.get("format") == "compact":
+            return json.dumps(data, separators=(",", ":")) + "\n"
+        return json.dumps(data, indent=2)
 
-        return text
+    @staticmethod
+    def _replay(buffer, batch=None, prefix=""):
+        try:
+            if prefix:
+                yield prefix
+            yield from buffer.chunks()
+        finally:
+            buffer.close()
+        if batch is not None:
+            yield batch
@@ -1,51 +1,279 @@
 import re
+import os
 import json
+from collections import Counter
 from . import register_filter
 from .base import BaseFilter
+from .records import FORMATS, Diagnostic, DiagnosticBatch, encode_line
+
+# Regex for: main.c:10:5: error: expected ';'
+# Group 1: Filename
+# Group 2: Line
+# Group 3: Column (Optional)
+# Group 4: Type (error/warning/note)
+# Group 5: Message
+DIAGNOSTIC_RE = re.compile(r"^([^:\n]+):(\d+):(?:(\d+):)?\s*(error|warning|note):\s*(.+)$")
+
+# Include chains printed before a header diagnostic:
+#   In file included from include/b.h:2,
+#                    from src/main.c:3:
+INCLUDED_RE = re.compile(r"^In file included from ([^:\n]+):\d+")
+INCLUDED_MORE_RE = re.compile(r"^\s+from ([^:\n]+):\d+")
+
+# Dedup mode caps (stage `max_tus`, `max_notes`)
+DEFAULT_MAX_TUS = 5
+DEFAULT_MAX_NOTES = 8
+
+# Output that means make/the compiler finished without anything to report
+SUCCESS_RE = re.compile(r"Nothing to be done|Build finished")
+
+# How much unparsed output the silent-failure entry carries.
+UNPARSED_SNIPPET = 1000
+
+# Where diff mode keeps the previous run's diagnostic keys (stage `diff_state`):
+# one file per stage, outside .ddd/run/ (cleared when the daemon starts).
+DEFAULT_DIFF_STATE = os.path.join(".ddd", "state", "{stage}.diagnostics.json")
+
+_NUMBER_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+def normalize_message(message):
+    """Collapses whitespace and numbers, which shift between otherwise identical runs."""
+    return _SPACE_RE.sub(" ", _NUMBER_RE.sub("#", message)).strip()
+
+def diagnostic_key(entry):
+    """Stable identity of a Diagnostic across builds: file, line, type, message."""
+    return "\x1f".join((entry.file, str(entry.line), entry.type, normalize_message(entry.message)))
+
+# Parent marker for notes that follow a folded repeat (dropped).
+_DUPLICATE = object()
 
 @register_filter("gcc_json")
 class GccJsonFilter(BaseFilter):
-    def process(self, text):
-        """
-        Parses GCC/Clang output into a JSON list of error objects.
-        Patched to allow 'Nothing to be done' as success.
-        """
-        results = []
-        
-        # Regex for: main.c:10:5: error: expected ';'
-        # Group 1: Filename
-        # Group 2: Line
-        # Group 3: Column (Optional)
-        # Group 4: Type (error/warning/note)
-        # Group 5: Message
-        regex = re.compile(r"^([^:\n]+):(\d+):(?:(\d+):)?\s*(error|warning|note):\s*(.+)$", re.MULTILINE)
-        
-        for match in regex.finditer(text):
-            entry = {
-                "file": match.group(1),
-                "line": int(match.group(2)),
-                "type": match.group(4),
-                "message": match.group(5).strip()
-            }
-            # Add column if present
-            if match.group(3):
-                entry["col"] = int(match.group(3))
-                
-            results.append(entry)
-            
+    """
+    Parses GCC/Clang output into a JSON list of error objects.
+    Patched to allow 'Nothing to be done' as success.
+
+    Lines are parsed as they arrive. finish() returns a DiagnosticBatch; the
+    chain turns it into the JSON document unless the next filter takes records.
+
+    With `"diff": true` in the stage config, finish() compares against the
+    previous run and emits only counts plus the diagnostics that are new.
+
+    With `"dedup": true`, identical diagnostics (a header warning seen from
+    every translation unit under make -j) become one entry with a `count`
+    and the including `tus`, and `note:` lines fold under their parent.
+
+    `"format": "ndjson"` writes one compact JSON object per line and
+    `"compact"` a one-line-per-record JSON array. Without dedup/diff both
+    are emitted as each diagnostic is parsed, so nothing accumulates.
+    """
+    streaming = True
+    signals = {"success": SUCCESS_RE}
+    signal_hints = ("nothing to be done", "build finished")
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.dedup = bool(self.config.get("dedup", False))
+        self.max_tus = int(self.config.get("max_tus", DEFAULT_MAX_TUS))
+        self.max_notes = int(self.config.get("max_notes", DEFAULT_MAX_NOTES))
+        self.format = self.config.get("format", "json")
+        if self.format not in FORMATS:
+            print(f"[!] gcc_json: unknown format '{self.format}', using json.")
+            self.format = "json"
+        # Dedup and diff need every diagnostic before writing any.
+        self._stream = self.format != "json" and not self.dedup and not self.config.get("diff")
+        self._reset()
+
+    def _reset(self):
+        self.results = []
+        self._count = 0
+        self._seen = {}
+        self._parent = None
+        self._includes = []
+        self._include_leaf = None
+        self._head = ""
+        self._head_full = False
+        self._success_marker = False
+
+    def feed(self, line):
+        match = DIAGNOSTIC_RE.match(line.rstrip("\n"))
+        if match:
+            col = match.group(3)
+            return self._add(Diagnostic(
+                match.group(1), int(match.group(2)), match.group(4),
+                match.group(5).strip(), int(col) if col else None
+            ))
+
+        if self.dedup:
+            self._track_includes(line)
+
+        if not self.fused and SUCCESS_RE.search(line):
+            self._success_marker = True
+
+        # Keep just enough leading output for the silent failure report.
+        if not self._head_full:
+            self._head += line
+            self._head_full = len(self._head.strip()) >= UNPARSED_SNIPPET
+        return ""
+
+    def signal(self, name, text):
+        self._success_marker = True
+
+    def _add(self, entry):
+        """Records a diagnostic. Returns text to emit now (streaming formats)."""
+        self._count += 1
+        if self._stream:
+            return self._emit(entry)
+        if self.dedup:
+            self._add_dedup(entry)
+        else:
+            self.results.append(entry)
+        return ""
+
+    def _emit(self, entry):
+        if self.format == "ndjson":
+            return encode_line(entry.to_dict())
+        # compact: "[" before the first record, ",\n" between, "]" in finish()
+        prefix = "[" if self._count == 1 else ",\n"
+        return prefix + encode_line(entry.to_dict())[:-1]
+
+    def _track_includes(self, line):
+        match = INCLUDED_RE.match(line)
+        if match:
+            self._includes = [match.group(1)]
+            self._include_leaf = None
+            return
+        match = INCLUDED_MORE_RE.match(line)
+        if match and self._includes:
+            self._includes.append(match.group(1))
+
+    def _add_dedup(self, entry):
+        """Folds notes into their parent and repeats into the first occurrence."""
+        if entry.type == "note" and self._parent is not None:
+            parent = self._parent
+            if parent is _DUPLICATE:
+                return
+            notes = parent.get("notes")
+            if notes is None:
+                notes = []
+                parent.set("notes", notes)
+            if len(notes) < self.max_notes:
+                note = entry.to_dict()
+                del note["type"]
+                notes.append(note)
+            else:
+                parent.set("notes_omitted", parent.get("notes_omitted", 0) + 1)
+            return
+
+        # The outermost file of the include chain is the translation unit.
+        # GCC prints the chain only when the include context changes, so it
+        # holds for later diagnostics from the same header or any file in the
+        # chain; one from elsewhere means a new context without a chain.
+        if self._includes:
+            if self._include_leaf is None:
+                self._include_leaf = entry.file
+            elif entry.file != self._include_leaf and entry.file not in self._includes:
+                self._includes = []
+                self._include_leaf = None
+        tu = self._includes[-1] if self._includes else entry.file
+        key = (entry.file, entry.line, entry.col, entry.type, entry.message)
+        first = self._seen.get(key)
+        if first is None:
+            entry.set("count", 1)
+            entry.set("tus", [tu])
+            self._seen[key] = entry
+            self.results.append(entry)
+            self._parent = entry
+            return
+
+        first.extra["count"] += 1
+        tus = first.extra["tus"]
+        if tu not in tus:
+            if len(tus) < self.max_tus:
+                tus.append(tu)
+            else:
+                first.set("tus_omitted", first.get("tus_omitted", 0) + 1)
+        # The repeat's notes are the same as the first occurrence's.
+        self._parent = _DUPLICATE
+
+    def finish(self):
+        results = self.results
+        tail = ""
+
         # --- SILENT FAILURE DETECTION (PATCHED) ---
-        if not results and text.strip():
+        if not self._count and self._head.strip():
             # FIX: If we see success markers, return empty list (Success)
             # instead of triggering the silent failure detector.
-            if "Nothing to be done" in text or "Build finished" in text:
-                return json.dumps([])
+            if self._success_marker:
+                self._reset()
+                return self._close("") if self._stream else DiagnosticBatch(format=self.format)
 
             # Otherwise, assume it's a crash (Segfault, Linker error, etc)
-            results.append({
-                "file": "build.log",
-                "line": 0,
-                "type": "error",
-                "message": f"Build Output (Unparseable):\n{text.strip()[:1000]}"
-            })
-
-        return json.dumps(results, indent=2)
+            unparsed = Diagnostic(
+                "build.log", 0, "error",
+                f"Build Output (Unparseable):\n{self._head.strip()[:UNPARSED_SNIPPET]}"
+            )
+            if self._stream:
+                tail = self._add(unparsed)
+            else:
+                results.append(unparsed)
+
+        if self._stream:
+            text = self._close(tail)
+            self._reset()
+            return text
+
+        self._reset()
+        if self.config.get("diff"):
+            return self._diff(results)
+        return DiagnosticBatch(results, format=self.format)
+
+    def _close(self, tail):
+        """End of a streamed document."""
+        if self.format == "compact":
+            return tail + ("]\n" if self._count else "[]\n")
+        return tail
+
+    def _diff(self, results):
+        state_path = self.config.get("diff_state") or DEFAULT_DIFF_STATE.format(
+            stage=str(self.config.get("stage") or "default").lower()
+        )
+        previous = None
+        try:
+            with open(state_path) as f:
+                previous = Counter(json.load(f))
+        except (OSError, ValueError):
+            pass
+
+        current = Counter(diagnostic_key(entry) for entry in results)
+        baseline = previous or Counter()
+        # Duplicates count separately: a second copy of a known entry is new.
+        seen = Counter()
+        new = []
+        for entry in results:
+            key = diagnostic_key(entry)
+            seen[key] += 1
+            if seen[key] > baseline[key]:
+                new.append(entry)
+
+        self._save_state(state_path, current)
+        return DiagnosticBatch(new, format=self.format, summary={
+            "baseline": previous is not None,
+            "new": len(new),
+            "resolved": sum((baseline - current).values()),
+            "unchanged": len(results) - len(new),
+            "total": len(results)
+        })
+
+    def _save_state(self, state_path, keys):
+        try:
+            directory = os.path.dirname(state_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp = state_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(dict(keys), f)
+            os.replace(tmp, state_path)
+        except OSError as e:
+            print(f"[!] gcc_json: could not save diff state {state_path}: {e}")
@@ -1,47 +1,51 @@
 from . import register_filter
 from .base import BaseFilter
-import re
+from .raw import ANSI_ESCAPE
+
+SEVERITY_KEYWORDS = ("error:", "warning:", "fatal:", "note:")
 
 @register_filter("gcc_make")
 class GccMakeFilter(BaseFilter):
+    streaming = True
+
     def __init__(self, config=None):
         super().__init__(config)
         # Use the config to determine what path prefix to strip
         self.strip_prefix = self.config.get("path_strip", "")
         self.context_lines = 0
-        self.ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+        self.ansi_escape = ANSI_ESCAPE
 
-    def process(self, text: str) -> str:
+    def feed(self, line: str) -> str:
         # 1. Strip ANSI
-        text = self.ansi_escape.sub('', text)
-        
+        line = line.rstrip("\n")
+        if "\x1b" in line:
+            line = self.ansi_escape.sub('', line)
+
         # 2. Strip Path Prefix (Normalization)
         if self.strip_prefix:
-            text = text.replace(self.strip_prefix, "")
-
-        lines = text.splitlines()
-        output = []
-
-        for line in lines:
-            # A. Detect Critical Signals (Highest Priority)
-            # We must catch errors even if they look like noise (e.g. make errors)
-            if any(k in line.lower() for k in ["error:", "warning:", "fatal:", "note:"]):
-                self.context_lines = 5  # Open the gate
-                output.append(line)
-                continue
-
-            # B. Filter Noise (Moved Up)
-            # Check for noise BEFORE capturing context.
-            if "make[" in line or "Entering directory" in line or "Leaving directory" in line:
-                continue
-
-            # C. Handle Context
-            if self.context_lines > 0:
-                output.append(line)
-                self.context_lines -= 1
-                continue
-            
-            # D. Default: Keep line if we aren't sure
-            output.append(line)
-
-        return "\n".join(output)
\ No newline at end of file
+            line = line.replace(self.strip_prefix, "")
+
+        # A. Detect Critical Signals (Highest Priority)
+        # We must catch errors even if they look like noise (e.g. make errors)
+        # (lowercased once per line, not once per keyword)
+        lowered = line.lower()
+        if any(k in lowered for k in SEVERITY_KEYWORDS):
+            self.context_lines = 5  # Open the gate
+            return line + "\n"
+
+        # B. Filter Noise (Moved Up)
+        # Check for noise BEFORE capturing context.
+        if "make[" in line or "Entering directory" in line or "Leaving directory" in line:
+            return ""
+
+        # C. Handle Context
+        if self.context_lines > 0:
+            self.context_lines -= 1
+            return line + "\n"
+
+        # D. Default: Keep line if we aren't sure
+        return line + "\n"
+
+    def finish(self) -> str:
+        self.context_lines = 0
+        return ""
@@ -0,0 +1,176 @@
+import json
+from . import register_filter
+from .gcc_json import GccJsonFilter
+from .records import Diagnostic, DiagnosticBatch
+
+# GCC `kind` values that are not plain error/warning/note
+KIND_TYPES = {"fatal error": "fatal", "ice": "fatal", "sorry": "error"}
+# SARIF `level` values
+LEVEL_TYPES = {"error": "error", "warning": "warning", "note": "note", "none": "note"}
+
+# First characters of a pretty-printed JSON line (indentation, brackets, keys)
+JSON_LINE_STARTS = (" ", "\t", "{", "}", "[", "]", '"')
+
+
+def _starts_document(stripped):
+    return stripped in ("[", "{") or stripped.startswith(("[{", "[]", '{"'))
+
+
+def _from_gcc(diag):
+    """Converts one -fdiagnostics-format=json entry to a gcc_json record."""
+    locations = diag.get("locations") or [{}]
+    caret = locations[0].get("caret", {})
+    entry = {
+        "file": caret.get("file", ""),
+        "line": caret.get("line", 0),
+        "type": KIND_TYPES.get(diag.get("kind"), diag.get("kind", "error")),
+        "message": diag.get("message", "")
+    }
+    col = caret.get("display-column", caret.get("column"))
+    if col:
+        entry["col"] = col
+    finish = locations[0].get("finish")
+    if finish:
+        entry["end"] = {"line": finish.get("line"), "col": finish.get("display-column", finish.get("column"))}
+    if diag.get("option"):
+        entry["option"] = diag["option"]
+
+    fixits = []
+    for fixit in diag.get("fixits", []):
+        start, end = fixit.get("start", {}), fixit.get("next", {})
+        fixits.append({
+            "file": start.get("file", entry["file"]),
+            "line": start.get("line"),
+            "col": start.get("column"),
+            "end_col": end.get("column"),
+            "replace": fixit.get("string", "")
+        })
+    if fixits:
+        entry["fixits"] = fixits
+
+    notes = []
+    for child in diag.get("children", []):
+        note = _from_gcc(child)
+        note.pop("type", None)
+        notes.append(note)
+    if notes:
+        entry["notes"] = notes
+    return entry
+
+
+def _sarif_location(location):
+    physical = location.get("physicalLocation", {})
+    uri = physical.get("artifactLocation", {}).get("uri", "")
+    if uri.startswith("file://"):
+        uri = uri[len("file://"):]
+    region = physical.get("region", {})
+    record = {"file": uri, "line": region.get("startLine", 0)}
+    if region.get("startColumn"):
+        record["col"] = region["startColumn"]
+    if region.get("endLine") or region.get("endColumn"):
+        record["end"] = {"line": region.get("endLine", record["line"]), "col": region.get("endColumn")}
+    return record
+
+
+def _from_sarif(result):
+    """Converts one SARIF result to a gcc_json record."""
+    locations = result.get("locations") or [{}]
+    entry = _sarif_location(locations[0])
+    entry["type"] = LEVEL_TYPES.get(result.get("level"), "warning")
+    entry["message"] = result.get("message", {}).get("text", "")
+    if result.get("ruleId"):
+        entry["option"] = result["ruleId"]
+
+    fixits = []
+    for fix in result.get("fixes", []):
+        for change in fix.get("artifactChanges", []):
+            uri = change.get("artifactLocation", {}).get("uri", entry["file"])
+            for replacement in change.get("replacements", []):
+                region = replacement.get("deletedRegion", {})
+                fixits.append({
+                    "file": uri,
+                    "line": region.get("startLine"),
+                    "col": region.get("startColumn"),
+                    "end_col": region.get("endColumn"),
+                    "replace": replacement.get("insertedContent", {}).get("text", "")
+                })
+    if fixits:
+        entry["fixits"] = fixits
+
+    notes = []
+    for related in result.get("relatedLocations", []):
+        note = _sarif_location(related)
+        note["message"] = related.get("message", {}).get("text", "")
+        notes.append(note)
+    if notes:
+        entry["notes"] = notes
+    return entry
+
+
+@register_filter("gcc_native")
+class GccNativeFilter(GccJsonFilter):
+    """
+    Reads the structured diagnostics GCC/Clang write with
+    -fdiagnostics-format=json or =sarif(-stderr), instead of scraping text.
+
+    JSON documents are picked out of the stream as they complete, also when
+    make -j interleaves them with other output. Everything else (linker
+    errors, make messages) goes through the gcc_json text parser, so the
+    output format, success markers and options (dedup, diff) are the same.
+    """
+
+    def _reset(self):
+        super()._reset()
+        self._doc = []
+
+    def feed(self, line):
+        stripped = line.strip()
+        if self._doc:
+            if not line.startswith(JSON_LINE_STARTS):
+                # Another job's output landed inside a multi-line document.
+                return super().feed(line)
+            self._doc.append(line)
+            # A pretty-printed document can only end on an unindented bracket.
+            if stripped in ("]", "}") and line[:1] in "]}":
+                return self._parse(self._doc)
+            return ""
+
+        if _starts_document(stripped):
+            self._doc = [line]
+            if stripped not in ("[", "{"):
+                # Single-line document (GCC's usual output): complete already.
+                return self._parse(self._doc)
+            return ""
+
+        return super().feed(line)
+
+    def _parse(self, lines):
+        """Parses a complete document. Returns output to emit (streaming formats)."""
+        self._doc = []
+        text = "".join(lines)
+        try:
+            doc = json.loads(text)
+        except ValueError:
+            # Not JSON after all; treat it as ordinary output.
+            return "".join(super(GccNativeFilter, self).feed(line) for line in lines)
+
+        entries = []
+        if isinstance(doc, list):
+            entries = [_from_gcc(diag) for diag in doc if isinstance(diag, dict)]
+        elif isinstance(doc, dict):
+            entries = [_from_sarif(result) for run in doc.get("runs", []) for result in run.get("results", [])]
+        # An empty document ([] for a clean translation unit) says nothing
+        # about the link or make steps, so it is not a success marker.
+        return "".join(self._add(Diagnostic.from_dict(entry)) for entry in entries)
+
+    def finish(self):
+        pending = ""
+        if self._doc:
+            lines, self._doc = self._doc, []
+            pending = "".join(super(GccNativeFilter, self).feed(line) for line in lines)
+        remaining = super().finish()
+        if not pending:
+            return remaining
+        if isinstance(remaining, (str, DiagnosticBatch)):
+            return [pending, remaining]
+        return [pending, *remaining]
@@ -2,8 +2,14 @@ from . import register_filter
 from .base import BaseFilter
 import re
 
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
 @register_filter("raw")
 class RawFilter(BaseFilter):
-    def process(self, text: str) -> str:
-        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-        return ansi_escape.sub('', text)
+    streaming = True
+
+    def feed(self, line: str) -> str:
+        # Substring test first: most lines carry no escape codes at all.
+        if "\x1b" in line:
+            return ANSI_ESCAPE.sub('', line)
+        return line
@@ -0,0 +1,116 @@
+import json
+
+# Output formats (stage `format`): indented document, one-line document,
+# or one JSON object per line.
+FORMATS = ("json", "compact", "ndjson")
+
+_ENCODER = json.JSONEncoder(indent=2)
+_COMPACT = json.JSONEncoder(separators=(",", ":"))
+# Records serialized per json call
+ENCODE_BLOCK = 1024
+
+
+class Diagnostic:
+    """
+    One compiler diagnostic, as passed between filters.
+
+    The common fields are slots; anything else (col ranges, fix-its, notes,
+    dedup counts) lives in `extra`, which stays None for most records.
+    """
+    __slots__ = ("file", "line", "col", "type", "message", "extra")
+
+    def __init__(self, file, line, type, message, col=None, extra=None):
+        self.file = file
+        self.line = line
+        self.col = col
+        self.type = type
+        self.message = message
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        record = cls(data.pop("file", ""), data.pop("line", 0), data.pop("type", "error"),
+                     data.pop("message", ""), data.pop("col", None))
+        record.extra = data or None
+        return record
+
+    def set(self, key, value):
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def get(self, key, default=None):
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def to_dict(self):
+        data = {"file": self.file, "line": self.line, "type": self.type, "message": self.message}
+        if self.col is not None:
+            data["col"] = self.col
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __repr__(self):
+        return f"Diagnostic({self.file}:{self.line}: {self.type}: {self.message!r})"
+
+
+class DiagnosticBatch:
+    """
+    The diagnostics of one stage, handed from filter to filter as objects.
+
+    Filters that set `accepts_records = True` receive the batch itself via
+    feed_records(); for any other filter, and at the end of the chain, it is
+    serialized to the same JSON text gcc_json has always produced.
+    """
+    __slots__ = ("records", "summary", "format")
+
+    def __init__(self, records=None, summary=None, format="json"):
+        self.records = records if records is not None else []
+        # gcc_json diff mode: {"baseline", "new", "resolved", ...}; records are the new ones
+        self.summary = summary
+        self.format = format
+
+    def to_data(self):
+        records = [r.to_dict() for r in self.records]
+        if self.summary is not None:
+            return {"diff": self.summary, "new": records}
+        return records
+
+    def to_text(self):
+        """Serializes in the batch's `format`."""
+        if self.format == "ndjson":
+            lines = [encode_line({"diff": self.summary})] if self.summary is not None else []
+            lines.extend(encode_line(r.to_dict()) for r in self.records)
+            return "".join(lines)
+        if self.format == "compact":
+            return _COMPACT.encode(self.to_data()) + "\n"
+        return self.to_json()
+
+    def to_json(self):
+        if self.summary is not None:
+            return json.dumps(self.to_data(), indent=2)
+        if not self.records:
+            return "[]"
+        # Same text as json.dumps(list, indent=2), encoded in blocks so the
+        # dict form of the whole list never exists at once.
+        encode = _ENCODER.encode
+        parts = []
+        for start in range(0, len(self.records), ENCODE_BLOCK):
+            block = [r.to_dict() for r in self.records[start:start + ENCODE_BLOCK]]
+            parts.append(encode(block)[2:-2])  # Drop "[\n" and "\n]"
+        return "[\n" + ",\n".join(parts) + "\n]"
+
+
+def encode_line(data):
+    """One compact JSON value plus newline (an NDJSON line)."""
+    return _COMPACT.encode(data) + "\n"
+
+
+def render(chunk):
+    """Text form of a filter output chunk (a string or a DiagnosticBatch)."""
+    if isinstance(chunk, DiagnosticBatch):
+        return chunk.to_text()
+    return chunk
@@ -0,0 +1,214 @@
+"""
+Build history under `.ddd/history/`.
+
+Every finished build is recorded, so earlier runs can be compared or their
+logs recovered after .ddd/run/ has been overwritten. Artifacts are stored as
+compressed blobs named by the SHA-256 of their content: identical outputs
+(a rebuild that printed the same thing, a cache replay) are kept once.
+
+    .ddd/history/index.json                {"next_id": 43, "builds": [...]}
+    .ddd/history/objects/ab/<sha256>.gz    (or .xz, or no suffix)
+
+The index lists builds oldest first and is held in memory, so the Nth
+previous build, or a build by id, is a list lookup. Retention drops the
+oldest builds beyond `max_builds` or `max_mb` of stored blobs.
+"""
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import time
+
+HISTORY_DIR = os.path.join(".ddd", "history")
+INDEX_FILE = "index.json"
+OBJECTS_DIR = "objects"
+# Files recorded per build, relative to the run directory
+ARTIFACTS = ("build.log", "last_build.raw.log", "job_result.json")
+DEFAULT_MAX_BUILDS = 20
+DEFAULT_MAX_MB = 100
+COPY_CHUNK = 1024 * 1024
+
+# compression -> (blob suffix, opener(path, mode, level))
+CODECS = {
+    "gzip": (".gz", lambda path, mode, level: gzip.open(path, mode, compresslevel=level)),
+    "lzma": (".xz", lambda path, mode, level: lzma.open(path, mode, preset=level)),
+    "none": ("", lambda path, mode, level: open(path, mode)),
+}
+# lzma's default preset (6) compresses build logs at a few MB/s
+DEFAULT_LEVELS = {"gzip": 6, "lzma": 2, "none": None}
+
+
+class HistoryStore:
+    """
+    Records and looks up past builds.
+
+    Configured per target (all optional; `"history": false` turns it off):
+        "history": {"max_builds": 20, "max_mb": 100, "compression": "gzip"}
+    """
+
+    def __init__(self, history_config=None, history_dir=HISTORY_DIR):
+        self.history_dir = history_dir
+        self.objects_dir = os.path.join(history_dir, OBJECTS_DIR)
+        self.configure(history_config or {})
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.next_id = 1
+        self.builds = []
+        self._load_index()
+
+    def configure(self, history_config):
+        self.max_builds = int(history_config.get("max_builds", DEFAULT_MAX_BUILDS))
+        self.max_bytes = int(float(history_config.get("max_mb", DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.compression = history_config.get("compression", "gzip")
+        if self.compression not in CODECS:
+            print(f"[!] Unknown history compression '{self.compression}', using gzip.")
+            self.compression = "gzip"
+        self.level = history_config.get("level", DEFAULT_LEVELS[self.compression])
+
+    @classmethod
+    def from_target(cls, target, current=None):
+        """Returns a HistoryStore for the target, reusing `current` if there is one."""
+        history_config = target.get("history", {})
+        if history_config is False:
+            return None
+        if not isinstance(history_config, dict):
+            history_config = {}
+        if current is not None:
+            current.configure(history_config)
+            return current
+        return cls(history_config)
+
+    def _load_index(self):
+        path = os.path.join(self.history_dir, INDEX_FILE)
+        try:
+            with open(path) as f:
+                index = json.load(f)
+            self.builds = list(index.get("builds", []))
+            self.next_id = int(index.get("next_id", 1))
+        except (OSError, ValueError):
+            pass
+
+    def _save_index(self):
+        path = os.path.join(self.history_dir, INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"next_id": self.next_id, "builds": self.builds}, f, indent=2)
+        os.replace(tmp, path)
+
+    # --- Lookup ---
+
+    def get(self, n=0):
+        """The Nth previous build (0 = latest), or None."""
+        if n < 0 or n >= len(self.builds):
+            return None
+        return self.builds[-1 - n]
+
+    def find(self, build_id):
+        """A build by history id, or None once it has been pruned."""
+        if not self.builds:
+            return None
+        # Ids are consecutive, so the position follows from the oldest id.
+        pos = build_id - self.builds[0]["id"]
+        if 0 <= pos < len(self.builds) and self.builds[pos]["id"] == build_id:
+            return self.builds[pos]
+        return None
+
+    def open_artifact(self, entry, name):
+        """Opens one of a recorded build's artifacts for binary reading."""
+        artifact = entry["artifacts"][name]
+        suffix, opener = CODECS[artifact["codec"]]
+        return opener(self._blob_path(artifact["sha256"], suffix), "rb", None)
+
+    def restore(self, entry, dest_dir):
+        """Writes a recorded build's artifacts into dest_dir. Returns their paths."""
+        os.makedirs(dest_dir, exist_ok=True)
+        paths = {}
+        for name in entry["artifacts"]:
+            path = os.path.join(dest_dir, name)
+            with self.open_artifact(entry, name) as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+            paths[name] = path
+        return paths
+
+    # --- Recording ---
+
+    def record(self, run_dir, summary):
+        """Stores run_dir's artifacts as a new build. Returns its index entry."""
+        start = time.perf_counter()
+        artifacts = {}
+        for name in ARTIFACTS:
+            path = os.path.join(run_dir, name)
+            if os.path.exists(path):
+                artifacts[name] = self._put(path)
+        entry = dict(summary, id=self.next_id, recorded_at=time.time(), artifacts=artifacts)
+        self.next_id += 1
+        self.builds.append(entry)
+        pruned = self.prune()
+        self._save_index()
+        entry["record_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        entry["pruned"] = pruned
+        return entry
+
+    def _blob_path(self, digest, suffix):
+        return os.path.join(self.objects_dir, digest[:2], digest + suffix)
+
+    def _existing_blob(self, digest):
+        for codec, (suffix, _) in CODECS.items():
+            path = self._blob_path(digest, suffix)
+            if os.path.exists(path):
+                return codec, path
+        return None, None
+
+    def _put(self, path):
+        h = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(COPY_CHUNK), b""):
+                h.update(block)
+                size += len(block)
+        digest = h.hexdigest()
+
+        codec, blob = self._existing_blob(digest)
+        if blob is None:
+            codec = self.compression
+            suffix, opener = CODECS[codec]
+            blob = self._blob_path(digest, suffix)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = blob + f".tmp{os.getpid()}"
+            with open(path, "rb") as src, opener(tmp, "wb", self.level) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+            os.replace(tmp, blob)
+        return {"sha256": digest, "size": size, "stored": os.path.getsize(blob), "codec": codec}
+
+    def stored_bytes(self, builds=None):
+        """Disk used by the blobs the given builds reference (each blob once)."""
+        blobs = {}
+        for entry in self.builds if builds is None else builds:
+            for artifact in entry["artifacts"].values():
+                blobs[artifact["sha256"]] = artifact["stored"]
+        return sum(blobs.values())
+
+    def prune(self):
+        """Applies retention, newest build always kept. Returns the number dropped."""
+        dropped = 0
+        while len(self.builds) > 1 and (
+            len(self.builds) > self.max_builds or self.stored_bytes() > self.max_bytes
+        ):
+            self.builds.pop(0)
+            dropped += 1
+        if dropped:
+            self._collect_garbage()
+        return dropped
+
+    def _collect_garbage(self):
+        live = {a["sha256"] for entry in self.builds for a in entry["artifacts"].values()}
+        for shard in os.scandir(self.objects_dir):
+            if not shard.is_dir():
+                continue
+            for blob in os.scandir(shard.path):
+                if blob.name.split(".", 1)[0] not in live:
+                    try:
+                        os.remove(blob.path)
+                    except OSError:
+                        pass
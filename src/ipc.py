@@ -0,0 +1,117 @@
+"""
+Unix socket channel for build requests.
+
+Runs alongside the file-touch protocol on the daemon's event loop. A client
+sends one JSON object per line and gets JSON lines back:
+
+    -> {"cmd": "build"}
+    <- {"event": "queued", "build": 7}
+    <- {"event": "done", "build": 7, "success": true, "exit_code": 0, ...}
+
+    -> {"cmd": "build", "supersede": true}   (cancel the running build first)
+    -> {"cmd": "build", "profile": true}     (profile the build, see src/profiler.py)
+
+    -> {"cmd": "cancel"}
+    <- {"event": "cancelled", "cancelled": true}
+
+    -> {"cmd": "status"}
+    <- {"event": "status", "state": "building", "stage": "BUILD", ...}
+
+    -> {"cmd": "history", "n": 1, "restore": true}   (previous build's logs)
+    <- {"event": "history", "build": {"id": 41, ...}, "restored": {...}}
+
+    -> {"cmd": "ping"}
+    <- {"event": "pong", "pid": 1234}
+"""
+import asyncio
+import json
+import os
+
+SOCKET_NAME = "ddd.sock"
+
+
+def _field_error(msg, key, valid, expected):
+    """An error reply if msg[key] is set but not `expected`, else None."""
+    value = msg.get(key)
+    if value is None or valid(value):
+        return None
+    return {"event": "error", "message": f"invalid {key} {value!r} (expected {expected})"}
+
+
+def _positive_number(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and value > 0
+
+
+def _integer(value):
+    return not isinstance(value, bool) and isinstance(value, int)
+
+
+async def _handle_client(reader, writer, pipeline):
+    async def send(payload):
+        writer.write((json.dumps(payload) + "\n").encode())
+        await writer.drain()
+
+    try:
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                break
+            try:
+                msg = json.loads(raw)
+            except ValueError:
+                await send({"event": "error", "message": "invalid JSON"})
+                continue
+
+            cmd = msg.get("cmd") if isinstance(msg, dict) else None
+            if cmd == "build":
+                error = _field_error(msg, "timeout", _positive_number, "a positive number of seconds")
+                if error:
+                    await send(error)
+                    continue
+                ticket = pipeline.submit_request(supersede=bool(msg.get("supersede")),
+                                                 profile=bool(msg.get("profile")))
+                await send({"event": "queued", "build": ticket})
+                summary = await pipeline.wait_for_build(ticket, timeout=msg.get("timeout"))
+                await send(summary or {"event": "timeout", "build": ticket})
+            elif cmd == "cancel":
+                cancelled = pipeline.cancel_build(msg.get("reason") or "cancelled by client")
+                await send({"event": "cancelled", "cancelled": cancelled})
+            elif cmd == "status":
+                await send(dict(pipeline.status(), event="status"))
+            elif cmd == "history":
+                error = _field_error(msg, "n", _integer, "an integer")
+                if error:
+                    await send(error)
+                    continue
+                reply = await pipeline.history_lookup(msg.get("n"), bool(msg.get("restore")))
+                await send(dict(reply, event="history"))
+            elif cmd == "ping":
+                await send({"event": "pong", "pid": os.getpid()})
+            else:
+                await send({"event": "error", "message": f"unknown cmd: {cmd!r}"})
+    except (ConnectionError, OSError):
+        pass  # Client went away; the build still runs for file-protocol readers.
+    finally:
+        writer.close()
+
+
+async def start_ipc_server(run_dir, pipeline):
+    """
+    Binds the socket under run_dir. `pipeline` must provide submit_request(),
+    cancel_build(reason), async wait_for_build(ticket, timeout), status() and
+    async history_lookup(n, restore).
+    Returns None where sockets are unusable.
+    """
+    path = os.path.join(run_dir, SOCKET_NAME)
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(
+            lambda r, w: _handle_client(r, w, pipeline), path=path
+        )
+    except OSError as e:
+        print(f"[!] IPC socket unavailable ({e}); using file protocol only.")
+        return None
+
+    print(f"[*] Listening: {os.path.abspath(path)}")
+    return server
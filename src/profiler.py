@@ -0,0 +1,126 @@
+"""
+Profiling of pipeline runs: `--profile [N]` profiles the next N builds, a
+socket request `{"cmd": "build", "profile": true}` the build serving it.
+
+Two profilers run side by side on the daemon's event loop thread:
+
+    profile.pstats      cProfile: exact call counts and self/cumulative time
+                        (python -m pstats, snakeviz)
+    profile.collapsed   stack samples every SAMPLE_INTERVAL seconds in the
+                        folded format (flamegraph.pl, speedscope, Perfetto)
+
+Both are written next to job_result.json, whose `profile` block lists the
+hottest functions and the self time spent in each filter source file, so a
+slow plugin in .ddd/filters/ stands out without opening either file.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+PSTATS_FILE = "profile.pstats"
+COLLAPSED_FILE = "profile.collapsed"
+SAMPLE_INTERVAL = 0.001
+# Functions listed in job_result's profile.top
+TOP_FUNCTIONS = 15
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a helper thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}    # folded stack -> samples
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ddd-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                stack = ";".join(reversed(labels))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+                self.samples += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class PipelineProfiler:
+    """Profiles one pipeline run. start() and stop() on the event loop thread."""
+
+    def __init__(self, filter_dirs=()):
+        # (directory, label) of filter sources to total self time for
+        self.filter_dirs = [(os.path.abspath(d), label) for d, label in filter_dirs]
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._cpu = time.process_time()
+        self.profile.enable()
+        self.sampler.start()
+
+    def stop(self, run_dir):
+        """Writes the profiles to run_dir. Returns the job_result `profile` block."""
+        self.profile.disable()
+        self.sampler.stop()
+        wall, cpu = time.perf_counter() - self._started, time.process_time() - self._cpu
+
+        pstats_path = os.path.join(run_dir, PSTATS_FILE)
+        collapsed_path = os.path.join(run_dir, COLLAPSED_FILE)
+        self.profile.dump_stats(pstats_path)
+        self.sampler.write(collapsed_path)
+
+        stats = pstats.Stats(self.profile).stats
+        top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS]
+        return {
+            "pstats": os.path.abspath(pstats_path),
+            "collapsed": os.path.abspath(collapsed_path),
+            "wall_ms": round(wall * 1000, 2),
+            "cpu_ms": round(cpu * 1000, 2),
+            "samples": self.sampler.samples,
+            "sample_interval_ms": self.sampler.interval * 1000,
+            "top": [
+                {"function": pstats.func_std_string(func), "calls": calls,
+                 "self_ms": round(tottime * 1000, 3), "cum_ms": round(cumtime * 1000, 3)}
+                for func, (_, calls, tottime, cumtime, _) in top
+            ],
+            "filters": self._filter_self_time(stats)
+        }
+
+    def _filter_self_time(self, stats):
+        """Self time per filter source file, e.g. {".ddd/filters/mine.py": 812.5}."""
+        totals = {}
+        for (filename, _, _), (_, _, tottime, _, _) in stats.items():
+            path = os.path.abspath(filename) if os.sep in filename else None
+            if path is None:
+                continue
+            for directory, label in self.filter_dirs:
+                if path.startswith(directory + os.sep):
+                    key = f"{label}/{os.path.relpath(path, directory)}"
+                    totals[key] = totals.get(key, 0.0) + tottime
+                    break
+        return {key: round(seconds * 1000, 3)
+                for key, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)}
@@ -0,0 +1,242 @@
+"""
+Resource accounting for build stages (job_result `metrics.stages.<STAGE>.resources`).
+
+rusage: the daemon's RUSAGE_CHILDREN before and after the stage. Stages run
+one at a time and each process of the stage is reaped within it (sh waits
+for make, make for the compilers), so the difference is the stage's CPU
+time, block I/O, page faults and context switches. ru_maxrss is a
+high-water mark over the daemon's lifetime, so it is reported only when the
+stage raised it.
+
+cgroup v2: where the daemon may create child cgroups (a delegated subtree),
+each stage runs in its own cgroup (its shell moves itself in before running
+the command, so no Python runs between fork and exec), giving exact memory.peak, cpu.stat,
+io.stat and the stage's own pressure stall information (PSI). Otherwise PSI
+comes from the system-wide /proc/pressure files.
+"""
+import itertools
+import os
+import resource
+import shlex
+import time
+
+PRESSURE_DIR = "/proc/pressure"
+PRESSURE_RESOURCES = ("cpu", "memory", "io")
+
+_counter = itertools.count(1)
+# Stage cgroups that could not be removed yet (processes still exiting)
+_stale_cgroups = []
+
+
+def read_pressure(path):
+    """Parses a PSI file into cumulative stall times: {"some": us, "full": us}."""
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                kind, _, fields = line.partition(" ")
+                for field in fields.split():
+                    if field.startswith("total="):
+                        totals[kind] = int(field[len("total="):])
+    except (OSError, ValueError):
+        pass
+    return totals
+
+
+def read_flat_keyed(path):
+    """Parses `key value` lines (cpu.stat, memory.stat)."""
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                values[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return values
+
+
+def read_io_stat(path):
+    """Sums io.stat (`MAJ:MIN rbytes=.. wbytes=..` per device) over devices."""
+    totals = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    totals[key] = totals.get(key, 0) + int(value)
+    except (OSError, ValueError):
+        pass
+    return totals
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _cgroup2_dir():
+    """The daemon's own cgroup v2 directory, or None without a cgroup2 mount."""
+    mount = None
+    try:
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                left, _, right = line.partition(" - ")
+                if right.split(" ", 1)[0] == "cgroup2":
+                    mount = left.split()[4]
+                    break
+        if mount is None:
+            return None
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return os.path.normpath(os.path.join(mount, line[3:].strip().lstrip("/")))
+    except (OSError, IndexError):
+        pass
+    return None
+
+
+class StageCgroup:
+    """A cgroup v2 child of the daemon's cgroup that one stage runs in."""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def create(cls, stage):
+        """Returns a new stage cgroup, or None where cgroups are not delegated to us."""
+        parent = _cgroup2_dir()
+        if not parent:
+            return None
+        _remove_stale(parent)
+        path = os.path.join(parent, f"ddd-{os.getpid()}-{stage.lower()}-{next(_counter)}")
+        try:
+            os.mkdir(path)
+        except OSError:
+            return None
+        if not os.access(os.path.join(path, "cgroup.procs"), os.W_OK):
+            _rmdir(path)
+            return None
+        return cls(path)
+
+    def wrap(self, cmd):
+        """
+        The shell command that joins the cgroup and then runs `cmd` in place
+        (same pid). If joining fails the command still runs, just accounted
+        to the daemon's cgroup.
+        """
+        procs = shlex.quote(os.path.join(self.path, "cgroup.procs"))
+        return f"{{ echo $$ > {procs}; }} 2>/dev/null; exec sh -c {shlex.quote(cmd)}"
+
+    def stats(self):
+        cpu = read_flat_keyed(os.path.join(self.path, "cpu.stat"))
+        io = read_io_stat(os.path.join(self.path, "io.stat"))
+        peak = _read_int(os.path.join(self.path, "memory.peak"))
+        stats = {"path": self.path}
+        if "usage_usec" in cpu:
+            stats["cpu_ms"] = round(cpu["usage_usec"] / 1000, 2)
+        if peak is not None:
+            stats["memory_peak_kb"] = peak // 1024
+        if io:
+            stats["io_read_bytes"] = io.get("rbytes", 0)
+            stats["io_write_bytes"] = io.get("wbytes", 0)
+        return stats
+
+    def pressure(self):
+        return {r: read_pressure(os.path.join(self.path, f"{r}.pressure")) for r in PRESSURE_RESOURCES}
+
+    def remove(self):
+        if not _rmdir(self.path):
+            _stale_cgroups.append(self.path)
+
+
+def _rmdir(path):
+    try:
+        os.rmdir(path)
+        return True
+    except FileNotFoundError:
+        return True
+    except OSError:
+        return False
+
+
+def _remove_stale(parent=None):
+    """Retries our own leftovers, and removes those of daemons that are gone."""
+    _stale_cgroups[:] = [path for path in _stale_cgroups if not _rmdir(path)]
+    if not parent:
+        return
+    try:
+        entries = [e for e in os.listdir(parent) if e.startswith("ddd-")]
+    except OSError:
+        return
+    for entry in entries:
+        pid = entry.split("-")[1]
+        if pid.isdigit() and int(pid) != os.getpid() and not os.path.isdir(f"/proc/{pid}"):
+            _rmdir(os.path.join(parent, entry))
+
+
+def _system_pressure():
+    return {r: read_pressure(os.path.join(PRESSURE_DIR, r)) for r in PRESSURE_RESOURCES}
+
+
+class StageUsage:
+    """Measures one stage: start() before spawning it, stop() once it is reaped."""
+
+    def __init__(self, use_cgroup=True):
+        self.use_cgroup = use_cgroup
+        self.cgroup = None
+
+    def start(self, stage):
+        self.cgroup = StageCgroup.create(stage) if self.use_cgroup else None
+        self._rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._pressure = None if self.cgroup else _system_pressure()
+        self._started = time.monotonic()
+
+    def wrap(self, cmd):
+        """The stage's shell command, joining the stage cgroup first if there is one."""
+        return self.cgroup.wrap(cmd) if self.cgroup else cmd
+
+    def stop(self):
+        elapsed_ms = (time.monotonic() - self._started) * 1000
+        before, after = self._rusage, resource.getrusage(resource.RUSAGE_CHILDREN)
+        usage = {
+            "user_cpu_s": round(after.ru_utime - before.ru_utime, 3),
+            "sys_cpu_s": round(after.ru_stime - before.ru_stime, 3),
+            # High-water mark of every child so far: known only when this stage raised it
+            "max_rss_kb": after.ru_maxrss if after.ru_maxrss > before.ru_maxrss else None,
+            "block_in": after.ru_inblock - before.ru_inblock,
+            "block_out": after.ru_oublock - before.ru_oublock,
+            "major_faults": after.ru_majflt - before.ru_majflt,
+            "minor_faults": after.ru_minflt - before.ru_minflt,
+            "voluntary_ctx_switches": after.ru_nvcsw - before.ru_nvcsw,
+            "involuntary_ctx_switches": after.ru_nivcsw - before.ru_nivcsw,
+        }
+
+        if self.cgroup:
+            usage["cgroup"] = self.cgroup.stats()
+            # A fresh cgroup's PSI totals cover exactly this stage.
+            usage["pressure"] = _stall(self.cgroup.pressure(), None, elapsed_ms, "cgroup")
+            self.cgroup.remove()
+            self.cgroup = None
+        else:
+            usage["pressure"] = _stall(_system_pressure(), self._pressure, elapsed_ms, "system")
+        return usage
+
+
+def _stall(after, before, elapsed_ms, scope):
+    """Stall time (and share of the stage's wall time) per resource."""
+    pressure = {"scope": scope}
+    for name in PRESSURE_RESOURCES:
+        totals = after.get(name)
+        if not totals:
+            continue
+        entry = {}
+        for kind, total in totals.items():
+            stalled_ms = (total - ((before or {}).get(name, {}).get(kind, 0))) / 1000
+            entry[f"{kind}_ms"] = round(stalled_ms, 2)
+            entry[f"{kind}_pct"] = round(100 * stalled_ms / elapsed_ms, 2) if elapsed_ms else 0.0
+        pressure[name] = entry
+    return pressure
@@ -0,0 +1,116 @@
+"""
+Per-build trace in the Chrome Trace Event format (`.ddd/run/trace.json`).
+
+Enabled with `--trace` or a target's `"trace": true`. The file opens in
+Perfetto (ui.perfetto.dev) or chrome://tracing and shows where the daemon
+spent a build: request detection, plugin and config loading, each stage
+(spawn, output, reaping), each filter's finish()/process() work, the
+sentinel check and artifact writes. Counter tracks plot the output rate and
+the filters' (sampled) feed() time while a stage runs.
+
+Timestamps are microseconds since the build's first trigger.
+"""
+import json
+import os
+import time
+
+TRACE_FILE = "trace.json"
+# Seconds between counter samples while a stage runs
+COUNTER_INTERVAL = 0.1
+
+PID = 1
+PIPELINE_TID = 1
+FILTERS_TID = 2
+
+
+class _Span:
+    __slots__ = ("trace", "name", "cat", "args", "start")
+
+    def __init__(self, trace, name, cat, args):
+        self.trace = trace
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.complete(self.name, self.start, time.perf_counter(), self.cat, self.args)
+        return False
+
+
+class PipelineTrace:
+    """Collects the events of one build; written only if `enabled`."""
+
+    def __init__(self, queued_at=None, enabled=False):
+        self.enabled = enabled
+        self.events = []
+        # perf_counter() is the trace clock; queue timestamps are monotonic()
+        mono_offset = time.perf_counter() - time.monotonic()
+        self.origin = time.perf_counter() if queued_at is None else queued_at + mono_offset
+
+    def _us(self, t):
+        return round((t - self.origin) * 1e6, 1)
+
+    def span(self, name, cat="pipeline", **args):
+        """Context manager recording a complete ("X") event around a block."""
+        return _Span(self, name, cat, args)
+
+    def complete(self, name, start, end, cat="pipeline", args=None, tid=PIPELINE_TID):
+        event = {"name": name, "cat": cat, "ph": "X", "ts": self._us(start),
+                 "dur": round((end - start) * 1e6, 1), "pid": PID, "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def counter(self, name, values, t=None):
+        self.events.append({"name": name, "ph": "C", "pid": PID,
+                            "ts": self._us(time.perf_counter() if t is None else t), "args": values})
+
+    def sample_stage(self, loop, progress, chain):
+        """
+        Plots output rate and cumulative filter feed() time every
+        COUNTER_INTERVAL while a stage runs. Returns a function that stops it.
+        """
+        last = [time.perf_counter(), 0, 0]
+        handle = [None]
+
+        def tick():
+            now = time.perf_counter()
+            raw_bytes, lines = progress.get("raw_bytes", 0), progress.get("lines", 0)
+            elapsed = now - last[0]
+            if elapsed > 0:
+                self.counter("output rate", {
+                    "KB/s": round((raw_bytes - last[1]) / 1024 / elapsed, 1),
+                    "lines/s": round((lines - last[2]) / elapsed, 1)
+                }, now)
+            self.counter("filter feed ms", {f["name"]: f["feed_ms"] for f in chain.timing_stats()}, now)
+            last[:] = [now, raw_bytes, lines]
+            handle[0] = loop.call_later(COUNTER_INTERVAL, tick)
+
+        tick()
+
+        def stop():
+            handle[0].cancel()
+            tick()
+            handle[0].cancel()
+        return stop
+
+    def to_dict(self, **metadata):
+        names = [
+            {"name": "process_name", "ph": "M", "pid": PID, "tid": 0, "args": {"name": "dd-daemon"}},
+            {"name": "thread_name", "ph": "M", "pid": PID, "tid": PIPELINE_TID, "args": {"name": "pipeline"}},
+            {"name": "thread_name", "ph": "M", "pid": PID, "tid": FILTERS_TID, "args": {"name": "filters"}},
+        ]
+        return {"traceEvents": names + self.events, "displayTimeUnit": "ms", "otherData": metadata}
+
+    def write(self, run_dir, **metadata):
+        """Atomically writes run_dir/trace.json. Returns its path."""
+        path = os.path.join(run_dir, TRACE_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(**metadata), f)
+        os.replace(tmp, path)
+        return path
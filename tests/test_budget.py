@@ -0,0 +1,139 @@
+import json
+import sys
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.budget import shape_log
+
+
+def _write_logs(tmp_path, clean_body, raw_body):
+    log = tmp_path / "build.log"
+    raw = tmp_path / "raw.log"
+    log.write_text(
+        "=== Pipeline: dev (now) ===\n\n--- BUILD OUTPUT ---\n" + clean_body
+        + "\n--- 📊 Build Stats ---\n⏱  Duration: 1.00s\n"
+    )
+    raw.write_text("=== Pipeline: dev (now) ===\n\n--- BUILD RAW OUTPUT ---\n" + raw_body)
+    return log, raw
+
+def test_under_budget_is_untouched(tmp_path):
+    log, raw = _write_logs(tmp_path, "all good\n", "all good\n")
+    before = log.read_text()
+    metrics = shape_log(str(log), str(raw), 1000)
+    assert metrics["shaped"] is False
+    assert log.read_text() == before
+
+def test_json_diagnostics_ranked_into_budget(tmp_path):
+    entries = [
+        {"file": f"src/w{i}.c", "line": i, "type": "warning", "message": "unused variable " + "x" * 40}
+        for i in range(200)
+    ]
+    entries.insert(150, {"file": "src/late.c", "line": 7, "type": "error", "message": "late error"})
+    entries.insert(3, {"file": "src/note.c", "line": 1, "type": "note", "message": "some note"})
+    raw_body = "".join(f"{e['file']}:{e['line']}:1: {e['type']}: {e['message']}\n" for e in entries)
+    log, raw = _write_logs(tmp_path, json.dumps(entries, indent=2) + "\n", raw_body)
+
+    metrics = shape_log(str(log), str(raw), 1000)
+    assert metrics["shaped"] is True
+    assert metrics["tokens_before"] > 1000 >= metrics["tokens"]
+
+    text = log.read_text()
+    body = text.split("--- BUILD OUTPUT ---\n", 1)[1].split("\n--- ✂️", 1)[0]
+    kept = json.loads(body)
+    assert "late error" in [k["message"] for k in kept]
+    assert all(k["type"] != "note" for k in kept)
+    # Earlier warnings win over later ones
+    warnings = [k["line"] for k in kept if k["type"] == "warning"]
+    assert warnings == list(range(len(warnings)))
+    assert metrics["omitted"]["note"] == 1
+    assert "Build Stats" in text
+
+    # Pointers lead back to the omitted lines in the raw log
+    assert "omitted for max_tokens=1000" in text
+    ref = text.split("Omitted at: ", 1)[1].split(";")[0]
+    offset = int(ref.rsplit("@", 1)[1])
+    raw_bytes = raw.read_bytes()
+    line = raw_bytes[offset:raw_bytes.index(b"\n", offset)].decode()
+    assert line.startswith(ref.split()[1] + ":")
+
+def _diagnostics(count):
+    entries = [
+        {"file": f"src/w{i}.c", "line": i, "type": "warning", "message": "unused variable " + "x" * 40}
+        for i in range(count)
+    ]
+    entries.insert(count // 2, {"file": "src/late.c", "line": 7, "type": "error", "message": "late error"})
+    raw_body = "".join(f"{e['file']}:{e['line']}:1: {e['type']}: {e['message']}\n" for e in entries)
+    return entries, raw_body
+
+def _shaped_body(log):
+    return log.read_text().split("--- BUILD OUTPUT ---\n", 1)[1].split("\n--- ✂️", 1)[0]
+
+def test_compact_section_stays_compact(tmp_path):
+    entries, raw_body = _diagnostics(200)
+    # As streamed by gcc_json: one compact record per line
+    body = "[" + ",\n".join(json.dumps(e, separators=(",", ":")) for e in entries) + "]\n"
+    log, raw = _write_logs(tmp_path, body, raw_body)
+
+    metrics = shape_log(str(log), str(raw), 1000)
+    assert metrics["shaped"] is True
+    assert metrics["tokens"] <= 1000
+    shaped = _shaped_body(log)
+    assert "\n  " not in shaped
+    lines = shaped.splitlines()
+    assert lines[0].startswith("[{") and lines[-1].endswith("}]")
+    assert "late error" in [k["message"] for k in json.loads(shaped)]
+
+def test_ndjson_section_ranked_per_record(tmp_path):
+    entries, raw_body = _diagnostics(200)
+    body = json.dumps({"diff": {"new": 201, "fixed": 0}}) + "\n"
+    body += "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+    log, raw = _write_logs(tmp_path, body, raw_body)
+
+    metrics = shape_log(str(log), str(raw), 1000)
+    assert metrics["shaped"] is True
+    assert metrics["tokens"] <= 1000
+    records = [json.loads(line) for line in _shaped_body(log).splitlines() if line]
+    assert records[0] == {"diff": {"new": 201, "fixed": 0}}
+    assert "late error" in [r["message"] for r in records[1:]]
+    assert len(records) < 100
+
+def test_text_output_keeps_errors_first(tmp_path):
+    body = "".join(f"compiling module {i}\n" for i in range(500)) + "main.c:3:1: error: boom\n"
+    log, raw = _write_logs(tmp_path, body, body)
+    shape_log(str(log), str(raw), 400, {"BUILD": (0, raw.stat().st_size)})
+    text = log.read_text()
+    assert "main.c:3:1: error: boom" in text
+    assert "other: " in text
+    assert "compiling module 0\n" in text
+    assert "compiling module 499" not in text
+    assert f"bytes 0-{raw.stat().st_size}" in text
+
+def test_daemon_applies_max_tokens(ddd_workspace, daemon_proc):
+    import time
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    cmd = "for i in $(seq 1 400); do echo \"src/f$i.c:$i:1: warning: unused variable 'v$i'\"; done; echo 'src/main.c:9:2: error: boom'"
+    config_data = {"targets": {"dev": {"build": {"cmd": cmd, "filter": "gcc_json"}, "max_tokens": 1500}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    for _ in range(100):
+        if (run_dir / "build.exit").exists() and not (run_dir / "ipc.lock").exists():
+            break
+        time.sleep(0.1)
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    assert result["budget"]["shaped"] is True
+    assert result["budget"]["tokens"] <= 1500
+    text = (run_dir / "build.log").read_text()
+    assert "src/main.c" in text
+    assert "Raw output: .ddd/run/last_build.raw.log bytes" in text
+
+    # The stats footer and metrics describe the shaped log, not the unshaped one
+    tokens = int(text.split("Est. Tokens: ", 1)[1].split()[0])
+    assert tokens <= 1500
+    assert result["metrics"]["clean_bytes"] < result["budget"]["clean_bytes_before"]
+    assert f"→ {result['metrics']['clean_bytes']} clean bytes" in text
+    assert text.count("Build Stats") == 1
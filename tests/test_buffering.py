@@ -1,7 +1,8 @@
+import asyncio
 import sys
 import os
 import shutil
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from pathlib import Path
 import importlib.util
 
@@ -14,6 +15,14 @@ spec = importlib.util.spec_from_file_location("dd_daemon", str(TOOL_ROOT / "src/
 dd_daemon = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(dd_daemon)
 
+def _fake_process():
+    """Fake asyncio subprocess with no output and exit code 0."""
+    proc = MagicMock()
+    proc.stdout.read = AsyncMock(return_value=b"")
+    proc.wait = AsyncMock(return_value=0)
+    proc.returncode = 0
+    return proc
+
 def test_buffering_wraps_shell_commands():
     """
     Verify that complex shell commands (cd, &&) are wrapped in 'sh -c'
@@ -24,11 +33,9 @@ def test_buffering_wraps_shell_commands():
         handler = dd_daemon.RequestHandler()
         
         # 2. Mock subprocess.Popen to capture the command string
-        with patch("subprocess.Popen") as mock_popen:
+        with patch("asyncio.create_subprocess_shell", new_callable=AsyncMock) as mock_popen:
             # Setup mock process behavior
-            mock_popen.return_value.stdout = [] 
-            mock_popen.return_value.returncode = 0
-            mock_popen.return_value.wait.return_value = None
+            mock_popen.return_value = _fake_process()
             
             # 3. Run a stage with a complex command
             # The Regression Case: cd dir && make
@@ -38,7 +45,7 @@ def test_buffering_wraps_shell_commands():
             # Mock file handles
             f_mock = MagicMock()
             
-            handler._run_stage("TEST", stage_config, f_mock, f_mock)
+            asyncio.run(handler._run_stage("TEST", stage_config, f_mock, f_mock))
             
             # 4. Verify the executed command
             args, _ = mock_popen.call_args
@@ -59,16 +66,15 @@ def test_buffering_handles_quotes_safely():
     """Verify that commands with internal quotes are handled safely."""
     with patch("shutil.which", return_value="/usr/bin/stdbuf"):
         handler = dd_daemon.RequestHandler()
-        with patch("subprocess.Popen") as mock_popen:
-            mock_popen.return_value.stdout = [] 
-            mock_popen.return_value.returncode = 0
+        with patch("asyncio.create_subprocess_shell", new_callable=AsyncMock) as mock_popen:
+            mock_popen.return_value = _fake_process()
             
             # Command with quotes: echo "hello world"
             cmd_input = 'echo "hello world"'
             stage_config = {"cmd": cmd_input}
             f_mock = MagicMock()
             
-            handler._run_stage("TEST", stage_config, f_mock, f_mock)
+            asyncio.run(handler._run_stage("TEST", stage_config, f_mock, f_mock))
             
             args, _ = mock_popen.call_args
             executed_cmd = args[0]
@@ -81,15 +87,15 @@ def test_no_buffering_if_stdbuf_missing():
     """Verify we fall back to raw execution if stdbuf is not installed."""
     with patch("shutil.which", return_value=None):
         handler = dd_daemon.RequestHandler()
-        with patch("subprocess.Popen") as mock_popen:
-            mock_popen.return_value.stdout = [] 
-            mock_popen.return_value.returncode = 0
+        with patch("asyncio.create_subprocess_shell", new_callable=AsyncMock) as mock_popen:
+            mock_popen.return_value = _fake_process()
             
             cmd_input = "ls -la"
-            stage_config = {"cmd": cmd_input}
+            # No stage cgroup either: where one is available the shell joins it first
+            stage_config = {"cmd": cmd_input, "cgroup": False}
             f_mock = MagicMock()
             
-            handler._run_stage("TEST", stage_config, f_mock, f_mock)
+            asyncio.run(handler._run_stage("TEST", stage_config, f_mock, f_mock))
             
             args, _ = mock_popen.call_args
             executed_cmd = args[0]
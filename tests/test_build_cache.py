@@ -0,0 +1,138 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.build_cache import BuildCache, InputHasher
+
+
+def test_hasher_reuses_stat_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.c").write_text("int a;")
+    (tmp_path / "src" / "b.c").write_text("int b;")
+
+    hasher = InputHasher(str(tmp_path / "stat.json"))
+    key, files = hasher.digest(["src/**/*.c"])
+    assert files == 2 and hasher.hashed == 2
+    hasher.save()
+
+    # A fresh hasher (daemon restart) loads the stat cache and reads nothing.
+    hasher = InputHasher(str(tmp_path / "stat.json"))
+    assert hasher.digest(["src/**/*.c"]) == (key, 2)
+    assert hasher.hashed == 0
+
+    (tmp_path / "src" / "a.c").write_text("int a = 1;")
+    changed, _ = hasher.digest(["src/**/*.c"])
+    assert changed != key
+    assert hasher.hashed == 1
+
+def test_key_depends_on_target_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all:")
+    cache = BuildCache({"inputs": ["Makefile"]}, cache_dir=str(tmp_path / "cache"))
+    raw = cache.compute_key({"build": {"cmd": "make", "filter": "raw"}})
+    gcc = cache.compute_key({"build": {"cmd": "make", "filter": "gcc_json"}})
+    assert raw["key"] != gcc["key"]
+    assert raw["files"] == 1
+
+def test_key_depends_on_filter_code(tmp_path, monkeypatch):
+    from src.filters import load_plugins
+    from src import build_cache
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "Makefile").write_text("all:")
+    plugin = tmp_path / ".ddd" / "filters" / "keyed.py"
+    plugin.parent.mkdir(parents=True)
+    target = {"build": {"cmd": "make", "filter": "keyed"}}
+    cache = BuildCache({"inputs": ["Makefile"]}, cache_dir=str(tmp_path / "cache"))
+
+    plugin.write_text("VALUE = 1\n")
+    load_plugins(project_root=str(tmp_path))
+    first = cache.compute_key(target)["key"]
+    plugin.write_text("VALUE = 22\n")
+    load_plugins(project_root=str(tmp_path))
+    edited = cache.compute_key(target)["key"]
+    assert edited != first
+
+    monkeypatch.setattr(build_cache, "TOOL_VERSION", "99.0.0")
+    assert cache.compute_key(target)["key"] != edited
+
+    plugin.unlink()
+    load_plugins(project_root=str(tmp_path))
+
+def test_diff_targets_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = {"inputs": ["Makefile"]}
+    assert BuildCache.from_target({"build": {"cmd": "make"}, "cache": cache}) is not None
+    diff = {"build": {"cmd": "make", "filter": "gcc_json", "diff": True}, "cache": cache}
+    assert BuildCache.from_target(diff) is None
+    verify_diff = {"build": {"cmd": "make"}, "verify": {"cmd": "make test", "diff": True}, "cache": cache}
+    assert BuildCache.from_target(verify_diff) is None
+
+def test_store_replay_and_prune(tmp_path):
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    cache = BuildCache({"inputs": ["x"], "max_entries": 2}, cache_dir=str(tmp_path / "cache"))
+
+    for i, key in enumerate(["aa11", "bb22", "cc33"]):
+        for name in ("build.log", "last_build.raw.log", "build.exit"):
+            (run_dir / name).write_text(f"{key}\n")
+        (run_dir / "job_result.json").write_text(json.dumps({"run": i}))
+        cache.store(key, str(run_dir))
+        time.sleep(0.01)
+
+    assert cache.lookup("aa11") is None  # Oldest entry pruned
+    entry = cache.lookup("cc33")
+    assert entry
+    (run_dir / "build.log").write_text("stale")
+    assert cache.replay(entry, str(run_dir)) == {"run": 2}
+    assert (run_dir / "build.log").read_text() == "cc33\n"
+
+def _wait_for_result(run_dir, previous=None):
+    result_file = run_dir / "job_result.json"
+    for _ in range(100):
+        if result_file.exists() and not (run_dir / "ipc.lock").exists():
+            text = result_file.read_text()
+            if text and text != previous:
+                return text
+        time.sleep(0.1)
+    raise AssertionError("build did not finish")
+
+def test_daemon_replays_unchanged_build(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    (ddd_workspace / "main.c").write_text("int main(void) { return 0; }\n")
+    counter = ddd_workspace / "runs.txt"
+    config_data = {
+        "targets": {
+            "dev": {
+                "build": {"cmd": f"echo run >> {counter} && echo 'CACHED_BUILD'", "filter": "raw"},
+                "cache": {"inputs": ["*.c"]}
+            }
+        }
+    }
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    first = json.loads(_wait_for_result(run_dir))
+    assert first["cache"]["hit"] is False
+
+    time.sleep(0.5)
+    (run_dir / "build.request").touch()
+    second = json.loads(_wait_for_result(run_dir, json.dumps(first, indent=2)))
+    assert second["cache"]["hit"] is True
+    assert second["cache"]["key"] == first["cache"]["key"]
+    assert counter.read_text().count("run") == 1
+    log = (run_dir / "build.log").read_text()
+    assert "CACHED_BUILD" in log
+    assert "Replayed from cache" in log
+
+    time.sleep(0.5)
+    (ddd_workspace / "main.c").write_text("int main(void) { return 1; }\n")
+    (run_dir / "build.request").touch()
+    third = json.loads(_wait_for_result(run_dir, json.dumps(second, indent=2)))
+    assert third["cache"]["hit"] is False
+    assert counter.read_text().count("run") == 2
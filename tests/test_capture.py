@@ -0,0 +1,64 @@
+import json
+import sys
+from pathlib import Path
+
+# Ensure we can import src
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.filters import FilterChain
+from src.filters.capture import CaptureBuffer
+from src.filters.crash_detector import CrashDetectorFilter
+
+def test_buffer_stays_in_memory_below_limit():
+    buf = CaptureBuffer(limit=100)
+    buf.write("hello\n")
+    assert not buf.spilled
+    assert buf.getvalue() == "hello\n"
+    assert buf.peak == 6
+
+def test_in_memory_chunks_are_joined_into_blocks():
+    buf = CaptureBuffer(limit=1024 * 1024)
+    lines = [f"line {i}\n" for i in range(1000)]
+    for line in lines:
+        buf.write(line)
+    chunks = list(buf.chunks(size=1000))
+    assert len(chunks) < 20
+    assert all(len(c) >= 1000 for c in chunks[:-1])
+    assert "".join(chunks) == "".join(lines)
+
+def test_buffer_spills_above_limit():
+    buf = CaptureBuffer(limit=10)
+    lines = [f"line {i}\n" for i in range(100)]
+    for line in lines:
+        buf.write(line)
+    assert buf.spilled
+    assert buf.spill_events == 1
+    assert buf.peak <= 10 + len(lines[0])
+    # Chunked read-back preserves content and order
+    assert list(buf.chunks(size=7))[0] == "line 0\n"
+    assert buf.getvalue() == "".join(lines)
+    buf.close()
+
+def test_crash_detector_replays_spilled_output():
+    f = CrashDetectorFilter({"capture_limit_mb": 0.0001})
+    text = "".join(f"test {i} ok\n" for i in range(500))
+    assert f.process(text) == text
+    assert f.captures[0].spill_events == 1
+
+def test_crash_detector_spilled_json_input():
+    f = CrashDetectorFilter({"capture_limit_mb": 0.0001})
+    entries = [{"file": "a.c", "line": i, "type": "error", "message": "x"} for i in range(100)]
+    data = json.loads(f.process(json.dumps(entries, indent=2) + "\nBus error\n"))
+    assert data[0]["type"] == "fatal"
+    assert len(data) == 101
+
+def test_chain_reports_capture_stats():
+    chain = FilterChain(["crash_detector"], {"capture_limit_mb": 0.0001})
+    for i in range(500):
+        chain.feed(f"test {i}\n")
+    out = "".join(chain.drain())
+    assert out.startswith("test 0\n")
+    stats = chain.capture_stats()
+    assert stats["spill_events"] == 1
+    assert stats["spilled_bytes"] == len(out)
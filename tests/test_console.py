@@ -0,0 +1,113 @@
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.console import ConsoleEcho, LogRotator, ECHO_BATCH_BYTES, ECHO_INTERVAL
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+OUTPUT = "cc -c a.c\na.c:1:2: error: oops\nld: warning: x\nSegmentation fault\n"
+
+
+def test_full_writes_every_line():
+    stream = CountingStream()
+    echo = ConsoleEcho("full", stream)
+    for line in OUTPUT.splitlines(keepends=True):
+        echo.write(line)
+    echo.close()
+    assert stream.getvalue() == OUTPUT
+    assert stream.writes == 4
+
+
+def test_batched_coalesces_writes():
+    stream = CountingStream()
+    echo = ConsoleEcho("batched", stream)
+    for i in range(1000):
+        echo.write(f"line {i}\n")
+    echo.close()
+    assert stream.getvalue() == "".join(f"line {i}\n" for i in range(1000))
+    assert stream.writes == 1
+
+
+def test_batched_flushes_at_batch_size():
+    stream = CountingStream()
+    echo = ConsoleEcho("batched", stream)
+    line = "x" * 1023 + "\n"
+    for _ in range(ECHO_BATCH_BYTES // len(line) * 2):
+        echo.write(line)
+    assert stream.writes == 2
+    echo.close()
+
+
+def test_batched_flushes_when_output_goes_quiet():
+    stream = CountingStream()
+
+    async def quiet_stage():
+        echo = ConsoleEcho("batched", stream, loop=asyncio.get_running_loop())
+        echo.write("compiling...\n")
+        await asyncio.sleep(ECHO_INTERVAL * 2)
+        # Shown without waiting for more output or the end of the stage
+        assert stream.getvalue() == "compiling...\n"
+        echo.close()
+
+    asyncio.run(quiet_stage())
+    assert stream.writes == 1
+
+
+def test_errors_only_picks_error_lines_across_chunks():
+    stream = CountingStream()
+    echo = ConsoleEcho("errors-only", stream)
+    for i in range(0, len(OUTPUT), 5):
+        echo.write(OUTPUT[i:i + 5])
+    echo.write("final: fatal error")
+    echo.close()
+    assert stream.getvalue() == "a.c:1:2: error: oops\nSegmentation fault\nfinal: fatal error\n"
+    assert echo.lines == 3
+
+
+def test_off_and_unknown_modes():
+    stream = CountingStream()
+    echo = ConsoleEcho("off", stream)
+    echo.write(OUTPUT)
+    echo.close()
+    assert stream.getvalue() == ""
+    assert ConsoleEcho("loud", stream).mode == "full"
+
+
+def test_log_rotation(tmp_path, monkeypatch):
+    log = tmp_path / "daemon.log"
+    out = open(log, "a")
+    err = open(log, "a")
+    monkeypatch.setattr(sys, "stdout", out)
+    monkeypatch.setattr(sys, "stderr", err)
+    rotator = LogRotator(str(log), max_bytes=100, backups=2)
+    try:
+        for round_ in range(3):
+            out.write(f"round {round_}\n" + "x" * 100 + "\n")
+            out.flush()
+            assert rotator.maybe_rotate() is True
+        out.write("after\n")
+        out.flush()
+        assert rotator.maybe_rotate() is False
+    finally:
+        out.close()
+        err.close()
+
+    assert "after" in log.read_text()
+    assert (tmp_path / "daemon.log.1").read_text().startswith("[i] Rotated")
+    assert "round 2" in (tmp_path / "daemon.log.1").read_text()
+    assert "round 1" in (tmp_path / "daemon.log.2").read_text()
+    assert not (tmp_path / "daemon.log.3").exists()
@@ -113,3 +113,202 @@ def test_build_failure_artifacts(ddd_workspace, daemon_proc):
     result = json.loads(result_file.read_text())
     assert result["success"] is False
     assert result["exit_code"] != 0
+
+def test_stage_timeout_kills_build(ddd_workspace, daemon_proc):
+    """A stage exceeding its `timeout` is killed (whole group) and reported."""
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    pid_file = ddd_workspace / "child.pid"
+
+    # SIGTERM is ignored, so only the SIGKILL after kill_grace can stop it.
+    cmd = f"trap '' TERM; sleep 60 & echo $! > {pid_file}; echo 'TIMEOUT_STARTED'; wait"
+    config_data = {
+        "targets": {
+            "dev": {
+                "build": {"cmd": cmd, "filter": "raw", "timeout": 1, "kill_grace": 0.5},
+                "verify": {"cmd": "echo 'SHOULD_NOT_RUN'"}
+            }
+        }
+    }
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    start = time.time()
+    (run_dir / "build.request").touch()
+    exit_file = run_dir / "build.exit"
+    for _ in range(100):
+        if exit_file.exists():
+            break
+        time.sleep(0.1)
+
+    assert exit_file.read_text().strip() == "124"
+    assert time.time() - start < 8
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    assert result["success"] is False
+    assert result["timed_out"] == {"stage": "BUILD", "timeout": 1, "kill_grace": 0.5}
+
+    log = (run_dir / "build.log").read_text()
+    assert "TIMEOUT_STARTED" in log
+    assert "BUILD TIMED OUT" in log
+    assert "SHOULD_NOT_RUN" not in log
+
+    child = int(pid_file.read_text())
+    for _ in range(30):
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("build's background child survived the timeout")
+
+def test_binary_capture_stage(ddd_workspace, daemon_proc):
+    """`"capture": "binary"` keeps raw bytes verbatim and still feeds the filters."""
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+
+    # Invalid UTF-8 plus a diagnostic and enough filler to span several reads.
+    cmd = (
+        "printf 'bad \\377\\376 bytes\\r\\n'; "
+        "seq 1 100000; "
+        "echo 'main.c:3:5: error: expected declaration'"
+    )
+    config_data = {
+        "targets": {
+            "dev": {"build": {"cmd": cmd, "filter": "gcc_json", "capture": "binary"}}
+        }
+    }
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    exit_file = run_dir / "build.exit"
+    for _ in range(100):
+        if exit_file.exists():
+            break
+        time.sleep(0.1)
+    assert exit_file.exists()
+
+    raw = (run_dir / "last_build.raw.log").read_bytes()
+    assert b"bad \xff\xfe bytes\r\n" in raw
+    assert b"\n100000\n" in raw
+
+    log = (run_dir / "build.log").read_text()
+    data = json.loads(log.split("--- BUILD OUTPUT ---")[1].split("--- 📊")[0])
+    assert data == [{"file": "main.c", "line": 3, "col": 5, "type": "error",
+                     "message": "expected declaration"}]
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    start, end = result["metrics"]["stages"]["BUILD"]["raw_offsets"]
+    assert raw[start:end].startswith(b"bad \xff\xfe")
+
+@pytest.mark.parametrize("capture", ["lines", "binary"])
+def test_raw_bytes_counts_bytes(ddd_workspace, daemon_proc, capture):
+    """raw_bytes and clean_bytes count bytes, not characters, in both capture modes."""
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    # 5 bytes of UTF-8 per line, 3 characters once decoded
+    cmd = "for i in 1 2 3; do printf '\\303\\251\\303\\251\\n'; done"
+    config_data = {"targets": {"dev": {"build": {"cmd": cmd, "filter": "raw", "capture": capture}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    exit_file = run_dir / "build.exit"
+    for _ in range(100):
+        if exit_file.exists():
+            break
+        time.sleep(0.1)
+    assert exit_file.exists()
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    assert result["metrics"]["raw_bytes"] == 15
+    # The raw filter passes everything through: same unit, same count
+    assert result["metrics"]["clean_bytes"] == 15
+    assert "→ 15 clean bytes" in (run_dir / "build.log").read_text()
+
+def test_job_result_timings(ddd_workspace, daemon_proc):
+    """job_result.json breaks the build's time down by pipeline step, stage and filter."""
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    config_data = {
+        "targets": {
+            "dev": {"build": {"cmd": "sleep 0.2; echo 'main.c:1:1: error: x'", "filter": ["raw", "gcc_json"]}}
+        }
+    }
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    exit_file = run_dir / "build.exit"
+    for _ in range(100):
+        if exit_file.exists() and not (run_dir / "ipc.lock").exists():
+            break
+        time.sleep(0.1)
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    timings = result["timings"]
+    for key in ("trigger_to_lock_ms", "load_plugins_ms", "config_ms", "cpu_ms", "artifacts_ms"):
+        assert timings[key] >= 0
+
+    stage = result["metrics"]["stages"]["BUILD"]
+    assert stage["timing"]["first_output_ms"] >= 150
+    assert stage["timing"]["wall_ms"] >= stage["timing"]["first_output_ms"]
+    assert [f["name"] for f in stage["filters"]] == ["raw", "gcc_json"]
+    assert stage["filters"][1]["sampled_calls"] == 1
+
+BROKEN_PLUGIN = """
+from src.filters import register_filter
+from src.filters.base import BaseFilter
+
+@register_filter("broken")
+class BrokenFilter(BaseFilter):
+    streaming = True
+
+    def feed(self, line):
+        raise RuntimeError("plugin bug")
+"""
+
+def test_pipeline_error_fails_build_and_daemon_survives(ddd_workspace, daemon_proc):
+    """An exception in the pipeline fails that build; the daemon keeps serving."""
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    (ddd_dir / "filters").mkdir()
+    (ddd_dir / "filters" / "broken.py").write_text(BROKEN_PLUGIN)
+    pid_file = ddd_workspace / "child.pid"
+    config_data = {"targets": {"dev": {"build": {
+        "cmd": f"echo $$ > {pid_file}; echo 'OUTPUT'; sleep 30", "filter": "broken"
+    }}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    exit_file = run_dir / "build.exit"
+    (run_dir / "build.request").touch()
+    for _ in range(100):
+        if exit_file.exists():
+            break
+        time.sleep(0.1)
+    assert exit_file.read_text() == "1"
+    result = json.loads((run_dir / "job_result.json").read_text())
+    assert result["success"] is False
+    assert result["error"] == "RuntimeError: plugin bug"
+    assert "PIPELINE ERROR: RuntimeError: plugin bug" in (run_dir / "build.log").read_text()
+
+    # The stage was killed rather than left running
+    child = int(pid_file.read_text())
+    for _ in range(50):
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("stage survived the pipeline error")
+
+    # Next build runs normally
+    config_data["targets"]["dev"]["build"] = {"cmd": "echo 'RECOVERED'", "filter": "raw"}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+    exit_file.unlink()
+    (run_dir / "build.request").touch()
+    for _ in range(100):
+        if exit_file.exists():
+            break
+        time.sleep(0.1)
+    assert exit_file.read_text() == "0"
+    assert "RECOVERED" in (run_dir / "build.log").read_text()
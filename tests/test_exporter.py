@@ -0,0 +1,120 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.exporter import DaemonMetrics, Histogram, write_textfile
+
+
+def _result(success=True, duration=3.0, **extra):
+    result = {
+        "success": success,
+        "duration": duration,
+        "metrics": {
+            "raw_bytes": 1000,
+            "clean_bytes": 100,
+            "stages": {
+                "BUILD": {
+                    "timing": {"wall_ms": 2500.0},
+                    "filters": [{"name": "gcc_json", "feed_ms": 200.0, "finish_ms": 50.0}]
+                }
+            }
+        },
+        "queue": {"wait": 0.2},
+        "timestamp": 1700000000.0
+    }
+    result.update(extra)
+    return result
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram((1, 5))
+    for value in (0.5, 1, 3, 10):
+        h.observe(value)
+    samples = list(h.samples("x", {}))
+    assert samples == [
+        'x_bucket{le="1"} 2',
+        'x_bucket{le="5"} 3',
+        'x_bucket{le="+Inf"} 4',
+        "x_sum{} 14.5",
+        "x_count{} 4",
+    ]
+
+
+def test_render_accumulates_builds():
+    metrics = DaemonMetrics('/src/my "app"')
+    metrics.observe_build(_result())
+    metrics.observe_build(_result(success=False, duration=40.0))
+    metrics.observe_build(_result(success=False, cancelled={"reason": "x"}))
+    text = metrics.render()
+
+    project = 'project="/src/my \\"app\\""'
+    assert f'ddd_builds_total{{{project},result="success"}} 1' in text
+    assert f'ddd_builds_total{{{project},result="failure"}} 1' in text
+    assert f'ddd_builds_total{{{project},result="cancelled"}} 1' in text
+    assert f"ddd_build_failures_total{{{project}}} 2" in text
+    assert f'ddd_build_duration_seconds_bucket{{{project},le="30"}} 2' in text
+    assert f"ddd_build_duration_seconds_count{{{project}}} 3" in text
+    assert f'ddd_stage_duration_seconds_count{{{project},stage="BUILD"}} 3' in text
+    assert f'ddd_filter_seconds_total{{{project},filter="gcc_json"}} 0.75' in text
+    assert f"ddd_raw_bytes_total{{{project}}} 3000" in text
+    assert "# TYPE ddd_queue_wait_seconds histogram" in text
+    assert "ddd_daemon_rss_bytes{" in text
+
+
+def test_write_textfile_replaces_atomically(tmp_path):
+    path = tmp_path / "ddd.prom"
+    write_textfile(str(path), "a 1\n")
+    write_textfile(str(path), "a 2\n")
+    assert path.read_text() == "a 2\n"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_daemon_exports_metrics(ddd_workspace):
+    ddd_dir = ddd_workspace / ".ddd"
+    ddd_dir.mkdir()
+    config_data = {"targets": {"dev": {"build": {"cmd": "echo built", "filter": "raw"}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+    textfile = ddd_workspace / "ddd.prom"
+    port = _free_port()
+
+    proc = subprocess.Popen(
+        [sys.executable, str(TOOL_ROOT / "src" / "dd-daemon.py"),
+         "--metrics-textfile", str(textfile), "--metrics-port", str(port)],
+        cwd=ddd_workspace, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        run_dir = ddd_dir / "run"
+        for _ in range(50):
+            if (run_dir / "ddd.sock").exists() and textfile.exists():
+                break
+            time.sleep(0.1)
+        assert "ddd_builds_total" in textfile.read_text()
+
+        (run_dir / "build.request").touch()
+        for _ in range(100):
+            if 'result="success"} 1' in textfile.read_text():
+                break
+            time.sleep(0.1)
+        assert "ddd_requests_total{" in textfile.read_text()
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert 'result="success"} 1' in body
+        assert "ddd_building{" in body
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
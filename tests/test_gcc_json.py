@@ -36,4 +36,130 @@ src/utils.c:25: warning: unused variable 'x'
     # Check Warning
     assert data[1]["file"] == "src/utils.c"
     assert data[1]["line"] == 25
-    assert data[1]["type"] == "warning"
\ No newline at end of file
+    assert data[1]["type"] == "warning"
+def test_gcc_json_diff_mode(tmp_path):
+    state = tmp_path / "diag.json"
+    config = {"diff": True, "diff_state": str(state)}
+    first_run = """
+a.c:1:1: error: 'x' undeclared
+a.c:5:3: warning: unused variable 'y'
+b.c:9:2: error: expected ';' before '}' token
+"""
+    first = json.loads(GccJsonFilter(config).process(first_run))
+    assert first["diff"] == {"baseline": False, "new": 3, "resolved": 0, "unchanged": 0, "total": 3}
+    assert len(first["new"]) == 3
+
+    # One error fixed, one new, column and spacing changes don't matter
+    second_run = """
+a.c:1:7: error: 'x'  undeclared
+b.c:9:2: error: expected ';' before '}' token
+c.c:2:1: error: unknown type name 'foo'
+"""
+    second = json.loads(GccJsonFilter(config).process(second_run))
+    assert second["diff"] == {"baseline": True, "new": 1, "resolved": 1, "unchanged": 2, "total": 3}
+    assert second["new"] == [
+        {"file": "c.c", "line": 2, "col": 1, "type": "error", "message": "unknown type name 'foo'"}
+    ]
+
+def test_gcc_json_diff_counts_repeated_entries(tmp_path):
+    config = {"diff": True, "diff_state": str(tmp_path / "diag.json")}
+    line = "inc.h:3:1: warning: declaration shadows a local variable\n"
+    GccJsonFilter(config).process(line)
+    out = json.loads(GccJsonFilter(config).process(line * 2))
+    assert out["diff"]["new"] == 1
+    assert out["diff"]["unchanged"] == 1
+
+def test_gcc_json_dedup_across_translation_units():
+    header_warning = "include/util.h:4:12: warning: 'helper' defined but not used [-Wunused-function]\n"
+    raw_input = ""
+    for tu in ("src/a.c", "src/b.c", "src/c.c", "src/a.c"):
+        raw_input += f"In file included from include/common.h:2,\n                 from {tu}:1:\n" + header_warning
+    raw_input += "src/b.c:9:1: error: expected ';' before '}' token\n"
+
+    f = GccJsonFilter({"dedup": True, "max_tus": 2})
+    data = json.loads(f.process(raw_input))
+
+    assert len(data) == 2
+    assert data[0]["count"] == 4
+    assert data[0]["tus"] == ["src/a.c", "src/b.c"]
+    assert data[0]["tus_omitted"] == 1
+    assert data[1]["tus"] == ["src/b.c"]
+
+def test_gcc_json_dedup_folds_notes():
+    notes = "".join(f"src/t.hpp:{n}:5: note: candidate {n}\n" for n in range(10))
+    error = "src/main.cpp:7:3: error: no matching function for call to 'f(int)'\n"
+    # The repeated error's notes are dropped along with it.
+    raw_input = error + notes + error + notes + "src/other.c:1:1: warning: unused\n"
+
+    f = GccJsonFilter({"dedup": True, "max_notes": 3})
+    data = json.loads(f.process(raw_input))
+
+    assert [d["type"] for d in data] == ["error", "warning"]
+    assert data[0]["count"] == 2
+    assert len(data[0]["notes"]) == 3
+    assert data[0]["notes"][0] == {"file": "src/t.hpp", "line": 0, "col": 5, "message": "candidate 0"}
+    assert data[0]["notes_omitted"] == 7
+    assert "notes" not in data[1]
+
+def test_gcc_json_dedup_scales_linearly():
+    line = "include/big.h:1:1: warning: same warning\n"
+    f = GccJsonFilter({"dedup": True})
+    data = json.loads(f.process(line * 100000))
+    assert len(data) == 1
+    assert data[0]["count"] == 100000
+
+def test_gcc_json_ndjson_streams_each_diagnostic():
+    f = GccJsonFilter({"format": "ndjson"})
+    line = f.feed("main.c:10:5: error: expected ';' before 'return'\n")
+    assert json.loads(line) == {"file": "main.c", "line": 10, "type": "error",
+                                "message": "expected ';' before 'return'", "col": 5}
+    assert line.count("\n") == 1
+    assert f.feed("utils.c:3: warning: unused variable 'x'\n").startswith("{")
+    # Nothing is held back for finish()
+    assert f.results == []
+    assert f.finish() == ""
+
+def test_gcc_json_compact_is_valid_json():
+    raw_input = "a.c:1:1: error: one\nb.c:2:1: warning: two\n"
+    out = GccJsonFilter({"format": "compact"}).process(raw_input)
+    assert [d["file"] for d in json.loads(out)] == ["a.c", "b.c"]
+    assert len(out.splitlines()) == 2
+    assert json.loads(GccJsonFilter({"format": "compact"}).process("make: Nothing to be done for 'all'.\n")) == []
+
+def test_gcc_json_ndjson_with_diff_writes_summary_first(tmp_path):
+    config = {"format": "ndjson", "diff": True, "diff_state": str(tmp_path / "s.json")}
+    out = GccJsonFilter(config).process("a.c:1:1: error: one\n")
+    lines = [json.loads(l) for l in out.splitlines()]
+    assert lines[0]["diff"]["new"] == 1
+    assert lines[1]["file"] == "a.c"
+
+def test_gcc_json_dedup_keeps_include_context():
+    # GCC prints the include chain once per context, not per diagnostic.
+    raw_input = ""
+    for tu in ("t1.c", "t2.c"):
+        raw_input += (
+            f"In file included from {tu}:1:\n"
+            "h.h:2:5: warning: unused variable 'a' [-Wunused-variable]\n"
+            "h.h:3:5: warning: unused variable 'b' [-Wunused-variable]\n"
+            f"{tu}:4:1: warning: no newline at end of file\n"
+        )
+    raw_input += "t3.c:1:1: error: expected identifier\n"
+
+    data = json.loads(GccJsonFilter({"dedup": True}).process(raw_input))
+
+    assert [d["tus"] for d in data] == [["t1.c", "t2.c"], ["t1.c", "t2.c"], ["t1.c"], ["t2.c"], ["t3.c"]]
+    assert [d["count"] for d in data[:2]] == [2, 2]
+
+def test_gcc_json_diff_state_per_stage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    build = {"diff": True, "stage": "BUILD"}
+    verify = {"diff": True, "stage": "VERIFY"}
+    GccJsonFilter(build).process("a.c:1:1: error: build error\n")
+    GccJsonFilter(verify).process("t.c:2:1: error: test failure\n")
+
+    # Each stage compares against its own previous run
+    again = json.loads(GccJsonFilter(build).process("a.c:1:1: error: build error\n"))
+    assert again["diff"]["new"] == 0 and again["diff"]["resolved"] == 0
+    assert sorted(p.name for p in (tmp_path / ".ddd" / "state").iterdir()) == [
+        "build.diagnostics.json", "verify.diagnostics.json"
+    ]
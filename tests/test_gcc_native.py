@@ -0,0 +1,100 @@
+import json
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(REPO_ROOT))
+
+from src.filters.gcc_native import GccNativeFilter
+from src.filters.records import render
+
+GCC_JSON = json.dumps([{
+    "kind": "error",
+    "message": "'y' undeclared (first use in this function); did you mean 'x'?",
+    "option": None,
+    "locations": [{
+        "caret": {"file": "src/main.c", "line": 4, "column": 12, "display-column": 12},
+        "finish": {"file": "src/main.c", "line": 4, "column": 12, "display-column": 12}
+    }],
+    "fixits": [{
+        "start": {"file": "src/main.c", "line": 4, "column": 12},
+        "next": {"file": "src/main.c", "line": 4, "column": 13},
+        "string": "x"
+    }],
+    "children": [{
+        "kind": "note",
+        "message": "each undeclared identifier is reported only once",
+        "locations": [{"caret": {"file": "src/main.c", "line": 4, "column": 12}}]
+    }]
+}, {
+    "kind": "warning",
+    "message": "unused variable 'z'",
+    "option": "-Wunused-variable",
+    "locations": [{"caret": {"file": "src/util.c", "line": 9, "column": 9}}]
+}])
+
+SARIF = {
+    "version": "2.1.0",
+    "runs": [{
+        "results": [{
+            "ruleId": "-Wimplicit-function-declaration",
+            "level": "warning",
+            "message": {"text": "implicit declaration of function 'foo'"},
+            "locations": [{"physicalLocation": {
+                "artifactLocation": {"uri": "file:///src/a.c"},
+                "region": {"startLine": 3, "startColumn": 5, "endColumn": 8}
+            }}],
+            "relatedLocations": [{
+                "physicalLocation": {"artifactLocation": {"uri": "inc/a.h"}, "region": {"startLine": 1}},
+                "message": {"text": "in file included from here"}
+            }]
+        }]
+    }]
+}
+
+
+def test_gcc_json_format():
+    data = json.loads(GccNativeFilter().process("gcc -c src/main.c\n" + GCC_JSON + "\n"))
+    assert len(data) == 2
+    error = data[0]
+    assert (error["file"], error["line"], error["col"], error["type"]) == ("src/main.c", 4, 12, "error")
+    assert error["fixits"] == [{"file": "src/main.c", "line": 4, "col": 12, "end_col": 13, "replace": "x"}]
+    assert error["notes"][0]["message"] == "each undeclared identifier is reported only once"
+    assert data[1]["option"] == "-Wunused-variable"
+
+def test_pretty_sarif_interleaved_with_make_output():
+    pretty = json.dumps(SARIF, indent=2).splitlines(keepends=True)
+    # Another job's output lands in the middle of the document.
+    stream = pretty[:5] + ["make[1]: Entering directory '/src/lib'\n"] + pretty[5:]
+    stream += ["\n", "ld: cannot find -lfoo\n", "src/b.c:1:1: error: text diagnostic\n"]
+
+    f = GccNativeFilter()
+    out = "".join(f.feed(line) for line in stream) + render(f.finish())
+    data = json.loads(out)
+
+    assert [d["type"] for d in data] == ["warning", "error"]
+    sarif = data[0]
+    assert sarif["file"] == "/src/a.c"
+    assert sarif["end"] == {"line": 3, "col": 8}
+    assert sarif["option"] == "-Wimplicit-function-declaration"
+    assert sarif["notes"] == [{"file": "inc/a.h", "line": 1, "message": "in file included from here"}]
+    assert data[1]["message"] == "text diagnostic"
+
+def test_empty_documents_are_success():
+    assert json.loads(GccNativeFilter().process("[]\n[]\n")) == []
+
+def test_failed_link_after_clean_compile():
+    stream = (
+        "[]\n"
+        "/usr/bin/ld: main.o: in function `main':\n"
+        "main.c:(.text+0x5): undefined reference to `foo'\n"
+        "collect2: error: ld returned 1 exit status\n"
+        "make: *** [Makefile:2: app] Error 1\n"
+    )
+    data = json.loads(GccNativeFilter().process(stream))
+    assert data and all(d["type"] == "error" for d in data)
+    assert "undefined reference to `foo'" in json.dumps(data)
+
+def test_broken_document_falls_back_to_text():
+    data = json.loads(GccNativeFilter().process('[{"kind": "error", "mess\n'))
+    assert data[0]["message"].startswith("Build Output (Unparseable)")
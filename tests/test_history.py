@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.history import HistoryStore
+
+
+def _run_dir(tmp_path, log, raw, result=None):
+    run_dir = tmp_path / "run"
+    run_dir.mkdir(exist_ok=True)
+    (run_dir / "build.log").write_text(log)
+    (run_dir / "last_build.raw.log").write_bytes(raw)
+    (run_dir / "job_result.json").write_text(json.dumps(result or {"success": True}))
+    return run_dir
+
+
+def test_record_get_and_restore(tmp_path):
+    store = HistoryStore({}, tmp_path / "history")
+    raw = b"gcc -c main.c\n\xff invalid utf-8\n" * 1000
+    run_dir = _run_dir(tmp_path, "first\n", raw)
+    first = store.record(run_dir, {"build": 1, "success": True})
+    _run_dir(tmp_path, "second\n", b"other\n")
+    second = store.record(run_dir, {"build": 2, "success": False})
+
+    assert store.get(0) is second
+    assert store.get(1) is first
+    assert store.get(2) is None
+    assert store.find(first["id"]) is first
+
+    artifact = first["artifacts"]["last_build.raw.log"]
+    assert artifact["codec"] == "gzip"
+    assert artifact["size"] == len(raw)
+    assert artifact["stored"] < len(raw) // 10
+
+    paths = store.restore(first, tmp_path / "restored")
+    assert Path(paths["last_build.raw.log"]).read_bytes() == raw
+    assert Path(paths["build.log"]).read_text() == "first\n"
+
+    # The index survives a restart
+    reopened = HistoryStore({}, tmp_path / "history")
+    assert reopened.get(1)["id"] == first["id"]
+    assert reopened.next_id == second["id"] + 1
+
+
+def test_identical_outputs_are_stored_once(tmp_path):
+    store = HistoryStore({"compression": "lzma"}, tmp_path / "history")
+    run_dir = _run_dir(tmp_path, "same\n", b"same raw\n")
+    a = store.record(run_dir, {})
+    b = store.record(run_dir, {})
+    assert a["artifacts"] == b["artifacts"]
+    blobs = [p for p in (tmp_path / "history" / "objects").rglob("*") if p.is_file()]
+    assert len(blobs) == 3
+    assert all(p.suffix == ".xz" for p in blobs)
+    with store.open_artifact(b, "last_build.raw.log") as f:
+        assert f.read() == b"same raw\n"
+
+
+def test_retention_by_count_and_size(tmp_path):
+    store = HistoryStore({"max_builds": 3, "compression": "none"}, tmp_path / "history")
+    for i in range(5):
+        run_dir = _run_dir(tmp_path, f"log {i}\n", f"raw {i}\n".encode())
+        store.record(run_dir, {"build": i})
+    assert [e["build"] for e in store.builds] == [2, 3, 4]
+    assert store.find(store.builds[0]["id"] - 1) is None
+    blobs = [p for p in (tmp_path / "history" / "objects").rglob("*") if p.is_file()]
+    # Three logs and raw logs each; the identical job_result.json is one blob
+    assert len(blobs) == 7
+
+    store.configure({"max_mb": 0.001, "compression": "none"})
+    run_dir = _run_dir(tmp_path, "big\n", os.urandom(2048))
+    entry = store.record(run_dir, {"build": 5})
+    # Over budget on its own, but the newest build is always kept
+    assert store.builds == [entry]
+    assert entry["pruned"] == 3
+
+
+def test_daemon_records_history(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    config_data = {"targets": {"dev": {"build": {"cmd": "echo \"RUN_$(date +%s%N)\"", "filter": "raw"}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    sock_path = run_dir / "ddd.sock"
+    for _ in range(50):
+        if sock_path.exists():
+            break
+        time.sleep(0.1)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(10)
+    s.connect(os.path.relpath(sock_path))
+    stream = s.makefile("r")
+
+    logs = []
+    for _ in range(2):
+        s.sendall(b'{"cmd": "build"}\n')
+        json.loads(stream.readline())
+        json.loads(stream.readline())
+        logs.append((run_dir / "build.log").read_text())
+
+    # Recording follows the notification; the listing waits for it.
+    for _ in range(50):
+        s.sendall(b'{"cmd": "history"}\n')
+        builds = json.loads(stream.readline())["builds"]
+        if len(builds) == 2:
+            break
+        time.sleep(0.1)
+    assert [b["build"] for b in builds] == [2, 1]
+
+    s.sendall(b'{"cmd": "history", "n": 1, "restore": true}\n')
+    reply = json.loads(stream.readline())
+    s.close()
+    assert reply["event"] == "history"
+    assert reply["build"]["build"] == 1
+    restored = Path(reply["restored"]["build.log"])
+    assert restored.read_text() == logs[0]
+    assert logs[0] != logs[1]
@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+CLIENT = TOOL_ROOT / "bin" / "ddd-wait"
+
+def _configure(ddd_dir, cmd):
+    config_data = {"targets": {"dev": {"build": {"cmd": cmd, "filter": "raw"}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+def _connect(run_dir):
+    sock_path = run_dir / "ddd.sock"
+    for _ in range(50):
+        if sock_path.exists():
+            break
+        time.sleep(0.1)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(10)
+    # Relative path keeps us under the AF_UNIX path length limit
+    s.connect(os.path.relpath(sock_path))
+    return s
+
+def test_socket_build_push_notification(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    _configure(ddd_dir, "echo 'SOCKET_BUILD_OK'")
+
+    s = _connect(run_dir)
+    s.sendall(b'{"cmd": "build"}\n')
+    stream = s.makefile("r")
+
+    queued = json.loads(stream.readline())
+    assert queued["event"] == "queued"
+
+    done = json.loads(stream.readline())
+    assert done["event"] == "done"
+    assert done["build"] == queued["build"]
+    assert done["success"] is True
+    assert "SOCKET_BUILD_OK" in Path(done["log"]).read_text()
+    s.close()
+
+def test_socket_rejects_unknown_command(ddd_workspace, daemon_proc):
+    s = _connect(ddd_workspace / ".ddd" / "run")
+    s.sendall(b'{"cmd": "explode"}\n{"cmd": "ping"}\n')
+    stream = s.makefile("r")
+    assert json.loads(stream.readline())["event"] == "error"
+    assert json.loads(stream.readline())["pid"] == daemon_proc
+    s.close()
+
+def test_socket_rejects_invalid_fields(ddd_workspace, daemon_proc):
+    s = _connect(ddd_workspace / ".ddd" / "run")
+    s.sendall(b'{"cmd": "build", "timeout": "5"}\n{"cmd": "build", "timeout": 0}\n'
+              b'{"cmd": "history", "n": "x"}\n{"cmd": "ping"}\n')
+    stream = s.makefile("r")
+    for field in ("timeout", "timeout", "n"):
+        reply = json.loads(stream.readline())
+        assert reply["event"] == "error"
+        assert f"invalid {field}" in reply["message"]
+    assert json.loads(stream.readline())["pid"] == daemon_proc
+    s.close()
+
+def test_client_uses_socket_and_file_fallback(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    _configure(ddd_dir, "echo 'CLIENT_OUTPUT'")
+    _connect(ddd_dir / "run").close()
+
+    out = subprocess.run([str(CLIENT)], capture_output=True, text=True, timeout=30)
+    assert out.returncode == 0
+    assert "Build queued" in out.stdout
+    assert "CLIENT_OUTPUT" in out.stdout
+
+    env = dict(os.environ, DDD_IPC="file")
+    out = subprocess.run([str(CLIENT)], capture_output=True, text=True, timeout=30, env=env)
+    assert out.returncode == 0
+    assert "Build triggered" in out.stdout
+    assert "CLIENT_OUTPUT" in out.stdout
+
+def test_client_reports_wait_latency_in_poll_mode(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    _configure(ddd_dir, "sleep 0.3 && echo 'POLLED'")
+
+    env = dict(os.environ, DDD_IPC="file", DDD_WAIT="poll")
+    out = subprocess.run([str(CLIENT)], capture_output=True, text=True, timeout=30, env=env)
+    assert out.returncode == 0, out.stdout
+    assert "POLLED" in out.stdout
+    match = re.search(r"Wait: mode=poll latency=(\d+)ms waited=(\d+)ms", out.stdout)
+    assert match, out.stdout
+    # Adaptive backoff never sleeps longer than 200ms
+    assert int(match.group(1)) < 1000
+
+def test_client_catches_builds_faster_than_first_poll(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    _configure(ddd_dir, "true")
+
+    env = dict(os.environ, DDD_IPC="file", DDD_WAIT="poll")
+    for _ in range(3):
+        out = subprocess.run([str(CLIENT)], capture_output=True, text=True, timeout=30, env=env)
+        assert out.returncode == 0, out.stdout
+
+@pytest.mark.skipif(not shutil.which("inotifywait"), reason="inotify-tools not installed")
+def test_client_inotify_mode(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    _configure(ddd_dir, "sleep 0.3 && echo 'NOTIFIED'")
+
+    env = dict(os.environ, DDD_IPC="file", DDD_WAIT="inotify")
+    out = subprocess.run([str(CLIENT)], capture_output=True, text=True, timeout=30, env=env)
+    assert out.returncode == 0, out.stdout
+    assert "NOTIFIED" in out.stdout
+    assert "Wait: mode=inotify" in out.stdout
+
+def test_status_while_building_and_concurrent_clients(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    _configure(ddd_dir, "echo 'step 1'; sleep 0.8; echo 'step 2'")
+
+    clients = [_connect(run_dir) for _ in range(3)]
+    streams = [c.makefile("r") for c in clients]
+    for c in clients:
+        c.sendall(b'{"cmd": "build"}\n')
+    tickets = [json.loads(st.readline())["build"] for st in streams]
+
+    # The daemon still answers while a build is running
+    time.sleep(0.3)
+    probe = _connect(run_dir)
+    probe.sendall(b'{"cmd": "status"}\n')
+    status = json.loads(probe.makefile("r").readline())
+    assert status["state"] == "building"
+    assert status["stage"] == "BUILD"
+    assert status["lines"] >= 1
+    probe.close()
+
+    done = [json.loads(st.readline()) for st in streams]
+    assert all(d["event"] == "done" and d["success"] for d in done)
+    assert [d["build"] for d in done] == tickets
+    for c in clients:
+        c.close()
+
+def test_socket_cancel_stops_running_build(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    _configure(ddd_dir, "echo 'STARTED' && sleep 30")
+
+    s = _connect(ddd_dir / "run")
+    s.sendall(b'{"cmd": "build"}\n')
+    stream = s.makefile("r")
+    json.loads(stream.readline())
+    time.sleep(1.0)
+
+    c = _connect(ddd_dir / "run")
+    c.sendall(b'{"cmd": "cancel"}\n')
+    assert json.loads(c.makefile("r").readline())["cancelled"] is True
+    c.close()
+
+    start = time.time()
+    done = json.loads(stream.readline())
+    assert time.time() - start < 10
+    assert done["success"] is False
+    assert done["exit_code"] == 130
+    assert (ddd_dir / "run" / "build.exit").read_text() == "130"
+    result = json.loads((ddd_dir / "run" / "job_result.json").read_text())
+    assert result["cancelled"]["reason"] == "cancelled by client"
+    assert "PIPELINE CANCELLED" in Path(done["log"]).read_text()
+    s.close()
+
+def test_supersede_kills_process_group(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    pid_file = ddd_workspace / "child.pid"
+    # The grandchild outlives the shell unless the whole group is signalled
+    _configure(ddd_dir, f"sleep 60 & echo $! > {pid_file}; wait")
+
+    s = _connect(ddd_dir / "run")
+    s.sendall(b'{"cmd": "build"}\n')
+    stream = s.makefile("r")
+    first = json.loads(stream.readline())["build"]
+    for _ in range(50):
+        if pid_file.exists() and pid_file.read_text().strip():
+            break
+        time.sleep(0.1)
+    child = int(pid_file.read_text())
+
+    _configure(ddd_dir, "echo 'SECOND_RUN'")
+    c = _connect(ddd_dir / "run")
+    c.sendall(b'{"cmd": "build", "supersede": true}\n')
+    c_stream = c.makefile("r")
+    second = json.loads(c_stream.readline())["build"]
+    assert second != first
+
+    # The superseded waiter gets the result of the build that replaced it
+    done = json.loads(stream.readline())
+    assert done["build"] == second
+    assert done["success"] is True
+    assert "SECOND_RUN" in Path(done["log"]).read_text()
+    assert json.loads(c_stream.readline())["build"] == second
+
+    for _ in range(50):
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail("background grandchild survived cancellation")
+    s.close()
+    c.close()
@@ -1,3 +1,4 @@
+import os
 import pytest
 import sys
 from pathlib import Path
@@ -42,4 +43,60 @@ class TestFilter(BaseFilter):
     # 5. Test Execution
     PluginClass = REGISTRY["test_plugin"]
     plugin = PluginClass()
-    assert plugin.process("hello") == "PLUGIN_ACTIVE: hello"
\ No newline at end of file
+    assert plugin.process("hello") == "PLUGIN_ACTIVE: hello"
+
+COUNTING_PLUGIN = """
+import os
+from src.filters import register_filter
+from src.filters.base import BaseFilter
+
+with open(os.path.join(os.path.dirname(__file__), "loads.txt"), "a") as f:
+    f.write("x")
+
+@register_filter("{name}")
+class CountingFilter(BaseFilter):
+    def process(self, text):
+        return "{tag}"
+"""
+
+def _make_project(tmp_path, name, tag="v1"):
+    filters_dir = tmp_path / ".ddd" / "filters"
+    filters_dir.mkdir(parents=True, exist_ok=True)
+    plugin = filters_dir / f"{name}.py"
+    plugin.write_text(COUNTING_PLUGIN.format(name=name, tag=tag))
+    return filters_dir, plugin
+
+def test_unchanged_plugins_are_not_reexecuted(tmp_path):
+    filters_dir, plugin = _make_project(tmp_path, "cached_plugin")
+
+    for _ in range(3):
+        load_plugins(project_root=str(tmp_path))
+
+    assert (filters_dir / "loads.txt").read_text() == "x"
+    assert REGISTRY["cached_plugin"]().process("") == "v1"
+
+    # Touching without changing content keeps the cached module
+    st = plugin.stat()
+    os.utime(plugin, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    load_plugins(project_root=str(tmp_path))
+    assert (filters_dir / "loads.txt").read_text() == "x"
+
+def test_changed_plugin_is_reloaded(tmp_path):
+    filters_dir, plugin = _make_project(tmp_path, "reload_plugin")
+    load_plugins(project_root=str(tmp_path))
+
+    plugin.write_text(COUNTING_PLUGIN.format(name="reload_plugin", tag="version2"))
+    load_plugins(project_root=str(tmp_path))
+
+    assert (filters_dir / "loads.txt").read_text() == "xx"
+    assert REGISTRY["reload_plugin"]().process("") == "version2"
+
+def test_deleted_plugin_is_unregistered(tmp_path):
+    _, plugin = _make_project(tmp_path, "raw", tag="override")
+    load_plugins(project_root=str(tmp_path))
+    assert REGISTRY["raw"]().process("") == "override"
+
+    plugin.unlink()
+    load_plugins(project_root=str(tmp_path))
+    # Built-in 'raw' is restored once the override is gone
+    assert REGISTRY["raw"].__name__ == "RawFilter"
@@ -0,0 +1,92 @@
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.profiler import PipelineProfiler
+
+SLOW_PLUGIN = """
+from src.filters import register_filter
+from src.filters.base import BaseFilter
+
+def burn(n):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+@register_filter("slow_plugin")
+class SlowFilter(BaseFilter):
+    streaming = True
+
+    def feed(self, line):
+        burn(300000)
+        return line
+"""
+
+
+def test_profiles_attribute_time_to_filter_files(tmp_path):
+    filters_dir = tmp_path / "filters"
+    filters_dir.mkdir()
+    (filters_dir / "hot.py").write_text(
+        "def spin():\n"
+        "    total = 0\n"
+        "    for i in range(1000000):\n"
+        "        total += i\n"
+        "    return total\n"
+    )
+    namespace = {}
+    exec(compile((filters_dir / "hot.py").read_text(), str(filters_dir / "hot.py"), "exec"), namespace)
+
+    profiler = PipelineProfiler([(str(filters_dir), "plugins")])
+    profiler.start()
+    namespace["spin"]()
+    profile = profiler.stop(str(tmp_path))
+
+    assert profile["filters"]["plugins/hot.py"] >= 10
+    assert any("spin" in f["function"] for f in profile["top"])
+    assert profile["samples"] > 0
+    collapsed = Path(profile["collapsed"]).read_text()
+    assert "spin (hot.py:1)" in collapsed
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+    assert Path(profile["pstats"]).stat().st_size > 0
+
+
+def test_profile_request(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    (ddd_dir / "filters").mkdir()
+    (ddd_dir / "filters" / "slow.py").write_text(SLOW_PLUGIN)
+    config_data = {"targets": {"dev": {"build": {"cmd": "printf 'a\\nb\\nc\\n'", "filter": ["slow_plugin"]}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    sock_path = run_dir / "ddd.sock"
+    for _ in range(50):
+        if sock_path.exists():
+            break
+        time.sleep(0.1)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(10)
+    s.connect(os.path.relpath(sock_path))
+    stream = s.makefile("r")
+
+    s.sendall(b'{"cmd": "build"}\n')
+    json.loads(stream.readline())
+    assert "profile" not in json.loads(stream.readline())
+
+    s.sendall(b'{"cmd": "build", "profile": true}\n')
+    json.loads(stream.readline())
+    done = json.loads(stream.readline())
+    s.close()
+
+    profile = done["profile"]
+    assert list(profile["filters"])[0] == ".ddd/filters/slow.py"
+    assert profile["filters"][".ddd/filters/slow.py"] >= 10
+    assert Path(profile["pstats"]).parent == run_dir.resolve()
+    assert "burn (slow.py:" in Path(profile["collapsed"]).read_text()
+    assert json.loads((run_dir / "job_result.json").read_text())["profile"] == profile
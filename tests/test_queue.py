@@ -0,0 +1,120 @@
+import asyncio
+import json
+import sys
+import time
+import importlib.util
+from pathlib import Path
+
+# Setup path
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+# Import dd-daemon dynamically (since it has a hyphen)
+spec = importlib.util.spec_from_file_location("dd_daemon", str(TOOL_ROOT / "src/dd-daemon.py"))
+dd_daemon = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(dd_daemon)
+
+def test_burst_collapses_into_one_request():
+    q = dd_daemon.RequestQueue()
+    for i in range(5):
+        assert q.submit(signature=("trigger", i))
+    assert q.depth() == 5
+
+    request = asyncio.run(q.take())
+    assert request["requests"] == 5
+    assert q.total_coalesced == 4
+    assert q.depth() == 0
+
+def test_duplicate_events_from_one_touch_are_ignored():
+    q = dd_daemon.RequestQueue()
+    assert q.submit(signature=("trigger", 1))
+    assert not q.submit(signature=("trigger", 1))
+    assert q.total_requests == 1
+
+def test_requests_during_build_get_one_follow_up(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    counter = ddd_workspace / "builds.txt"
+
+    config_data = {
+        "targets": {
+            "dev": {
+                "build": {"cmd": f"echo run >> {counter} && sleep 0.6", "filter": "raw"}
+            }
+        }
+    }
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    trigger = run_dir / "build.request"
+    lock = run_dir / "ipc.lock"
+    trigger.touch()
+    for _ in range(20):
+        if lock.exists():
+            break
+        time.sleep(0.05)
+    assert lock.exists()
+
+    # Burst while the first build is running (none of these may be lost)
+    for _ in range(3):
+        time.sleep(0.05)
+        trigger.touch()
+
+    # Lock is held across the follow-up build
+    for _ in range(60):
+        if not lock.exists():
+            break
+        time.sleep(0.1)
+    assert not lock.exists()
+
+    assert counter.read_text().count("run") == 2
+    result = json.loads((run_dir / "job_result.json").read_text())
+    assert result["queue"]["requests"] == 3
+    assert result["queue"]["coalesced"] == 2
+    assert result["queue"]["depth"] == 0
+
+def _stage_files(workspace):
+    (workspace / ".ddd" / "run").mkdir(parents=True)
+    return open(workspace / "clean.log", "w"), open(workspace / "raw.log", "w")
+
+def test_cancel_before_spawn_skips_stage(ddd_workspace):
+    f_clean, f_raw = _stage_files(ddd_workspace)
+    handler = dd_daemon.RequestHandler()
+    handler.progress = {"state": "building"}
+    assert handler.cancel_build("cancelled during cache lookup")
+
+    start = time.monotonic()
+    with f_clean, f_raw:
+        result = asyncio.run(handler._run_stage("BUILD", {"cmd": "sleep 2"}, f_clean, f_raw))
+    assert result == (False, 0, 0)
+    assert time.monotonic() - start < 1
+
+def test_cancel_during_spawn_kills_stage(ddd_workspace, monkeypatch):
+    f_clean, f_raw = _stage_files(ddd_workspace)
+    handler = dd_daemon.RequestHandler()
+    handler.progress = {"state": "building"}
+    spawn = asyncio.create_subprocess_shell
+
+    async def spawn_then_cancel(*args, **kwargs):
+        process = await spawn(*args, **kwargs)
+        handler.cancel_build("cancelled while spawning")
+        return process
+    monkeypatch.setattr(dd_daemon.asyncio, "create_subprocess_shell", spawn_then_cancel)
+
+    start = time.monotonic()
+    with f_clean, f_raw:
+        success, _, _ = asyncio.run(handler._run_stage("BUILD", {"cmd": "sleep 2"}, f_clean, f_raw))
+    assert success is False
+    assert time.monotonic() - start < 1.5
+
+def test_invalid_stage_timeouts_are_ignored(ddd_workspace, capsys):
+    f_clean, f_raw = _stage_files(ddd_workspace)
+    handler = dd_daemon.RequestHandler()
+    handler.progress = {"state": "building"}
+    stage = {"cmd": "echo ok", "timeout": "5", "kill_grace": -1}
+    with f_clean, f_raw:
+        success, _, _ = asyncio.run(handler._run_stage("BUILD", stage, f_clean, f_raw))
+    assert success is True
+    assert handler.timeout_info is None
+    out = capsys.readouterr().out
+    assert "ignoring invalid timeout '5'" in out
+    assert "ignoring invalid kill_grace -1" in out
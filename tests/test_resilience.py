@@ -69,3 +69,11 @@ def test_gcc_json_still_catches_real_errors():
     
     assert len(data) == 1
     assert data[0]["type"] == "error"
+
+def test_crash_detector_injects_into_diff_document():
+    """Verify a crash shows up as a new entry in gcc_json diff output."""
+    f = CrashDetectorFilter()
+    previous = json.dumps({"diff": {"baseline": True, "new": 0, "resolved": 2, "unchanged": 1, "total": 1}, "new": []})
+    data = json.loads(f.process(previous + "\nSegmentation fault"))
+    assert data["diff"]["new"] == 1
+    assert data["new"][0]["type"] == "fatal"
@@ -0,0 +1,95 @@
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.resources import StageUsage, read_io_stat, read_pressure
+
+BURN = f"{sys.executable} -c 'x = bytearray(64 * 1024 * 1024); sum(range(2000000))'"
+
+
+def test_read_pressure_and_io_stat(tmp_path):
+    psi = tmp_path / "memory.pressure"
+    psi.write_text(
+        "some avg10=0.00 avg60=0.00 avg300=0.00 total=1500\n"
+        "full avg10=0.00 avg60=0.00 avg300=0.00 total=700\n"
+    )
+    assert read_pressure(psi) == {"some": 1500, "full": 700}
+    assert read_pressure(tmp_path / "missing") == {}
+
+    io = tmp_path / "io.stat"
+    io.write_text("8:0 rbytes=100 wbytes=20 rios=1 wios=2\n8:16 rbytes=5 wbytes=0 rios=1 wios=0\n")
+    assert read_io_stat(io) == {"rbytes": 105, "wbytes": 20, "rios": 2, "wios": 2}
+
+
+def test_stage_usage_rusage_delta():
+    usage = StageUsage(use_cgroup=False)
+    usage.start("BUILD")
+    subprocess.run(BURN, shell=True, check=True)
+    result = usage.stop()
+
+    assert result["user_cpu_s"] + result["sys_cpu_s"] > 0
+    assert result["minor_faults"] > 1000
+    assert "cgroup" not in result
+    assert result["pressure"]["scope"] == "system"
+
+    # Nothing ran since: the delta is empty and the RSS high-water mark unchanged.
+    usage.start("VERIFY")
+    again = usage.stop()
+    assert again["user_cpu_s"] == 0
+    assert again["max_rss_kb"] is None
+
+
+def test_stage_usage_cgroup_when_available():
+    usage = StageUsage()
+    usage.start("BUILD")
+    cgroup = usage.cgroup
+    subprocess.run(usage.wrap(BURN), shell=True, check=True)
+    result = usage.stop()
+    if cgroup is None:
+        assert result["pressure"]["scope"] == "system"
+        return
+    assert result["pressure"]["scope"] == "cgroup"
+    assert result["cgroup"]["cpu_ms"] > 0
+    assert not Path(cgroup.path).exists()
+
+
+def test_cgroup_wrap_joins_then_runs_in_place(tmp_path):
+    from src.resources import StageCgroup
+    group = tmp_path / "ddd-stage"
+    group.mkdir()
+    out = subprocess.run(StageCgroup(str(group)).wrap("echo $$; echo \"it's\" 'quoted'"),
+                         shell=True, check=True, capture_output=True, text=True).stdout
+    pid, text = out.splitlines()
+    # The command ran in the shell that joined (same pid), with its quoting intact
+    assert (group / "cgroup.procs").read_text().strip() == pid
+    assert text == "it's quoted"
+
+    # A cgroup that cannot be joined doesn't stop the command
+    missing = StageCgroup(str(tmp_path / "gone"))
+    out = subprocess.run(missing.wrap("echo ran"), shell=True, capture_output=True, text=True)
+    assert out.stdout == "ran\n" and out.stderr == ""
+
+
+def test_daemon_records_stage_resources(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    config_data = {"targets": {"dev": {"build": {"cmd": BURN, "filter": "raw"}}}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    (run_dir / "build.request").touch()
+    for _ in range(100):
+        if (run_dir / "build.exit").exists() and not (run_dir / "ipc.lock").exists():
+            break
+        time.sleep(0.1)
+
+    result = json.loads((run_dir / "job_result.json").read_text())
+    resources = result["metrics"]["stages"]["BUILD"]["resources"]
+    assert resources["user_cpu_s"] + resources["sys_cpu_s"] > 0
+    # First build of a fresh daemon: the high-water mark is this build's
+    assert resources["max_rss_kb"] > 64 * 1024
+    assert resources["pressure"]["scope"] in ("cgroup", "system")
@@ -0,0 +1,208 @@
+import json
+import sys
+from pathlib import Path
+
+# Ensure we can import src
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.filters import FilterChain
+from src.filters.base import BaseFilter
+from src.filters.raw import RawFilter
+from src.filters.gcc_json import GccJsonFilter
+from src.filters.gcc_make import GccMakeFilter
+from src.filters.crash_detector import CrashDetectorFilter
+
+SAMPLE = """make[1]: Entering directory '/src'
+\x1b[1mmain.c:10:5: error: expected ';' before 'return'\x1b[0m
+    return 0;
+utils.c:3: warning: unused variable 'x'
+make[1]: Leaving directory '/src'
+"""
+
+class Upper(BaseFilter):
+    """A legacy process()-only filter."""
+    def process(self, text):
+        return text.upper()
+
+def run_chain(names, text, registry=None):
+    chain = FilterChain(names, {}, registry=registry)
+    out = [chain.feed(line) for line in text.splitlines(keepends=True)]
+    out.append(chain.finish())
+    return "".join(out)
+
+def test_builtins_are_streaming():
+    for cls in (RawFilter, GccMakeFilter, GccJsonFilter, CrashDetectorFilter):
+        assert cls.streaming
+
+def test_raw_emits_output_per_line():
+    chain = FilterChain(["raw"], {})
+    assert chain.feed("\x1b[31mhello\x1b[0m\n") == "hello\n"
+    assert chain.finish() == ""
+
+def test_gcc_json_feed_matches_process():
+    streamed = json.loads(run_chain(["gcc_json"], SAMPLE))
+    whole = json.loads(GccJsonFilter().process(SAMPLE))
+    assert streamed == whole
+    assert [d["type"] for d in streamed] == ["error", "warning"]
+
+def test_chain_make_then_json():
+    data = json.loads(run_chain(["gcc_make", "gcc_json"], SAMPLE))
+    assert data[0]["file"] == "main.c"
+    assert data[0]["col"] == 5
+
+def test_crash_detector_holds_output_until_finish():
+    chain = FilterChain(["gcc_make", "crash_detector"], {})
+    assert chain.feed("running tests\n") == ""
+    assert chain.feed("Segmentation fault (core dumped)\n") == ""
+    data = json.loads(chain.finish())
+    assert data[0]["type"] == "fatal"
+
+def test_legacy_filter_runs_through_adapter():
+    registry = {"upper": Upper, "raw": RawFilter}
+    chain = FilterChain(["raw", "upper"], {}, registry=registry)
+    # Legacy filters only see the text once the stream ends.
+    assert chain.feed("abc\n") == ""
+    assert chain.feed("def") == ""
+    assert chain.finish() == "ABC\nDEF"
+
+def test_process_override_of_streaming_filter_is_used():
+    class Prefixed(GccJsonFilter):
+        """A project plugin that only overrides process()."""
+        def process(self, text):
+            return "PREFIX " + super().process(text)
+
+    registry = {"prefixed": Prefixed}
+    out = run_chain(["prefixed"], SAMPLE, registry=registry)
+    assert out == Prefixed().process(SAMPLE)
+    assert out.startswith("PREFIX ")
+
+    # Subclasses that keep the streaming API still stream.
+    class Quiet(RawFilter):
+        pass
+    chain = FilterChain(["quiet"], {}, registry={"quiet": Quiet})
+    assert chain.feed("abc\n") == "abc\n"
+
+def test_missing_filter_is_skipped(capsys):
+    assert run_chain(["nope"], "x\n") == "x\n"
+    assert "Filter 'nope' not found" in capsys.readouterr().out
+
+def test_signals_fuse_into_one_scan():
+    chain = FilterChain(["gcc_json", "crash_detector"], {})
+    assert all(f.fused for f in chain.filters)
+    # Both filters' patterns are searched with a single regex per line.
+    assert "Nothing to be done" in chain._scan.__self__.pattern
+    assert "Segmentation fault" in chain._scan.__self__.pattern
+
+def test_every_matching_signal_is_delivered():
+    """One line matching several filters' signals notifies all of them."""
+    import re
+    calls = []
+    class SegfaultWatcher(BaseFilter):
+        streaming = True
+        signals = {"segv": re.compile("Segmentation fault")}
+        def signal(self, name, text):
+            calls.append((name, text))
+
+    registry = {"crash_detector": CrashDetectorFilter, "watcher": SegfaultWatcher}
+    run_chain(["crash_detector", "watcher"], "Segmentation fault (core dumped)\n", registry=registry)
+    assert calls == [("segv", "Segmentation fault")]
+
+    text = "Build finished: Segmentation fault\n"
+    for feed in ("lines", "chunk"):
+        chain = FilterChain(["gcc_json", "crash_detector"])
+        if feed == "lines":
+            out = chain.feed(text)
+        else:
+            out = chain.feed_chunk(text)
+        data = json.loads(out + chain.finish())
+        assert [d["type"] for d in data] == ["fatal"], feed
+
+def test_crash_behind_gcc_json_is_detected():
+    text = SAMPLE + "./run_tests\nSegmentation fault (core dumped)\n"
+    data = json.loads(run_chain(["gcc_json", "crash_detector"], text))
+    assert data[0]["type"] == "fatal"
+    assert data[-1]["file"] == "utils.c"
+
+def test_success_signal_reaches_gcc_json_after_gcc_make():
+    out = run_chain(["gcc_make", "gcc_json"], "make: Nothing to be done for 'all'.\nmake[1]: Leaving directory '/src'\n")
+    assert json.loads(out) == []
+
+def test_records_pass_between_filters_without_json(monkeypatch):
+    from src.filters import crash_detector
+    from src.filters.records import Diagnostic, DiagnosticBatch
+
+    def no_reparse(*args, **kwargs):
+        raise AssertionError("crash_detector re-parsed JSON")
+    monkeypatch.setattr(crash_detector.json, "loads", no_reparse)
+
+    captured = []
+    class Spy(CrashDetectorFilter):
+        def feed_records(self, batch):
+            captured.append(batch)
+            return super().feed_records(batch)
+
+    registry = {"gcc_json": GccJsonFilter, "spy": Spy}
+    text = SAMPLE + "Segmentation fault\n"
+    out = run_chain(["gcc_json", "spy"], text, registry=registry)
+    monkeypatch.undo()
+    data = json.loads(out)
+
+    assert isinstance(captured[0], DiagnosticBatch)
+    assert all(isinstance(r, Diagnostic) for r in captured[0].records)
+    assert [d["type"] for d in data] == ["fatal", "error", "warning"]
+
+def test_diagnostic_record_round_trip():
+    from src.filters.records import Diagnostic
+    entry = {"file": "a.c", "line": 3, "type": "error", "message": "m", "col": 2, "option": "-Wx"}
+    record = Diagnostic.from_dict(entry)
+    assert not hasattr(record, "__dict__")
+    assert record.to_dict() == entry
+    assert list(record.to_dict()) == list(entry)
+
+def test_ndjson_chain_with_crash_detector():
+    chain = FilterChain(["gcc_json", "crash_detector"], {"format": "ndjson"})
+    out = [chain.feed(line) for line in (SAMPLE + "Segmentation fault\n").splitlines(keepends=True)]
+    out.append(chain.finish())
+    records = [json.loads(line) for line in "".join(out).splitlines()]
+    assert [r["type"] for r in records] == ["fatal", "error", "warning"]
+
+
+def test_feed_chunk_matches_line_feeding():
+    """Chunks cut anywhere give the same output and signals as whole lines."""
+    lines = ["make: Entering directory\n", "main.c:1:2: error: oops\n",
+             "Segmentation fault (core dumped)\n", "tail without newline"]
+    text = "".join(lines)
+
+    by_line = FilterChain(["gcc_json", "crash_detector"])
+    expected = "".join(by_line.feed(line) for line in lines) + by_line.finish()
+
+    chunked = FilterChain(["gcc_json", "crash_detector"])
+    out = "".join(chunked.feed_chunk(text[i:i + 7]) for i in range(0, len(text), 7))
+    assert out + chunked.finish() == expected
+    assert "Segmentation fault" in expected
+
+
+def test_chain_filter_timings():
+    """feed() time is sampled and scaled; finish() is timed exactly."""
+    import time
+
+    class SlowFinish(BaseFilter):
+        streaming = True
+
+        def finish(self):
+            time.sleep(0.02)
+            return ""
+
+    chain = FilterChain(["raw", "slow"], registry={"raw": RawFilter, "slow": SlowFinish})
+    for i in range(1000):
+        chain.feed(f"line {i}\n")
+    chain.finish()
+
+    raw, slow = chain.timing_stats()
+    assert raw["name"] == "raw" and slow["name"] == "slow"
+    # Inputs 0, 64, ... 960 are sampled, through both filters
+    assert raw["sampled_calls"] == slow["sampled_calls"] == 16
+    assert raw["feed_ms"] > 0
+    assert slow["finish_ms"] >= 20
+    assert slow["finish_cpu_ms"] < slow["finish_ms"]
@@ -0,0 +1,88 @@
+import json
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+TOOL_ROOT = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(TOOL_ROOT))
+
+from src.filters.chain import FilterChain
+from src.filters.base import BaseFilter
+from src.trace import PipelineTrace, FILTERS_TID
+
+
+class _Slow(BaseFilter):
+    def process(self, text):
+        time.sleep(0.01)
+        return text
+
+
+def test_spans_and_counters(tmp_path):
+    queued_at = time.monotonic()
+    trace = PipelineTrace(queued_at, enabled=True)
+    with trace.span("load config", target="dev"):
+        time.sleep(0.002)
+    trace.counter("output rate", {"KB/s": 1.5})
+    path = trace.write(str(tmp_path), build=3)
+
+    data = json.loads(Path(path).read_text())
+    assert data["otherData"] == {"build": 3}
+    events = {e["name"]: e for e in data["traceEvents"] if e["ph"] != "M"}
+    span = events["load config"]
+    assert span["ph"] == "X" and span["args"] == {"target": "dev"}
+    assert span["ts"] >= 0 and span["dur"] >= 2000
+    assert events["output rate"]["ph"] == "C"
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_chain_records_finish_spans():
+    chain = FilterChain(["slow", "raw"], registry={"slow": _Slow, "raw": BaseFilter})
+    chain.feed("line\n")
+    assert chain.finish() == "line\n"
+    names = [name for name, _, _ in chain.finish_spans]
+    assert names == ["slow", "raw"]
+    start, end = chain.finish_spans[0][1:]
+    assert end - start >= 0.01
+
+
+def test_daemon_writes_trace(ddd_workspace, daemon_proc):
+    ddd_dir = ddd_workspace / ".ddd"
+    run_dir = ddd_dir / "run"
+    config_data = {"targets": {"dev": {
+        "trace": True,
+        "sentinel_file": "done.flag",
+        "build": {"cmd": "for i in 1 2 3; do echo line $i; sleep 0.1; done", "filter": ["gcc_json", "raw"]}
+    }}}
+    (ddd_dir / "config.json").write_text(json.dumps(config_data))
+
+    sock_path = run_dir / "ddd.sock"
+    for _ in range(50):
+        if sock_path.exists():
+            break
+        time.sleep(0.1)
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(10)
+    s.connect(os.path.relpath(sock_path))
+    stream = s.makefile("r")
+    s.sendall(b'{"cmd": "build"}\n')
+    json.loads(stream.readline())
+    json.loads(stream.readline())
+    s.close()
+
+    trace_file = run_dir / "trace.json"
+    for _ in range(50):
+        if trace_file.exists():
+            break
+        time.sleep(0.1)
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    spans = {e["name"]: e for e in events if e["ph"] == "X"}
+    for name in ("request", "load_plugins", "load config", "BUILD", "spawn", "output",
+                 "sentinel check", "write artifacts", "gcc_json.finish", "raw.finish"):
+        assert name in spans, name
+    assert spans["gcc_json.finish"]["tid"] == FILTERS_TID
+    assert spans["BUILD"]["dur"] >= 200000
+    assert spans["sentinel check"]["args"]["found"] is False
+    counters = [e for e in events if e["ph"] == "C" and e["name"] == "output rate"]
+    assert len(counters) >= 2
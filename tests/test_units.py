@@ -1,5 +1,6 @@
+import asyncio
 import unittest
-from unittest.mock import MagicMock, patch, mock_open, call
+from unittest.mock import AsyncMock, MagicMock, patch, mock_open, call
 import sys
 import os
 import json
@@ -32,10 +33,18 @@ class TestDaemonUnits(unittest.TestCase):
         # Mock config loading
         self.handler.load_config = MagicMock()
 
+    def _proc(self, output, returncode):
+        """Fake asyncio subprocess whose stdout yields `output` then EOF."""
+        proc = MagicMock()
+        proc.stdout.read = AsyncMock(side_effect=[o.encode() for o in output] + [b""])
+        proc.wait = AsyncMock(return_value=returncode)
+        proc.returncode = returncode
+        return proc
+
     def tearDown(self):
         self.modules_patcher.stop()
 
-    @patch("subprocess.Popen")
+    @patch("asyncio.create_subprocess_shell", new_callable=AsyncMock)
     @patch("builtins.open", new_callable=mock_open)
     @patch("os.path.exists")
     @patch("time.time")
@@ -58,21 +67,16 @@ class TestDaemonUnits(unittest.TestCase):
         }
         
         # Process Mock (Build Success)
-        proc_mock = MagicMock()
-        proc_mock.stdout = ["Build Output\n"]
-        proc_mock.returncode = 0
-        proc_mock.wait.return_value = None
+        proc_mock = self._proc(["Build Output\n"], 0)
         
         # Process Mock (Verify Success)
-        proc_verify = MagicMock()
-        proc_verify.stdout = ["Verify Output\n"]
-        proc_verify.returncode = 0
+        proc_verify = self._proc(["Verify Output\n"], 0)
         
         mock_popen.side_effect = [proc_mock, proc_verify]
         
         # Run
         self.handler._write_artifacts = MagicMock()
-        self.handler._execute_logic()
+        asyncio.run(self.handler._execute_logic())
         
         # Assertions
         import subprocess
@@ -91,7 +95,7 @@ class TestDaemonUnits(unittest.TestCase):
         # Based on actual: mock(True, 0.0, 27, 0)
         self.handler._write_artifacts.assert_called_with(True, 0.0, 27, 0)
 
-    @patch("subprocess.Popen")
+    @patch("asyncio.create_subprocess_shell", new_callable=AsyncMock)
     @patch("builtins.open", new_callable=mock_open)
     @patch("os.path.exists")
     @patch("time.time")
@@ -104,14 +108,12 @@ class TestDaemonUnits(unittest.TestCase):
             "targets": { "dev": { "build": {"cmd": "bad_make"} } }
         }
         
-        proc_mock = MagicMock()
-        proc_mock.stdout = ["Error\n"]
-        proc_mock.returncode = 1
+        proc_mock = self._proc(["Error\n"], 1)
         mock_popen.return_value = proc_mock
         
         # Run
         self.handler._write_artifacts = MagicMock()
-        self.handler._execute_logic()
+        asyncio.run(self.handler._execute_logic())
         
         import subprocess
         
@@ -123,7 +125,7 @@ class TestDaemonUnits(unittest.TestCase):
         # Actual: mock(False, 0.0, 6, 0)
         self.handler._write_artifacts.assert_called_with(False, 0.0, 6, 0)
 
-    @patch("subprocess.Popen")
+    @patch("asyncio.create_subprocess_shell", new_callable=AsyncMock)
     @patch("builtins.open", new_callable=mock_open)
     @patch("os.path.exists")
     def test_sentinel_recovery(self, mock_exists, mock_file, mock_popen):
@@ -142,16 +144,14 @@ class TestDaemonUnits(unittest.TestCase):
         # 2. check after build -> True
         mock_exists.side_effect = [True, True]
         
-        proc_mock = MagicMock()
-        proc_mock.stdout = []
-        proc_mock.returncode = 1
+        proc_mock = self._proc([], 1)
         mock_popen.return_value = proc_mock
         
         self.handler._write_artifacts = MagicMock()
         
         # Hook os.remove to avoid error
         with patch("os.remove") as mock_rm:
-            self.handler._execute_logic()
+            asyncio.run(self.handler._execute_logic())
             mock_rm.assert_called_with("/tmp/success.flag")
 
         # Should be SUCCESS because sentinel appeared